@@ -0,0 +1,77 @@
+"""
+This module builds population vessel-density atlases of filtered cohorts and caches them on disk.
+
+An atlas is cached under a hash of the filter, the voxel size and the IDs of the matching subjects,
+so a cached atlas is reused for the same filter until subjects matching it are added or removed.
+Tracings are loaded in batches and streamed through the atlas, so memory does not grow with the
+cohort size.
+"""
+import hashlib
+import json
+import os
+
+from sqlmodel import Session, select
+
+from .config import ATLAS_CACHE_DIR
+from .database import apply_filters
+from .schemas import FilterDB, Subject
+from ..visualization3d.atlas import VesselAtlas
+from ..visualization3d.swc2graph import parse_swc
+
+
+def atlas_cache_key(filter_options: FilterDB, voxel_size: float, subject_ids):
+    """
+    Computes the cache key of an atlas.
+
+    Args:
+        filter_options (FilterDB): The filter selecting the subjects.
+        voxel_size (float): The edge length of the atlas voxels.
+        subject_ids (List[str]): The IDs of the subjects matching the filter.
+
+    Returns:
+        A hexadecimal SHA-256 digest.
+    """
+    key = json.dumps({
+        "filters": json.loads(filter_options.json(sort_keys=True)),
+        "voxel_size": voxel_size,
+        "subject_ids": sorted(subject_ids),
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_filtered_atlas(session: Session, filter_options: FilterDB, voxel_size: float,
+                       cache_dir: str = ATLAS_CACHE_DIR, batch_size: int = 50):
+    """
+    Returns the atlas of the subjects matching a filter, building and caching it if needed.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        filter_options (FilterDB): The filter selecting the subjects.
+        voxel_size (float): The edge length of the atlas voxels.
+        cache_dir (str): The directory holding the cached atlases.
+        batch_size (int): The number of tracings loaded at a time.
+
+    Returns:
+        VesselAtlas: The atlas of the matching subjects.
+
+    Raises:
+        ValueError: If a vessel name in the filter is unknown or the voxel size is not positive.
+    """
+    statement = apply_filters(select(Subject.ID), filter_options).where(Subject.unstructured_data != None)  # noqa: E711
+    subject_ids = session.exec(statement).all()
+    path = os.path.join(cache_dir, atlas_cache_key(filter_options, voxel_size, subject_ids) + ".npz")
+    if os.path.exists(path):
+        return VesselAtlas.load(path)
+
+    atlas = VesselAtlas(voxel_size=voxel_size)
+    for start in range(0, len(subject_ids), batch_size):
+        batch_ids = subject_ids[start:start + batch_size]
+        for swc_string in session.exec(select(Subject.unstructured_data).where(Subject.ID.in_(batch_ids))):
+            atlas.add_swc(parse_swc(swc_string))
+
+    # Write to a temporary file first so that concurrent requests never read a partial atlas
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary_path = f"{path[:-len('.npz')]}.{os.getpid()}.tmp.npz"
+    atlas.save(temporary_path)
+    os.replace(temporary_path, path)
+    return atlas
@@ -5,23 +5,129 @@ This module contains functions and variables for managing the database.
     SQL_TABLE_NAME: A string representing the name of the SQL table.
     SQL_DB_FILENAME: A string representing the name of the SQL database file.
     SQL_DB_URL: A string representing the URL of the SQL database.
+    ATLAS_CACHE_DIR: A string representing the directory where computed atlases are cached.
+    FIGURE_CACHE_DIR: A string representing the directory where serialized subject figures are cached.
+    FIGURE_CACHE_MAX_BYTES: An integer representing the size limit of the figure cache.
+    DEFAULT_FIGURE_OPTIONS: A dictionary of the plot options of the first view of a subject.
+    TUBE_TRIANGLE_BUDGET: An integer representing the largest number of triangles of a tube plot.
+    THUMBNAIL_DIR: A string representing the directory where subject thumbnails are stored.
+    GRAPH_CACHE_SIZE: An integer representing the number of subject graphs kept in memory for region requests.
+    DB_THREADS: An integer representing the number of threads running the blocking database queries of the API.
+    DB_POOL_SIZE: An integer representing the number of database connections kept open.
+    DB_POOL_OVERFLOW: An integer representing the number of extra connections opened under load.
+    DB_POOL_TIMEOUT: A float representing the seconds to wait for a connection before failing.
+    DB_PROFILES: A dictionary of the engine settings and SQLite pragmas of each database profile.
+    DB_PROFILE_ENV: A string representing the environment variable selecting the database profile.
 
 """
+import os
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
 from sqlmodel import create_engine
 
 FAST_API_URL = "http://127.0.0.1:8000"
 
 SQL_TABLE_NAME = "subjects"
 SQL_DB_FILENAME = "subjects_all.db"
-SQL_DB_URL = f"sqlite:///./data/{SQL_DB_FILENAME}"
+SQL_DB_PATH = f"./data/{SQL_DB_FILENAME}"
+SQL_DB_URL = f"sqlite:///{SQL_DB_PATH}"
+
+ATLAS_CACHE_DIR = "./data/atlas_cache"
+
+FIGURE_CACHE_DIR = "./data/figure_cache"
+FIGURE_CACHE_MAX_BYTES = 256 * 1024 ** 2
+DEFAULT_FIGURE_OPTIONS = {"vertex_budget": 300}
+TUBE_TRIANGLE_BUDGET = 200000
+
+THUMBNAIL_DIR = "./data/thumbnails"
+
+GRAPH_CACHE_SIZE = 32
 
-def create_sql_engine():
+# Streamed listings keep their connection while they are sent, so the pool is larger than the thread count
+DB_THREADS = 8
+DB_POOL_SIZE = 16
+DB_POOL_OVERFLOW = 16
+DB_POOL_TIMEOUT = 30.0
+
+# echo: True logs the statements, "debug" also the result rows.
+# statement_cache_size: the number of prepared statements kept per SQLite connection.
+# query_cache_size: the number of compiled SQLAlchemy statements kept per engine.
+# read_only: opens the file with mode=ro&immutable=1, for copies of the database that no process writes.
+#   SQLite then ignores any -wal file, so a copy must be taken after the last writer closed the database.
+# pragmas: run on every new connection. WAL lets readers run during a write; synchronous=NORMAL is
+# safe with WAL; a negative cache_size is in KiB.
+DB_PROFILES = {
+    "dev": {
+        "echo": True,
+        "statement_cache_size": 128,
+        "query_cache_size": 500,
+        "read_only": False,
+        "pragmas": {"journal_mode": "WAL", "synchronous": "NORMAL"},
+    },
+    "prod": {
+        "echo": False,
+        "statement_cache_size": 512,
+        "query_cache_size": 1200,
+        "read_only": False,
+        "pragmas": {"journal_mode": "WAL", "synchronous": "NORMAL", "mmap_size": 256 * 1024 ** 2,
+                    "cache_size": -64 * 1024, "temp_store": "MEMORY"},
+    },
+    "readonly": {
+        "echo": False,
+        "statement_cache_size": 512,
+        "query_cache_size": 1200,
+        "read_only": True,
+        "pragmas": {"mmap_size": 256 * 1024 ** 2, "cache_size": -64 * 1024, "temp_store": "MEMORY",
+                    "query_only": "ON"},
+    },
+}
+DB_PROFILE_ENV = "BAVA_DB_PROFILE"
+
+def get_db_profile(profile: str = None):
+    """
+    Returns the settings of a database profile.
+
+    Parameters:
+    profile (str): A name from DB_PROFILES. Defaults to the BAVA_DB_PROFILE environment variable, or 'dev'.
+
+    Returns:
+    dict: The settings of the profile.
+
+    Raises:
+    ValueError: If the profile is unknown.
+    """
+    profile = profile or os.environ.get(DB_PROFILE_ENV, "dev")
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown database profile {profile!r}, expected one of {list(DB_PROFILES)}")
+    return DB_PROFILES[profile]
+
+def create_sql_engine(profile: str = None, db_path: str = SQL_DB_PATH):
     """
     Creates a new SQLModel engine for the database.
 
+    Parameters:
+    profile (str): A name from DB_PROFILES. Defaults to the BAVA_DB_PROFILE environment variable, or 'dev'.
+    db_path (str): The path of the SQLite database file.
+
     Returns:
     Engine: A new SQLModel engine object.
     """
-    connect_args = {"check_same_thread": False}
-    engine = create_engine(SQL_DB_URL, echo=True, connect_args=connect_args)
+    settings = get_db_profile(profile)
+    connect_args = {"check_same_thread": False, "cached_statements": settings["statement_cache_size"]}
+    if settings["read_only"]:
+        url = f"sqlite:///file:{db_path}?mode=ro&immutable=1&uri=true"
+    else:
+        url = f"sqlite:///{db_path}"
+    engine = create_engine(url, echo=settings["echo"], connect_args=connect_args, poolclass=QueuePool,
+                           pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT,
+                           query_cache_size=settings["query_cache_size"])
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in settings["pragmas"].items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
     return engine
\ No newline at end of file
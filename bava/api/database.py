@@ -3,18 +3,22 @@
 This module contains the BavaDB class, which represents a database of subjects and their metadata.
 """
 
-from typing import List
+import json
+from typing import List, Optional
 
+from fastapi.encoders import jsonable_encoder
 from sqlmodel import or_, text, Session, select
 from .config import SQL_TABLE_NAME
-from .schemas import Gender, Race, Info, Subject, MetadataDB
+from .schemas import Gender, Race, Info, Subject, SubjectRecord, MetadataDB, FilterDB
+from .metadata_cache import create_version_triggers, get_metadata
+from ..visualization3d.graph_analysis import vessel_mask_from_names
 
 class BavaDB:
     """
         A class representing a database of subjects and their metadata.
 
     Attributes:
-        subjects (List[Subject]): A list of Subject objects.
+        subjects (List[dict]): The SubjectRecord fields of the subjects.
         metadata (MetadataDB): A MetadataDB object containing metadata for the subjects.
         db_session (Session): A SQLModel Session object for interacting with the database.
 
@@ -27,8 +31,10 @@ class BavaDB:
             Returns an Info object containing the minimum, maximum, and average values for the specified column.
         to_dict(self):
             Returns a dictionary representation of the BavaDB object.
+        from_api(cls, api_url, fields, page_size, client):
+            Creates a BavaDB object from the paginated subject listing of the API.
     """
-    subjects: List[Subject] = []
+    subjects: List[dict] = []
     metadata: MetadataDB = MetadataDB()
     db_session: Session = None
 
@@ -38,7 +44,7 @@ class BavaDB:
 
         Args:
             db_session (Session): A SQLAlchemy Session object for interacting with the database.
-            subjects (List[Subject]): A list of Subject objects.
+            subjects (List[dict]): The SubjectRecord fields of the subjects.
             metadata (dict): A dictionary containing metadata for the subjects.
         """
         if subjects and metadata:
@@ -47,7 +53,7 @@ class BavaDB:
 
         elif db_session:
             self.db_session = db_session
-            self.subjects = self.db_session.exec(select(Subject)).all()
+            self.subjects = [dict(row._mapping) for row in self.db_session.execute(select_subject_fields())]
             self.create_metadata_db()
         
         else:
@@ -55,16 +61,10 @@ class BavaDB:
     
     def create_metadata_db(self):
         """
-        Populates the metadata object with information from the database.
+        Populates the metadata object with information from the database, computed by one query and
+        cached until subjects change (see bava.api.metadata_cache).
         """
-        self.metadata.age = self.get_column_info ("Age")
-        self.metadata.sbp = self.get_column_info("SBP")
-        self.metadata.dbp = self.get_column_info("DBP")
-        self.metadata.tc = self.get_column_info("TC")
-        self.metadata.tg = self.get_column_info("TG")
-        self.metadata.hdl = self.get_column_info("HDL")
-        self.metadata.ldl = self.get_column_info("LDL")
-        self.metadata.framingham_risk = self.get_column_info("Framingham_Risk")
+        self.metadata = get_metadata(self.db_session)
 
     def get_column_info(self, column: str):
         """
@@ -76,11 +76,7 @@ class BavaDB:
         Returns:
             An Info object containing the minimum, maximum, and average values for the specified column.
         """
-        info = Info()
-        info.min = self.db_session.exec(text(f"SELECT MIN({column}) FROM {SQL_TABLE_NAME}")).all()[0][0]
-        info.max = self.db_session.exec(text(f"SELECT MAX({column}) FROM {SQL_TABLE_NAME}")).all()[0][0]
-        info.avg = self.db_session.exec(text(f"SELECT AVG({column}) FROM {SQL_TABLE_NAME}")).all()[0][0]
-        return info
+        return get_column_info(self.db_session, column)
     
     def to_dict(self):
         """
@@ -99,15 +95,150 @@ class BavaDB:
         """
         """
         return cls(**db_dict)
+
+    @classmethod
+    def from_api(cls, api_url: str, fields: Optional[List[str]] = None, page_size: int = 1000, client=None):
+        """
+        Creates a BavaDB object from the paginated GET /subjects/ listing of the API.
+
+        Only the requested fields of the subjects are transferred, and the pages are followed until
+        the listing ends.
+
+        Args:
+            api_url (str): The URL of the FastAPI server.
+            fields (List[str]): The Subject fields to retrieve. Defaults to the SubjectRecord fields.
+            page_size (int): The number of subjects requested at a time.
+            client: An object with a requests-style get(url, params) method, e.g. a requests.Session
+                to reuse one connection. Defaults to the requests module.
+
+        Returns:
+            A BavaDB object whose subjects are dictionaries of the requested fields.
+        """
+        if client is None:
+            # Only the pages need an HTTP client, not the API server
+            import requests as client
+        params = {"limit": page_size}
+        if fields:
+            params["fields"] = ",".join(fields)
+        subjects, metadata, cursor = [], None, None
+        while True:
+            page = client.get(f"{api_url}/subjects/", params=dict(params, after=cursor) if cursor else params)
+            page.raise_for_status()
+            page = page.json()
+            subjects.extend(page["subjects"])
+            metadata = metadata or page.get("metadata")
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return cls(subjects=subjects, metadata=metadata)
     
+def get_column_info(session: Session, column: str):
+    """
+    Returns an Info object containing the minimum, maximum, and average values for the specified column.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        column (str): The name of the column to retrieve information for.
+
+    Returns:
+        An Info object containing the minimum, maximum, and average values for the specified column.
+    """
+    info = Info()
+    info.min = session.exec(text(f"SELECT MIN({column}) FROM {SQL_TABLE_NAME}")).all()[0][0]
+    info.max = session.exec(text(f"SELECT MAX({column}) FROM {SQL_TABLE_NAME}")).all()[0][0]
+    info.avg = session.exec(text(f"SELECT AVG({column}) FROM {SQL_TABLE_NAME}")).all()[0][0]
+    return info
+
+SUBJECT_RECORD_FIELDS = list(SubjectRecord.__fields__)
+
+# Indexes that earlier versions of the model created and that no query uses
+OBSOLETE_INDEXES = ["ix_subjects_vessel_mask"]
+
+def select_subject_fields(fields: Optional[List[str]] = None):
+    """
+    Builds a statement selecting only the given columns of the subjects, ordered by ID.
+
+    Args:
+        fields (List[str]): The Subject fields to select. Defaults to the SubjectRecord fields.
+            The ID is always selected, since it is the pagination cursor.
+
+    Returns:
+        The select statement.
+
+    Raises:
+        ValueError: If a field is not a column of the subjects table.
+    """
+    fields = list(fields) if fields else SUBJECT_RECORD_FIELDS
+    columns = Subject.__table__.columns
+    unknown = [field for field in fields if field not in columns]
+    if unknown:
+        raise ValueError(f"Unknown subject fields: {unknown}")
+    fields = ["ID"] + [field for field in dict.fromkeys(fields) if field != "ID"]
+    return select(*[getattr(Subject, field) for field in fields]).order_by(Subject.ID)
+
+def get_subject_fields(session: Session, subject_id: str, fields: List[str]):
+    """
+    Reads only the given columns of one subject.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        subject_id (str): The ID of the subject.
+        fields (List[str]): The Subject fields to read, see `select_subject_fields`.
+
+    Returns:
+        A row with the ID and the requested fields as attributes, or None if the subject is not found.
+
+    Raises:
+        ValueError: If a field is not a column of the subjects table.
+    """
+    return session.execute(select_subject_fields(fields).where(Subject.ID == subject_id)).first()
+
+def stream_subject_page(session: Session, fields: Optional[List[str]] = None, limit: int = 1000,
+                        after: Optional[str] = None, include_metadata: bool = False, batch_size: int = 500):
+    """
+    Streams a page of the subject listing as JSON text, fetching and encoding the rows in batches.
+
+    The page is {"subjects": [...], "next_cursor": ..., "metadata": ...}, where "next_cursor" is the ID
+    to pass as `after` for the next page, or null on the last page, and "metadata" is only present
+    if requested.
+
+    Args:
+        session (Session): A SQLModel Session object, which must stay open while the page is consumed.
+        fields (List[str]): The Subject fields to list, see `select_subject_fields`.
+        limit (int): The largest number of subjects in the page.
+        after (str): Only subjects with a larger ID are listed.
+        include_metadata (bool): Whether to add the column statistics, e.g. for the first page.
+        batch_size (int): The number of rows fetched and encoded at a time.
+
+    Returns:
+        An iterator over the chunks of the JSON document.
+
+    Raises:
+        ValueError: If a field is unknown, before anything is streamed.
+    """
+    statement = select_subject_fields(fields)
+    if after is not None:
+        statement = statement.where(Subject.ID > after)
+    statement = statement.limit(limit).execution_options(stream_results=True)
+
+    def chunks():
+        yield '{"subjects":['
+        count, last_id = 0, None
+        for rows in session.execute(statement).partitions(batch_size):
+            records = [json.dumps(jsonable_encoder(dict(row._mapping))) for row in rows]
+            yield ("," if count else "") + ",".join(records)
+            count, last_id = count + len(rows), rows[-1].ID
+        yield f'],"next_cursor":{json.dumps(last_id if count == limit else None)}'
+        if include_metadata:
+            yield f',"metadata":{get_metadata(session).json()}'
+        yield '}'
+
+    return chunks()
+
 def filter_dataset(statement, datasets: List[str]):
     """
+    Filters on the indexed dataset column, see `dataset_name`.
     """
-    dataset_conditions = []
-    for dataset in datasets:
-        dataset_conditions.append(f"{SQL_TABLE_NAME}.ID LIKE \'{dataset}%\'")
-    sql_or_statement = text("(" + " OR ".join(dataset_conditions) + ")")
-    return statement.where(or_(sql_or_statement))
+    return statement.where(Subject.dataset.in_(datasets))
 
 def filter_age(statement, min: int, max: int):
     """
@@ -175,6 +306,26 @@ def filter_framingham_risk(statement, min: float, max: float):
     return statement.where(Subject.Framingham_Risk >= min, 
                            Subject.Framingham_Risk < max)
 
+def filter_max_stenosis(statement, min: float, max: float):
+    """
+    """
+    return statement.where(Subject.max_stenosis >= min, Subject.max_stenosis < max)
+
+def filter_vessels(statement, has_vessels: List[str], lacks_vessels: List[str]):
+    """
+    Filters on the vessel-presence bitmask with bitwise conditions.
+
+    Raises:
+        ValueError: If a vessel name is unknown.
+    """
+    if has_vessels:
+        required_mask = vessel_mask_from_names(has_vessels)
+        statement = statement.where(Subject.vessel_mask.op('&')(required_mask) == required_mask)
+    if lacks_vessels:
+        excluded_mask = vessel_mask_from_names(lacks_vessels)
+        statement = statement.where(Subject.vessel_mask.op('&')(excluded_mask) == 0)
+    return statement
+
 def filter_gender(statement, genders: List[Gender]):
     """
     """
@@ -192,3 +343,68 @@ def filter_race(statement, races: List[Race]):
         race_conditions.append(f"{SQL_TABLE_NAME}.Race == \'{race.name}\'")
     sql_or_statement = text("(" + " OR ".join(race_conditions) + ")")
     return statement.where(or_(sql_or_statement))
+
+def apply_filters(statement, filter_options: FilterDB):
+    """
+    Applies all the filters of a FilterDB object to a select statement.
+
+    Args:
+        statement: A select statement on the subjects table, e.g. select(Subject) or select(Subject.ID).
+        filter_options (FilterDB): A FilterDB object containing the filter options.
+
+    Returns:
+        The filtered statement.
+
+    Raises:
+        ValueError: If a vessel name is unknown.
+    """
+    statement = filter_dataset(statement, filter_options.datasets)
+    statement = filter_age(statement, filter_options.age[0], filter_options.age[1])
+    statement = filter_diabetes(statement, filter_options.diabetes)
+    statement = filter_gender(statement, filter_options.genders)
+    statement = filter_race(statement, filter_options.races)
+    statement = filter_hypertension(statement, filter_options.hypertension)
+    statement = filter_dbp(statement, filter_options.dbp[0], filter_options.dbp[1])
+    statement = filter_sbp(statement, filter_options.sbp[0], filter_options.sbp[1])
+    statement = filter_tc(statement, filter_options.tc[0], filter_options.tc[1])
+    statement = filter_tg(statement, filter_options.tg[0], filter_options.tg[1])
+    statement = filter_framingham_risk(statement, filter_options.framingham_risk[0], filter_options.framingham_risk[1])
+    statement = filter_hdl(statement, filter_options.hdl[0], filter_options.hdl[1])
+    statement = filter_ldl(statement, filter_options.ldl[0], filter_options.ldl[1])
+    if filter_options.max_stenosis:
+        statement = filter_max_stenosis(statement, filter_options.max_stenosis[0], filter_options.max_stenosis[1])
+    return filter_vessels(statement, filter_options.has_vessels, filter_options.lacks_vessels)
+
+def migrate_subjects_table(engine):
+    """
+    Adds the columns and indexes of the Subject model that are missing from an existing subjects table.
+
+    SQLModel.metadata.create_all only creates missing tables, so databases created before a column
+    was added to the model are brought up to date here. The dataset column is filled in SQL, the
+    other new columns are left NULL until they are backfilled (see bava.api.ingest). When indexes are
+    created, the table statistics are refreshed so that the query planner can choose between them.
+    Obsolete indexes are dropped, as they only slow down writes. The version counter that tells the
+    metadata cache that subjects changed is created with its triggers.
+
+    Args:
+        engine (Engine): The SQLModel engine of the database.
+    """
+    table = Subject.__table__
+    with engine.begin() as connection:
+        existing_columns = {row[1] for row in connection.execute(text(f"PRAGMA table_info({SQL_TABLE_NAME})"))}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {SQL_TABLE_NAME} ADD COLUMN {column.name} {column_type}"))
+        # The SQL counterpart of dataset_name
+        connection.execute(text(f"UPDATE {SQL_TABLE_NAME} SET dataset = substr(ID, 1, instr(ID || '_', '_') - 1) "
+                                "WHERE dataset IS NULL"))
+        existing_indexes = {row[1] for row in connection.execute(text(f"PRAGMA index_list({SQL_TABLE_NAME})"))}
+        missing_indexes = [index for index in table.indexes if index.name not in existing_indexes]
+        for index in missing_indexes:
+            index.create(connection)
+        if missing_indexes:
+            connection.execute(text(f"ANALYZE {SQL_TABLE_NAME}"))
+        for index_name in existing_indexes.intersection(OBSOLETE_INDEXES):
+            connection.execute(text(f"DROP INDEX {index_name}"))
+        create_version_triggers(connection)
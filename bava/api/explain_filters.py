@@ -0,0 +1,61 @@
+"""
+This module prints the SQLite query plans of representative /filter/ queries, to check which
+indexes of the subjects table they use.
+
+The database is migrated first, as at API startup, so the plans are those the API will get. Run
+from the repository root with:
+
+    python -m bava.api.explain_filters
+"""
+from sqlmodel import SQLModel, text
+
+from .config import create_sql_engine
+from .database import apply_filters, migrate_subjects_table, select_subject_fields
+from .schemas import FilterDB
+
+ALL_RANGES = {"age": (0, 200), "sbp": (0, 300), "dbp": (0, 300), "tc": (0, 500), "tg": (0, 500), "hdl": (0, 500),
+              "ldl": (0, 500), "framingham_risk": (0, 1)}
+
+REPRESENTATIVE_FILTERS = {
+    "all subjects": FilterDB(datasets=["CROP"], **ALL_RANGES),
+    "one dataset, age 60-70": FilterDB(datasets=["CROP"], **dict(ALL_RANGES, age=(60, 70))),
+    "high systolic pressure": FilterDB(datasets=["CROP"], **dict(ALL_RANGES, sbp=(160, 300))),
+    "high Framingham risk": FilterDB(datasets=["CROP"], **dict(ALL_RANGES, framingham_risk=(0.3, 1))),
+    "severe stenosis": FilterDB(datasets=["CROP"], max_stenosis=(0.5, 1), **ALL_RANGES),
+    "missing AComm": FilterDB(datasets=["CROP"], lacks_vessels=["AComm"], **ALL_RANGES),
+}
+
+
+def explain_filter(connection, filter_options: FilterDB):
+    """
+    Returns the query plan of the /filter/ query of a FilterDB object.
+
+    Args:
+        connection (Connection): A connection to the SQLite database.
+        filter_options (FilterDB): The filter options.
+
+    Returns:
+        The details of the plan steps, e.g. 'SEARCH subjects USING INDEX ix_subjects_dataset_Age (...)'.
+    """
+    statement = apply_filters(select_subject_fields(), filter_options)
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+
+
+def main():
+    """
+    Prints the query plans of the representative filters on the configured database.
+    """
+    engine = create_sql_engine()
+    engine.echo = False
+    SQLModel.metadata.create_all(engine)
+    migrate_subjects_table(engine)
+    with engine.connect() as connection:
+        for name, filter_options in REPRESENTATIVE_FILTERS.items():
+            print(name)
+            for step in explain_filter(connection, filter_options):
+                print(f"    {step}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+This module keeps the graphs and spatial indexes of recently used tracings in process, for region
+of interest requests.
+
+A region request only needs the subject's graph and its spatial index to crop, and features are then
+calculated for the region alone. Building the graph is what a request would otherwise spend most of
+its time on, so the graphs are cached by the content hash of the tracing (the tracing_hash column):
+an edited tracing gets a new entry, and a cached entry never needs to be invalidated. The least
+recently used entries are dropped beyond GRAPH_CACHE_SIZE.
+"""
+import threading
+from collections import OrderedDict
+
+from .config import GRAPH_CACHE_SIZE
+from ..visualization3d.spatial_index import SpatialIndex
+from ..visualization3d.swc2graph import swc2graph
+
+
+class GraphCache:
+    """
+    A thread-safe LRU cache of the graphs and spatial indexes of tracings.
+
+    Attributes:
+        max_entries (int): The largest number of tracings kept.
+
+    Methods:
+        get(digest): Returns the graph and spatial index of a tracing, or None.
+        build(digest, swc_string): Builds and caches the graph and spatial index of a tracing.
+        clear(): Drops all entries.
+    """
+
+    def __init__(self, max_entries: int = GRAPH_CACHE_SIZE):
+        """
+        Creates an empty cache.
+
+        Args:
+            max_entries (int): The largest number of tracings kept.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str):
+        """
+        Returns the cached graph and spatial index of a tracing.
+
+        The cached graphs are shared between callers and must not be modified.
+
+        Args:
+            digest (str): The content hash of the tracing.
+
+        Returns:
+            A (networkx.Graph, SpatialIndex) pair, or None if the tracing is not cached.
+        """
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return self._entries[digest]
+        return None
+
+    def build(self, digest: str, swc_string: str):
+        """
+        Builds the graph and spatial index of a tracing and caches them.
+
+        Args:
+            digest (str): The content hash of the tracing.
+            swc_string (str): The SWC string of the tracing.
+
+        Returns:
+            A (networkx.Graph, SpatialIndex) pair.
+        """
+        # Built outside the lock, so that other tracings are served meanwhile
+        graph = swc2graph(swc_string)
+        entry = (graph, SpatialIndex(graph))
+        with self._lock:
+            self._entries[digest] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """
+        Drops all entries.
+        """
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,93 @@
+"""
+This module computes the columns of the subjects table that are derived from a subject's tracing.
+
+Derived columns are filled when a subject is ingested, so that cohort filters on them are plain
+column queries instead of parsing every tracing on each request. Databases created before a derived
+column existed are migrated at API startup and can then be backfilled from the repository root with:
+
+    python -m bava.api.ingest
+"""
+from sqlmodel import Session, SQLModel, or_, select, update
+
+from .config import create_sql_engine
+from .database import migrate_subjects_table
+from .schemas import Subject
+from ..visualization3d.figure_cache import content_hash
+from ..visualization3d.swc2graph import parse_swc, swc_data2graph
+from ..visualization3d.graph_analysis import vessel_presence_mask
+from ..visualization3d.radius_profile import screen_stenosis, summarize_stenosis
+
+DERIVED_COLUMNS = ["stenosis_count", "max_stenosis", "vessel_mask", "tracing_hash"]
+
+
+def compute_derived_columns(swc_string: str):
+    """
+    Computes the derived column values of a subject from its tracing.
+
+    Args:
+        swc_string (str): The SWC string of the subject (the 'unstructured_data' column).
+
+    Returns:
+        A dictionary mapping each derived column name to its value.
+    """
+    swc_data = parse_swc(swc_string)
+    stenosis = summarize_stenosis(screen_stenosis(swc_data))
+    return {
+        "stenosis_count": stenosis["stenosis_count"],
+        "max_stenosis": stenosis["max_stenosis"],
+        "vessel_mask": vessel_presence_mask(swc_data2graph(swc_data)),
+        "tracing_hash": content_hash(swc_string),
+    }
+
+
+def ingest_subject(session: Session, subject: Subject):
+    """
+    Fills the derived columns of a subject and adds it to the session.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        subject (Subject): The subject to ingest. Its 'unstructured_data' must be set.
+    """
+    for column, value in compute_derived_columns(subject.unstructured_data).items():
+        setattr(subject, column, value)
+    session.add(subject)
+
+
+def backfill_derived_columns(session: Session, batch_size: int = 50):
+    """
+    Computes the derived columns of every subject for which any of them is missing.
+
+    Tracings are loaded in batches so that memory does not grow with the cohort size.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        batch_size (int): The number of subjects loaded and committed at a time.
+
+    Returns:
+        The number of subjects updated.
+    """
+    missing = or_(*[getattr(Subject, column) == None for column in DERIVED_COLUMNS])  # noqa: E711
+    subject_ids = session.exec(select(Subject.ID).where(missing, Subject.unstructured_data != None)).all()  # noqa: E711
+    for start in range(0, len(subject_ids), batch_size):
+        batch_ids = subject_ids[start:start + batch_size]
+        rows = session.exec(select(Subject.ID, Subject.unstructured_data).where(Subject.ID.in_(batch_ids))).all()
+        for subject_id, swc_string in rows:
+            session.exec(update(Subject).where(Subject.ID == subject_id).values(**compute_derived_columns(swc_string)))
+        session.commit()
+    return len(subject_ids)
+
+
+def main():
+    """
+    Migrates the configured database and backfills its derived columns.
+    """
+    engine = create_sql_engine()
+    SQLModel.metadata.create_all(engine)
+    migrate_subjects_table(engine)
+    with Session(engine) as session:
+        updated = backfill_derived_columns(session)
+    print(f"Backfilled derived columns for {updated} subjects")
+
+
+if __name__ == "__main__":
+    main()
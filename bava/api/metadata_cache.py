@@ -0,0 +1,130 @@
+"""
+This module computes the cohort metadata (minimum, maximum and average of the numeric subject columns)
+and caches it in process.
+
+All statistics are computed by one aggregate query. The result is cached per engine together with the
+version of the subjects table, a one-row counter that triggers on the subjects table increment on every
+insert, update and delete (see `create_version_triggers`, run by `migrate_subjects_table`). Checking the
+counter is a primary-key read, so changes committed by other processes (another API worker, the
+bava.api.ingest CLI) or with raw SQL are seen on the next lookup.
+
+Statistics computed while the session has uncommitted subject changes include them and are not cached.
+Databases that were not migrated have no counter, and their statistics are not cached either.
+"""
+import threading
+import weakref
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, func, select, text
+
+from .config import SQL_TABLE_NAME
+from .schemas import Info, Subject, MetadataDB
+
+# MetadataDB field -> Subject column
+METADATA_COLUMNS = {
+    "age": "Age",
+    "sbp": "SBP",
+    "dbp": "DBP",
+    "tc": "TC",
+    "tg": "TG",
+    "hdl": "HDL",
+    "ldl": "LDL",
+    "framingham_risk": "Framingham_Risk",
+}
+VERSION_TABLE = "subjects_version"
+
+_cache = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def create_version_triggers(connection):
+    """
+    Creates the version counter of the subjects table and the triggers that increment it.
+
+    Args:
+        connection (Connection): A connection to the SQLite database, in a transaction.
+    """
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} "
+                            "(id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)"))
+    connection.execute(text(f"INSERT OR IGNORE INTO {VERSION_TABLE} VALUES (1, 0)"))
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {VERSION_TABLE}_after_{operation.lower()} AFTER {operation} ON "
+            f"{SQL_TABLE_NAME} BEGIN UPDATE {VERSION_TABLE} SET version = version + 1 WHERE id = 1; END"))
+
+
+def read_version(session: Session):
+    """
+    Reads the version counter of the subjects table.
+
+    Args:
+        session (Session): A SQLModel Session object.
+
+    Returns:
+        The version, or None if the database has not been migrated.
+    """
+    try:
+        return session.execute(text(f"SELECT version FROM {VERSION_TABLE} WHERE id = 1")).scalar()
+    except OperationalError:
+        return None
+
+
+def has_uncommitted_changes(session: Session):
+    """
+    Returns whether the session has pending objects or has written in its current transaction.
+    """
+    if session.new or session.dirty or session.deleted:
+        return True
+    if not session.in_transaction():
+        return False
+    # The sqlite3 module only opens a transaction before a statement that writes
+    return session.connection().connection.dbapi_connection.in_transaction
+
+
+def query_metadata(session: Session):
+    """
+    Computes the cohort metadata with a single aggregate query.
+
+    Args:
+        session (Session): A SQLModel Session object.
+
+    Returns:
+        A MetadataDB object. Statistics of an empty table are left at their defaults.
+    """
+    aggregates = []
+    for column in METADATA_COLUMNS.values():
+        attribute = getattr(Subject, column)
+        aggregates += [func.min(attribute), func.max(attribute), func.avg(attribute)]
+    row = session.execute(select(*aggregates)).one()
+    metadata = {}
+    for i, field in enumerate(METADATA_COLUMNS):
+        values = dict(zip(("min", "max", "avg"), row[3 * i:3 * i + 3]))
+        metadata[field] = Info(**{key: value for key, value in values.items() if value is not None})
+    return MetadataDB(**metadata)
+
+
+def get_metadata(session: Session):
+    """
+    Returns the cohort metadata of the session's database, from the cache if it is current.
+
+    Args:
+        session (Session): A SQLModel Session object.
+
+    Returns:
+        A MetadataDB object, shared between callers; do not modify it.
+    """
+    if has_uncommitted_changes(session):
+        return query_metadata(session)
+    version = read_version(session)
+    if version is None:
+        return query_metadata(session)
+    engine = session.get_bind()
+    with _lock:
+        cached = _cache.get(engine)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    # Read after the version, so a commit in between can only make the entry look older than it is
+    metadata = query_metadata(session)
+    with _lock:
+        _cache[engine] = (version, metadata)
+    return metadata
@@ -0,0 +1,78 @@
+"""
+This module fills the figure cache ahead of time with the figures of the most viewed subjects,
+so that opening them on the Data Visualization page only reads a file.
+
+Run from the repository root with:
+
+    python -m bava.api.prefill_figures --count 50
+"""
+import argparse
+
+from sqlmodel import Session, select
+
+from .config import create_sql_engine, FIGURE_CACHE_DIR, FIGURE_CACHE_MAX_BYTES, DEFAULT_FIGURE_OPTIONS
+from .schemas import Subject
+from ..visualization3d.figure_cache import FigureCache, content_hash
+from ..visualization3d.figure_encoding import encode_figure
+from ..visualization3d.subject_graph import SubjectGraph
+
+
+def build_figure_json(swc_string: str, options: dict = DEFAULT_FIGURE_OPTIONS):
+    """
+    Builds the serialized figure of a subject.
+
+    Args:
+        swc_string (str): The SWC string of the subject.
+        options (dict): The keyword arguments of SubjectGraph.create_interactive_plot.
+
+    Returns:
+        The figure JSON string, with its arrays encoded as typed arrays.
+    """
+    return encode_figure(SubjectGraph(swc_string).create_interactive_plot(**options))
+
+
+def prefill_popular_figures(session: Session, cache: FigureCache, count: int, options: dict = DEFAULT_FIGURE_OPTIONS):
+    """
+    Builds the missing figures of the most viewed subjects.
+
+    Figures are looked up by the stored hash of each tracing, so only the tracings of subjects whose
+    figure is missing (or whose hash has not been backfilled) are read, one at a time.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        cache (FigureCache): The figure cache to fill.
+        count (int): The number of most viewed subjects.
+        options (dict): The plot options of the figures.
+
+    Returns:
+        The number of figures built.
+    """
+    statement = select(Subject.ID, Subject.tracing_hash).where(Subject.ID.in_(cache.popular_subjects(count)),
+                                                               Subject.unstructured_data != None)  # noqa: E711
+    built = 0
+    for subject_id, digest in session.exec(statement).all():
+        if digest is not None and cache.contains(subject_id, digest, options):
+            continue
+        swc_string = session.exec(select(Subject.unstructured_data).where(Subject.ID == subject_id)).one()
+        digest = digest or content_hash(swc_string)
+        if not cache.contains(subject_id, digest, options):
+            cache.put(subject_id, digest, options, build_figure_json(swc_string, options))
+            built += 1
+    return built
+
+
+def main():
+    """
+    Prefills the figure cache of the configured database.
+    """
+    parser = argparse.ArgumentParser(description="Prefill the figure cache with the most viewed subjects")
+    parser.add_argument("--count", type=int, default=50, help="the number of most viewed subjects")
+    args = parser.parse_args()
+    cache = FigureCache(FIGURE_CACHE_DIR, max_bytes=FIGURE_CACHE_MAX_BYTES)
+    with Session(create_sql_engine()) as session:
+        built = prefill_popular_figures(session, cache, args.count)
+    print(f"Built {built} figures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+This module renders the thumbnails of all subjects in the background, in a process pool.
+
+Thumbnails are looked up by the stored hash of each tracing, so only the tracings of subjects whose
+thumbnail is missing (or whose hash has not been backfilled) are read from the database, in batches.
+They are rendered by the worker processes and stored by the parent process.
+
+Run from the repository root with:
+
+    python -m bava.api.render_thumbnails --workers 4
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from sqlmodel import Session, select
+
+from .config import create_sql_engine, THUMBNAIL_DIR
+from .schemas import Subject
+from ..visualization3d.figure_cache import content_hash
+from ..visualization3d.thumbnails import ThumbnailStore, render_thumbnail, THUMBNAIL_OPTIONS
+
+
+def render_missing_thumbnails(session: Session, store: ThumbnailStore, workers: int = None,
+                              options: dict = THUMBNAIL_OPTIONS, batch_size: int = 50):
+    """
+    Renders and stores the thumbnails of all subjects that do not have one yet.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        store (ThumbnailStore): The thumbnail store to fill.
+        workers (int): The number of worker processes. Defaults to the number of CPUs.
+        options (dict): The keyword arguments of render_thumbnail.
+        batch_size (int): The number of tracings loaded at a time.
+
+    Returns:
+        The number of thumbnails rendered.
+    """
+    statement = select(Subject.ID, Subject.tracing_hash).where(Subject.unstructured_data != None)  # noqa: E711
+    subject_ids = [subject_id for subject_id, digest in session.execute(statement)
+                   if digest is None or not store.contains(digest, options)]
+    render = partial(render_thumbnail, **options)
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(subject_ids), batch_size):
+            statement = select(Subject.unstructured_data).where(Subject.ID.in_(subject_ids[start:start + batch_size]))
+            # Identical tracings share one thumbnail, so each is rendered once
+            swc_strings = {content_hash(swc_string): swc_string for swc_string in session.exec(statement)}
+            swc_strings = {digest: swc_string for digest, swc_string in swc_strings.items()
+                           if not store.contains(digest, options)}
+            for digest, png in zip(swc_strings, executor.map(render, swc_strings.values())):
+                store.put(digest, png, options)
+            rendered += len(swc_strings)
+    return rendered
+
+
+def main():
+    """
+    Renders the missing thumbnails of the configured database.
+    """
+    parser = argparse.ArgumentParser(description="Render the thumbnails of all subjects")
+    parser.add_argument("--workers", type=int, default=None, help="the number of worker processes")
+    args = parser.parse_args()
+    store = ThumbnailStore(THUMBNAIL_DIR)
+    with Session(create_sql_engine()) as session:
+        rendered = render_missing_thumbnails(session, store, workers=args.workers)
+    print(f"Rendered {rendered} thumbnails")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,38 +3,119 @@ This module provides a FastAPI application for interacting with the BAVA databas
 
 The following endpoints are available:
 
-    - GET /subjects/ - Retrieves all subjects from the database.
-    - GET /subjects/{subject_id} - Retrieves a subject by its ID.
+    - GET /subjects/ - Lists the subjects page by page, with only the requested fields.
+    - GET /subjects/{subject_id} - Retrieves a subject by its ID, optionally only the requested fields.
+    - GET /metadata/ - Retrieves the minimum, maximum and average of the numeric subject columns.
     - POST /filter/ - Retrieves filtered data from the database.
+    - POST /subject_roi_features/{subject_id} - Computes features and a plot for a region of a subject.
+    - POST /atlas/ - Computes the vessel-density atlas of the subjects matching a filter.
+    - GET /thumbnails/{subject_id} - Retrieves the PNG thumbnail of a subject.
+    - GET /tracings/{subject_id} - Retrieves the SWC tracing of a subject.
 
 The module also defines a helper function for creating a new SQLAlchemy session with the database engine.
 
+The routes are coroutines, so their blocking work must not run on the event loop: database queries
+run on a pool of DB_THREADS threads, which bounds the number of concurrent queries, and the graph
+computations and rendering run on Starlette's thread pool. Sessions give their connection back to the
+pool after each query, so slow responses do not hold connections.
+
+The database profile (see bava.api.config.DB_PROFILES) is read from the BAVA_DB_PROFILE environment
+variable when the module is imported.
+
 Attributes:
     app (FastAPI): A FastAPI application object.
+    db_profile (dict): The settings of the database profile.
     engine (Engine): A SQLModel engine object for connecting to the database.
 """
+import asyncio
 import json
-from typing import List, Dict
-from fastapi import FastAPI, HTTPException, Depends
-from sqlmodel import Session, SQLModel, select
-
-from .database import (filter_dataset,
-                       filter_age, filter_race, 
-                      filter_gender, filter_diabetes,
-                      filter_hypertension, 
-                      filter_dbp, filter_sbp,
-                        filter_tc, filter_tg, filter_framingham_risk,
-                        filter_hdl, filter_ldl,
-                      BavaDB)
-from .config import create_sql_engine
-from .schemas import FilterDB, Subject, SubjectRecord, GraphicalFeatures, MorphologicalFeatures
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import undefer_group
+from sqlmodel import Session, SQLModel
+
+from .database import (apply_filters, get_subject_fields, migrate_subjects_table, select_subject_fields,
+                       stream_subject_page)
+from .metadata_cache import get_metadata
+from .config import create_sql_engine, get_db_profile, ATLAS_CACHE_DIR, THUMBNAIL_DIR, DB_THREADS
+from .schemas import (FilterDB, Subject, SubjectRecord, MetadataDB, GraphicalFeatures, MorphologicalFeatures,
+                      RegionOfInterest, RegionFeatures, AtlasRequest, Atlas)
+from .atlas_cache import get_filtered_atlas
+from .graph_cache import GraphCache
+from ..visualization3d.graph_analysis import calc_graphical_features
+from ..visualization3d.roi import crop_graph
+from ..visualization3d.subject_graph import SubjectGraph
+from ..visualization3d.figure_cache import content_hash
+from ..visualization3d.thumbnails import ThumbnailStore, render_thumbnail
 
 app = FastAPI(title="BAVA API",
               description="API to get subject information for BAVA DB",
               version="1.0.0")
 
+db_profile = get_db_profile()
 engine = create_sql_engine()
 
+graph_cache = GraphCache()
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="bava-db")
+
+async def run_in_db_thread(function, *args, **kwargs):
+    """
+    A helper function to run a blocking database call on the database threads.
+
+    Args:
+        function (callable): The function to call with the remaining arguments.
+
+    Returns:
+        The result of the function.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, partial(function, *args, **kwargs))
+
+async def iterate_in_db_thread(iterator):
+    """
+    A helper function to iterate over a blocking iterator, e.g. a streamed query, on the database threads.
+
+    Args:
+        iterator (Iterator): The iterator, advanced one item at a time.
+
+    Returns:
+        An async iterator over the items.
+    """
+    done = object()
+    while True:
+        item = await run_in_db_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+async def run_query(session: Session, function, *args, **kwargs):
+    """
+    A helper function to run a blocking query on the database threads and then close the session.
+
+    Closing the session returns its connection to the pool right away instead of after the response,
+    and keeps the objects it loaded usable. The session can still run further queries.
+
+    Args:
+        session (Session): The SQLModel Session object used by the function.
+        function (callable): The function to call with the remaining arguments.
+
+    Returns:
+        The result of the function.
+    """
+    def query():
+        try:
+            return function(*args, **kwargs)
+        finally:
+            session.close()
+
+    return await run_in_db_thread(query)
+
 async def get_session():
     """
     A helper function to create a new session with the database engine.
@@ -42,55 +123,107 @@ async def get_session():
     Returns:
         A new SQLModel Session object.
     """
-    with Session(engine) as session:
+    session = Session(engine)
+    try:
         yield session
+    finally:
+        # Not on the database threads, which may all be waiting for this connection
+        await run_in_threadpool(session.close)
 
 @app.on_event("startup")
 def on_startup():
     """
-    A function to create the database tables when the application starts up.
+    A function to create (or migrate) the database tables when the application starts up.
+
+    Read-only databases are served as they are.
     """
+    if db_profile["read_only"]:
+        return
     SQLModel.metadata.create_all(engine)
+    migrate_subjects_table(engine)
+
+@app.get("/subjects/")
+async def get_all_subjects(*, session: Session = Depends(get_session), limit: int = Query(1000, ge=1, le=100000),
+                           after: Optional[str] = None, fields: Optional[str] = None):
+    """
+    A function to list the subjects in pages ordered by ID, streamed as JSON.
 
-@app.get("/subjects/", response_model=Dict)
-async def get_all_subjects(session: Session = Depends(get_session)):
+    Only the requested columns are read, so the tracings and features are not loaded unless asked
+    for. The first page (without `after`) also carries the column statistics as "metadata".
+
+    Args:
+        session (Session): A SQLModel Session object.
+        limit (int): The largest number of subjects in the page.
+        after (str): The "next_cursor" of the previous page.
+        fields (str): Comma-separated Subject fields to list. Defaults to the SubjectRecord fields.
+
+    Returns:
+        A streamed {"subjects": [...], "next_cursor": ..., "metadata": ...} document. "next_cursor" is
+        null on the last page.
+
+    Raises:
+        HTTPException: If a field is unknown.
+    """
+    try:
+        page = stream_subject_page(session, fields=fields.split(",") if fields else None, limit=limit,
+                                   after=after, include_metadata=after is None)
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    return StreamingResponse(iterate_in_db_thread(page), media_type="application/json")
+
+@app.get("/metadata/", response_model=MetadataDB)
+async def get_cohort_metadata(session: Session = Depends(get_session)):
     """
-    A function to retrieve all subjects from the database.
+    A function to retrieve the minimum, maximum and average of the numeric subject columns.
+
+    The statistics are cached in process and only recomputed after subjects change.
 
     Args:
         session (Session): A SQLModel Session object.
 
     Returns:
-        A dictionary containing all subjects in the database along with metadata.
+        The MetadataDB of the cohort.
     """
-    bava_database = BavaDB(session)
-    return bava_database.to_dict()
+    return await run_query(session, get_metadata, session)
 
 @app.get("/subjects/{subject_id}", response_model=Subject)
-async def get_by_subject_id(*, session: Session = Depends(get_session), subject_id: str):
+async def get_by_subject_id(*, session: Session = Depends(get_session), subject_id: str,
+                            fields: Optional[str] = None):
     """
     A function to retrieve a subject by its ID.
 
     Args:
         session (Session): A SQLModel Session object.
         subject_id (str): The ID of the subject to retrieve.
+        fields (str): Comma-separated Subject fields to return. Defaults to the whole subject.
 
     Returns:
-        The subject with the specified ID.
+        The subject with the specified ID, or its ID and the requested fields.
 
     Raises:
-        HTTPException: If no subject with the specified ID is found.
+        HTTPException: If no subject with the specified ID is found, or a field is unknown.
     """
-    subject = session.get(Subject, subject_id)
+    not_found = HTTPException(status_code=404, detail=f"Subject with id:{subject_id} not found")
+    if fields:
+        # Only the requested columns are read, e.g. without the tracing
+        try:
+            subject = await run_query(session, get_subject_fields, session, subject_id, fields.split(","))
+        except ValueError as error:
+            raise HTTPException(status_code=422, detail=str(error))
+        if not subject:
+            raise not_found
+        return JSONResponse(jsonable_encoder(dict(subject._mapping)))
+    # The whole subject is returned, so the deferred columns are read with the row
+    subject = await run_query(session, session.get, Subject, subject_id, options=[undefer_group("heavy")])
     if not subject:
-        raise HTTPException(status_code=404, detail=f"Subject with id:{subject_id} not found")
+        raise not_found
     return subject
 
 @app.get("/subject_morphological_features/{subject_id}", response_model=MorphologicalFeatures)
 async def get_subject_morphological_features(*, session: Session = Depends(get_session), subject_id: str):
     """
     """
-    subject = session.get(Subject, subject_id)
+    subject = await run_query(session, get_subject_fields, session, subject_id, ["morphological_features"])
     if not subject:
         raise HTTPException(status_code=404, detail=f"Subject with id:{subject_id} not found")
     return json.loads(subject.morphological_features)
@@ -98,11 +231,107 @@ async def get_subject_morphological_features(*, session: Session = Depends(get_s
 @app.get("/subject_graphical_features/{subject_id}", response_model=GraphicalFeatures)
 async def get_subject_graphical_features(*, session: Session = Depends(get_session), subject_id: str):
     """
+    A function to compute the graphical features of a subject's artery network.
+
+    Graphical features are not stored with the subjects, so they are computed from the subject's
+    graph, which is shared with the region of interest requests through the graph cache.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        subject_id (str): The ID of the subject.
+
+    Returns:
+        The GraphicalFeatures of the subject.
+
+    Raises:
+        HTTPException: If the subject is not found or has no tracing.
     """
-    subject = session.get(Subject, subject_id)
-    if not subject:
+    entry = await get_subject_graph(session, subject_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail=f"Subject with id:{subject_id} not found")
-    return json.loads(subject.graphical_features)
+    graph, _ = entry
+    return await run_in_threadpool(calc_graphical_features, graph)
+
+@app.post("/subject_roi_features/{subject_id}", response_model=RegionFeatures)
+async def get_subject_roi_features(*, session: Session = Depends(get_session), subject_id: str,
+                                   region: RegionOfInterest):
+    """
+    A function to compute the features of a region of a subject's artery network.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        subject_id (str): The ID of the subject.
+        region (RegionOfInterest): The sphere, box and/or vessel types to crop to.
+
+    Returns:
+        The morphological and graphical features of the region, and optionally its Plotly figure.
+
+    Raises:
+        HTTPException: If the subject is not found, or the region is invalid or empty.
+    """
+    entry = await get_subject_graph(session, subject_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Subject with id:{subject_id} not found")
+    try:
+        return await run_in_threadpool(compute_region_features, *entry, region)
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+
+async def get_subject_graph(session: Session, subject_id: str):
+    """
+    A helper function to get the graph and spatial index of a subject from the graph cache.
+
+    Only the stored hash of the tracing is read on a hit; the tracing is read and its graph built,
+    off the event loop, on a miss.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        subject_id (str): The ID of the subject.
+
+    Returns:
+        A (networkx.Graph, SpatialIndex) pair, which must not be modified, or None if the subject is not
+        found or has no tracing.
+    """
+    subject = await run_query(session, get_subject_fields, session, subject_id, ["tracing_hash"])
+    if not subject:
+        return None
+    entry = graph_cache.get(subject.tracing_hash) if subject.tracing_hash else None
+    if entry is None:
+        swc_string = await run_query(session, get_tracing, session, subject_id)
+        if not swc_string:
+            return None
+        entry = await run_in_threadpool(graph_cache.build, content_hash(swc_string), swc_string)
+    return entry
+
+def compute_region_features(graph, spatial_index, region: RegionOfInterest):
+    """
+    A helper function to crop a graph to a region and compute the features of the region.
+
+    Only the region's features are calculated, not those of the whole graph.
+
+    Args:
+        graph (Graph): The graph of the subject, which is not modified.
+        spatial_index (SpatialIndex): The spatial index of the graph.
+        region (RegionOfInterest): The sphere, box and/or vessel types to crop to.
+
+    Returns:
+        The RegionFeatures of the region.
+
+    Raises:
+        ValueError: If the region is invalid or empty.
+    """
+    cropped = crop_graph(graph, spatial_index, center=region.center, radius=region.radius, lower=region.lower,
+                         upper=region.upper, ves_types=region.ves_types)
+    if cropped.number_of_edges() == 0:
+        raise ValueError("The region of interest does not contain any vessels")
+    roi_graph = SubjectGraph.from_graph(cropped)
+    return RegionFeatures(
+        num_nodes=roi_graph.graph.number_of_nodes(),
+        num_edges=roi_graph.graph.number_of_edges(),
+        morphological_features=roi_graph.morphological_features,
+        graphical_features={key: float(value) if math.isfinite(value) else None
+                            for key, value in roi_graph.graphical_features.items()},
+        figure=json.loads(roi_graph.create_interactive_plot().to_json()) if region.include_figure else None)
 
 
 @app.post("/filter/", response_model=List[SubjectRecord])
@@ -117,19 +346,111 @@ async def get_filtered_data(*, session: Session = Depends(get_session), filter_o
     Returns:
         A list of SubjectRecord objects that match the specified filters.
     """
-    statement = select(Subject)
-    statement = filter_dataset(statement, filter_options.datasets)
-    statement = filter_age(statement, filter_options.age[0], filter_options.age[1])
-    statement = filter_diabetes(statement, filter_options.diabetes)
-    statement = filter_gender(statement, filter_options.genders)
-    statement = filter_race(statement, filter_options.races)
-    statement = filter_hypertension(statement, filter_options.hypertension)
-    statement = filter_dbp(statement, filter_options.dbp[0], filter_options.dbp[1])
-    statement = filter_sbp(statement, filter_options.sbp[0], filter_options.sbp[1])
-    statement = filter_tc(statement, filter_options.tc[0], filter_options.tc[1])
-    statement = filter_tg(statement, filter_options.tg[0], filter_options.tg[1])
-    statement = filter_framingham_risk(statement, filter_options.framingham_risk[0], filter_options.framingham_risk[1])
-    statement = filter_hdl(statement, filter_options.hdl[0], filter_options.hdl[1])
-    statement = filter_ldl(statement, filter_options.ldl[0], filter_options.ldl[1])
-    results = session.exec(statement).all()
-    return results
+    try:
+        statement = apply_filters(select_subject_fields(), filter_options)
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    return await run_query(session, lambda: [dict(row._mapping) for row in session.execute(statement)])
+
+
+@app.post("/atlas/", response_model=Atlas)
+async def get_atlas(*, session: Session = Depends(get_session), atlas_request: AtlasRequest):
+    """
+    A function to compute the population vessel-density atlas of the subjects matching a filter.
+
+    Atlases are cached per filter, so repeated requests for the same cohort are served from disk.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        atlas_request (AtlasRequest): The filter selecting the subjects and the voxel size.
+
+    Returns:
+        The occupied voxels of the atlas with their occupancy and mean radius.
+
+    Raises:
+        HTTPException: If the filter or the voxel size is invalid.
+    """
+    try:
+        atlas = await run_query(session, get_filtered_atlas, session, atlas_request.filters, atlas_request.voxel_size,
+                                cache_dir=ATLAS_CACHE_DIR)
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    return atlas.to_dict()
+
+
+@app.get("/thumbnails/{subject_id}", response_class=Response)
+async def get_thumbnail(*, session: Session = Depends(get_session), subject_id: str,
+                        if_none_match: str = Header(None)):
+    """
+    A function to retrieve the PNG thumbnail of a subject.
+
+    Thumbnails are normally rendered ahead of time by bava.api.render_thumbnails; a missing one is
+    rendered and stored on the first request. The ETag is the content address of the thumbnail, built
+    from the stored hash of the tracing, so the tracing itself is only read to render a missing thumbnail.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        subject_id (str): The ID of the subject.
+        if_none_match (str): The ETag of a thumbnail the client already has.
+
+    Returns:
+        The PNG image, or an empty 304 response if the client's copy is current.
+
+    Raises:
+        HTTPException: If the subject is not found or has no tracing.
+    """
+    not_found = HTTPException(status_code=404, detail=f"Thumbnail of subject with id:{subject_id} not found")
+    subject = await run_query(session, get_subject_fields, session, subject_id, ["tracing_hash"])
+    if not subject:
+        raise not_found
+    swc_string, digest = None, subject.tracing_hash
+    if digest is None:
+        # The hash has not been backfilled (see bava.api.ingest)
+        swc_string = await run_query(session, get_tracing, session, subject_id)
+        if not swc_string:
+            raise not_found
+        digest = content_hash(swc_string)
+    store = ThumbnailStore(THUMBNAIL_DIR)
+    etag = f'"{store.key(digest)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    png = await run_in_threadpool(store.get, digest)
+    if png is None:
+        swc_string = swc_string or await run_query(session, get_tracing, session, subject_id)
+        if not swc_string:
+            raise not_found
+        png = await run_in_threadpool(render_thumbnail, swc_string)
+        await run_in_threadpool(store.put, digest, png)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
+@app.get("/tracings/{subject_id}", response_class=PlainTextResponse)
+async def get_subject_tracing(*, session: Session = Depends(get_session), subject_id: str):
+    """
+    A function to retrieve the SWC tracing of a subject, without the other columns.
+
+    Args:
+        session (Session): A SQLModel Session object.
+        subject_id (str): The ID of the subject.
+
+    Returns:
+        The SWC string as plain text.
+
+    Raises:
+        HTTPException: If the subject is not found or has no tracing.
+    """
+    swc_string = await run_query(session, get_tracing, session, subject_id)
+    if not swc_string:
+        raise HTTPException(status_code=404, detail=f"Tracing of subject with id:{subject_id} not found")
+    return PlainTextResponse(swc_string)
+
+def get_tracing(session: Session, subject_id: str):
+    """
+    A helper function to read the tracing of a subject.
+
+    Returns:
+        The SWC string, or None if the subject is not found or has no tracing.
+    """
+    subject = get_subject_fields(session, subject_id, ["unstructured_data"])
+    return subject.unstructured_data if subject else None
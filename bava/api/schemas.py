@@ -1,9 +1,10 @@
 """"""
 from enum import Enum
-from typing import Optional, List, Tuple
-from pydantic import BaseModel
+from typing import Optional, List, Tuple, Dict
+from pydantic import BaseModel, confloat
 
-from sqlmodel import Field, SQLModel, Column
+from sqlmodel import Field, SQLModel, Column, Index
+from sqlalchemy.orm import deferred
 from sqlalchemy.types import PickleType
 
 class Gender(Enum):
@@ -116,6 +117,12 @@ class GraphicalFeatures(BaseModel):
     average_degree_centrality: float
     average_edge_betweenness_centrality: float
 
+def dataset_name(subject_id: str):
+    """
+    Returns the dataset of a subject, the prefix of its ID before the first underscore, e.g. 'CROP'.
+    """
+    return subject_id.split("_")[0]
+
 class Subject(SQLModel, table=True):
     """
     Represents a subject in the study.
@@ -138,27 +145,46 @@ class Subject(SQLModel, table=True):
         unstructured_data (Optional[str]): unstructured brain artery network data extracted from .swc file for the subject.
         morphological_features (Optional[str]): Additional morphological features for the subject.
         graphical_features (Optional[str]): Additional graphical features for the subject.
+        stenosis_count (Optional[int]): The number of focal narrowings found along the vessels.
+        max_stenosis (Optional[float]): The largest narrowing (1 - radius / reference radius) along the vessels.
+        vessel_mask (Optional[int]): A bitmask with bit `id` set for every vessel type present in the tracing.
+        dataset (Optional[str]): The dataset of the subject, the prefix of its ID (see `dataset_name`).
+        tracing_hash (Optional[str]): The content hash of the tracing, which addresses its thumbnail.
     """
     __tablename__ = "subjects"
-    __table_args__ = {'extend_existing': True} 
+    # Every filter constrains the dataset and the age, the other ranges are indexed on their own
+    __table_args__ = (Index("ix_subjects_dataset_Age", "dataset", "Age"), {'extend_existing': True})
 
     ID: str = Field(default="", primary_key=True)
     Age: int
     Smoking: bool
-    SBP: float
-    DBP: float
+    SBP: float = Field(index=True)
+    DBP: float = Field(index=True)
     Hypertension: bool
-    TC: float
-    TG: float
-    HDL: float
-    LDL: float
+    TC: float = Field(index=True)
+    TG: float = Field(index=True)
+    HDL: float = Field(index=True)
+    LDL: float = Field(index=True)
     Diabetes: bool
-    Framingham_Risk: float
+    Framingham_Risk: float = Field(index=True)
     Gender: Gender
     Race: Race
     unstructured_data: Optional[str]
     morphological_features: Optional[str]
     # graphical_features: Optional[str]
+    stenosis_count: Optional[int] = Field(default=None)
+    max_stenosis: Optional[float] = Field(default=None, index=True)
+    # Not indexed: the vessel filters test bits with '&', which a B-tree index cannot serve
+    vessel_mask: Optional[int] = Field(default=None)
+    dataset: Optional[str] = Field(default=None, sa_column_kwargs={
+        "default": lambda context: dataset_name(context.get_current_parameters()["ID"])})
+    tracing_hash: Optional[str] = Field(default=None)
+
+# The tracing and the features are far larger than the rest of a row, so loading a Subject leaves them
+# out; they are read on first access, or with the row when the "heavy" group is undeferred.
+HEAVY_COLUMNS = ("unstructured_data", "morphological_features")
+for _column in HEAVY_COLUMNS:
+    Subject.__mapper__.add_property(_column, deferred(Subject.__table__.c[_column], group="heavy"))
 
 class SubjectRecord(SQLModel):
     """
@@ -241,6 +267,9 @@ class FilterDB(BaseModel):
         Framingham_Risk (float): The Framingham Risk Score of the subject.
         Gender (Gender): The gender of the subject.
         Race (Race): The race of the subject.
+        max_stenosis (Tuple): The range of the largest narrowing along the vessels. Not filtered if omitted.
+        has_vessels (List[str]): The vessel names every subject must have, e.g. ["AComm"].
+        lacks_vessels (List[str]): The vessel names no subject may have, e.g. ["PComm_L"].
     """
     ID: Optional[List[str]] = []
     datasets: Optional[List[str]] = []
@@ -256,4 +285,77 @@ class FilterDB(BaseModel):
     diabetes: Optional[bool]
     framingham_risk: Optional[Tuple] = tuple()
     genders: Optional[List[Gender]] = [gender for gender in Gender]
-    races: Optional[List[Race]] = [race for race in Race]
\ No newline at end of file
+    races: Optional[List[Race]] = [race for race in Race]
+    max_stenosis: Optional[Tuple]
+    has_vessels: Optional[List[str]] = []
+    lacks_vessels: Optional[List[str]] = []
+
+class RegionOfInterest(BaseModel):
+    """
+    Describes a region of a subject's artery network to crop before computing features.
+    The region is a sphere, a box, a set of vessel types, or the intersection of several of these.
+
+    Attributes:
+        center (Tuple[float, float, float]): The center of a spherical region.
+        radius (float): The radius of a spherical region in mm.
+        lower (Tuple[float, float, float]): The lower corner of a box region.
+        upper (Tuple[float, float, float]): The upper corner of a box region.
+        ves_types (List[str]): The vessel names to keep, e.g. ["M1_L", "M2_L"].
+        include_figure (bool): Whether to return a Plotly figure of the region.
+    """
+    center: Optional[Tuple[float, float, float]]
+    radius: Optional[float]
+    lower: Optional[Tuple[float, float, float]]
+    upper: Optional[Tuple[float, float, float]]
+    ves_types: Optional[List[str]]
+    include_figure: bool = True
+
+class RegionFeatures(BaseModel):
+    """
+    Represents the features of a cropped region of a subject's artery network.
+
+    Attributes:
+        num_nodes (int): The number of nodes in the region.
+        num_edges (int): The number of edges in the region.
+        morphological_features (Dict[str, float]): The morphological features of the region.
+        graphical_features (Dict[str, Optional[float]]): The graphical features of the region.
+            Undefined values (e.g. assortativity of a single vessel) are null.
+        figure (Dict): The Plotly figure of the region as a JSON object.
+    """
+    num_nodes: int
+    num_edges: int
+    morphological_features: Dict[str, float]
+    graphical_features: Dict[str, Optional[float]]
+    figure: Optional[Dict]
+
+class AtlasRequest(BaseModel):
+    """
+    Requests a population vessel-density atlas of the subjects matching a filter.
+
+    Attributes:
+        filters (FilterDB): The filter selecting the subjects.
+        voxel_size (float): The edge length of the atlas voxels, at least 2 to bound the grid size.
+    """
+    filters: FilterDB
+    voxel_size: confloat(ge=2.0) = 8.0
+
+class Atlas(BaseModel):
+    """
+    Represents a population vessel-density atlas. Only the occupied voxels are listed.
+
+    Attributes:
+        num_subjects (int): The number of subjects in the atlas.
+        shape (List[int]): The number of voxels along each axis.
+        lower (List[float]): The lower corner of the grid.
+        voxel_size (float): The edge length of a voxel.
+        indices (List[int]): The flat (C-order) indices of the occupied voxels.
+        occupancy (List[float]): The fraction of subjects with a vessel in each occupied voxel.
+        mean_radius (List[float]): The mean vessel radius in each occupied voxel.
+    """
+    num_subjects: int
+    shape: List[int]
+    lower: List[float]
+    voxel_size: float
+    indices: List[int]
+    occupancy: List[float]
+    mean_radius: List[float]
@@ -6,12 +6,36 @@
 	run with 'streamlit run ./bava/streamlit/pages/Data_Visualization.py' in repository root
 """
 import json
+from functools import lru_cache
+
 import requests
 import streamlit as st
+import streamlit.components.v1 as components
 
 from bava.visualization3d.subject_graph import SubjectGraph
-from bava.api.database import BavaDB
-from bava.api.config import FAST_API_URL, SQL_DB_URL
+from bava.visualization3d.graph_analysis import getvesname, VESTYPENUM
+from bava.visualization3d.atlas import create_atlas_plot
+from bava.visualization3d.comparison import create_comparison_plot
+from bava.visualization3d.figure_cache import FigureCache, content_hash, figure_html
+from bava.visualization3d.figure_encoding import encode_figure
+from bava.visualization3d.swc2graph import parse_swc, swc2graph
+from bava.api.database import BavaDB, SUBJECT_RECORD_FIELDS
+from bava.api.config import (FAST_API_URL, SQL_DB_URL, FIGURE_CACHE_DIR, FIGURE_CACHE_MAX_BYTES,
+							 DEFAULT_FIGURE_OPTIONS, TUBE_TRIANGLE_BUDGET)
+
+
+# The subject columns shown on the page, read without the tracing
+SUBJECT_FIELDS = SUBJECT_RECORD_FIELDS + ["stenosis_count", "max_stenosis", "tracing_hash"]
+
+
+@lru_cache(maxsize=1)
+def fetch_tracing(subject_id):
+	"""
+	Fetches the SWC string of a subject, at most once per run of the page.
+	"""
+	response = requests.get(url=f"{FAST_API_URL}/tracings/{subject_id}")
+	response.raise_for_status()
+	return response.text
 
 
 def page_viz3d():
@@ -25,8 +49,7 @@ def page_viz3d():
 	st.title('Data Visualization')
 
 	try:
-		bava_db_dict = requests.get(url=f"{FAST_API_URL}/subjects/").json()
-		bava_db = BavaDB(**bava_db_dict)
+		bava_db = BavaDB.from_api(FAST_API_URL, fields=["dataset"])
 
 	except Exception:
 		st.code(f"Error in retrieving subject records! \nYour database file: {SQL_DB_URL} is empty (or missing)!")
@@ -35,8 +58,8 @@ def page_viz3d():
 	st.sidebar.header("Filters")
  
 	# Create a multiselect for different datasets
-	# the dataset names are from bava_db.subjects[i]['ID'].split('_')[0]
-	dataset_options = list(set([subject['ID'].split('_')[0] for subject in bava_db.subjects]))
+	# the dataset names are from the dataset column of bava_db.subjects
+	dataset_options = list(set([subject['dataset'] for subject in bava_db.subjects]))
 	selected_datasets = st.sidebar.multiselect('Datasets', dataset_options, default=dataset_options)
  
 	# Create a filter bar for age
@@ -73,6 +96,14 @@ def page_viz3d():
 													framingham_info.min, framingham_info.max, 
 													(framingham_info.min, framingham_info.max))
 
+	# Create a filter bar for the largest narrowing along the vessels
+	min_stenosis, max_stenosis = st.sidebar.slider('Max Stenosis Range', 0.0, 1.0, (0.0, 1.0))
+
+	# Create multiselects for anatomical variants (vessels present or absent)
+	vessel_options = [getvesname(ves_id) for ves_id in range(1, VESTYPENUM)]
+	has_vessels = st.sidebar.multiselect('Has Vessels', vessel_options)
+	lacks_vessels = st.sidebar.multiselect('Lacks Vessels', vessel_options)
+
 	# Create a selectbox for diabetes
 	diabetes_options = ['Have Diabetes', "Don't Have Diabetes", 'All']
 	# Set the default index to 2 for 'All'
@@ -129,7 +160,12 @@ def page_viz3d():
 		"diabetes": diabetes_option,
 		"hypertension": hypertension_option,
 		"genders": selected_gender_values if selected_gender_values else gender_values,
-  		"race": selected_race_values if selected_race_values else race_values,}
+  		"race": selected_race_values if selected_race_values else race_values,
+		"has_vessels": has_vessels,
+		"lacks_vessels": lacks_vessels,}
+	# Only filter on stenosis when narrowed, so that subjects without a screening are kept by default
+	if (min_stenosis, max_stenosis) != (0.0, 1.0):
+		filter_options["max_stenosis"] = (min_stenosis, max_stenosis)
 
 	filtered_subjects = requests.post(url=f"{FAST_API_URL}/filter/", json=filter_options).json()
 	if not filtered_subjects:
@@ -139,21 +175,94 @@ def page_viz3d():
 	else:
 		st.subheader(f"**{len(filtered_subjects)} records found!**")
 		subject_ids = [subject['ID'] for subject in filtered_subjects]
+
+		# Thumbnails are pre-rendered and served by the API, so the browser loads them directly
+		with st.expander('Gallery', expanded=True):
+			page_size = 12
+			num_pages = (len(subject_ids) - 1) // page_size + 1
+			page = st.number_input(f'Page (of {num_pages})', min_value=1, max_value=num_pages, value=1)
+			page_ids = subject_ids[(page - 1) * page_size:page * page_size]
+			st.image([f"{FAST_API_URL}/thumbnails/{subject_id}" for subject_id in page_ids],
+					 caption=page_ids, width=160)
+
 		selected_id = st.selectbox('Select a record:', subject_ids)
-		selected_subject = requests.get(url=f"{FAST_API_URL}/subjects/{selected_id}").json()
-		morphological_features = selected_subject.pop("morphological_features")
-		unstructured_data = selected_subject.pop("unstructured_data")
-		G = SubjectGraph(unstructured_data)
+		selected_subject = requests.get(url=f"{FAST_API_URL}/subjects/{selected_id}",
+										params={"fields": ",".join(SUBJECT_FIELDS)}).json()
+		# Figures are cached by the hash of the tracing, so the tracing is only fetched to build one
+		tracing_hash = selected_subject.pop("tracing_hash") or content_hash(fetch_tracing(selected_id))
 		st.dataframe(selected_subject, width=500)
 
+	# A view is counted when a subject is selected, not on every rerun of the page
+	figure_cache = FigureCache(FIGURE_CACHE_DIR, max_bytes=FIGURE_CACHE_MAX_BYTES)
+	if st.session_state.get("viewed_subject") != selected_id:
+		st.session_state.viewed_subject = selected_id
+		figure_cache.record_view(selected_id)
+
 	# Streamlit app
 	st.title('Graph Visualization')
 
-	# Create the Plotly figure
-	fig = G.create_interactive_plot()
+	# Show a coarse level of detail first, refined on demand or by zooming into a region
+	style = st.radio('Style', ['Lines', 'Tubes'], horizontal=True)
+	if style == 'Lines':
+		detail = st.radio('Level of Detail', ['Coarse', 'Full'], horizontal=True)
+		default_budget = DEFAULT_FIGURE_OPTIONS["vertex_budget"]
+		vertex_budget = st.slider('Vertex Budget', 100, 2000, default_budget, step=100) if detail == 'Coarse' else None
+	else:
+		sides = st.slider('Tube Sides', 3, 16, 8)
+	region = {}
+	with st.expander('Zoom into Region'):
+		if st.checkbox('Show region only'):
+			centroid = parse_swc(fetch_tracing(selected_id))[:, 2:5].mean(axis=0)
+			x = st.number_input('Center X', value=float(centroid[0]))
+			y = st.number_input('Center Y', value=float(centroid[1]))
+			z = st.number_input('Center Z', value=float(centroid[2]))
+			radius = st.number_input('Radius', min_value=1.0, value=30.0)
+			region = {"center": [x, y, z], "radius": radius}
+
+	# Figures are cached already serialized, so a subject viewed before is only read from disk
+	if style == 'Lines':
+		figure_options = {"vertex_budget": vertex_budget, **region}
+		create_plot = lambda subject: subject.create_interactive_plot(**figure_options)
+	else:
+		figure_options = {"sides": sides, "triangle_budget": TUBE_TRIANGLE_BUDGET, **region}
+		create_plot = lambda subject: subject.create_tube_plot(**figure_options)
+	try:
+		figure_json = figure_cache.get_or_create(
+			selected_id, tracing_hash, figure_options,
+			lambda: encode_figure(create_plot(SubjectGraph(fetch_tracing(selected_id)))))
+	except ValueError as error:
+		st.code(str(error))
+		return
+
+	# Show the figure in Streamlit, drawn by plotly.js from the cached JSON
+	components.html(figure_html(figure_json), height=1050)
+
+	# Several filtered subjects in one figure
+	st.title('Subject Comparison')
+	compared_ids = st.multiselect('Subjects to compare', subject_ids, default=subject_ids[:2], max_selections=6)
+	comparison_layout = st.radio('Layout', ['overlay', 'tile'], horizontal=True)
+	center_on_landmark = st.checkbox('Centre on the basilar tip', value=True)
+	if compared_ids and st.button('Compare subjects'):
+		# Only the graphs are compared, so neither the other columns nor the subject features are needed
+		graphs = [swc2graph(requests.get(url=f"{FAST_API_URL}/tracings/{subject_id}").text)
+				  for subject_id in compared_ids]
+		try:
+			comparison = create_comparison_plot(graphs, subject_ids=compared_ids, layout=comparison_layout,
+												landmark='basilar_tip' if center_on_landmark else None,
+												vertex_budget=DEFAULT_FIGURE_OPTIONS["vertex_budget"])
+		except ValueError as error:
+			st.code(str(error))
+		else:
+			components.html(figure_html(encode_figure(comparison)), height=1050)
 
-	# Show the figure in Streamlit
-	st.plotly_chart(fig)
+	# Population atlas of the filtered subjects
+	st.title('Population Atlas')
+	voxel_size = st.slider('Atlas Voxel Size', 4.0, 32.0, 8.0, step=4.0)
+	isomin = st.slider('Minimum Occupancy', 0.05, 1.0, 0.5)
+	if st.button('Build atlas for the filtered subjects'):
+		atlas_request = {"filters": filter_options, "voxel_size": voxel_size}
+		atlas = requests.post(url=f"{FAST_API_URL}/atlas/", json=atlas_request).json()
+		st.plotly_chart(create_atlas_plot(atlas, isomin=isomin))
 
 if __name__ == "__main__":
 	page_viz3d()
@@ -34,12 +34,11 @@ def page_pandasai():
 	secret_values = os.environ['OPENAI_API_KEY'] #use the command 'export OPENAI_API_KEY={your API key}' 
 	llm = OpenAI(api_token=secret_values)
  
-	bava_db_dict = requests.get(url=f"{FAST_API_URL}/subjects/").json()
-	bava_db = BavaDB(**bava_db_dict)
+	bava_db = BavaDB.from_api(FAST_API_URL, fields=["dataset"])
  
 	# Create a multiselect for different datasets
-	# the dataset names are from bava_db.subjects[i]['ID'].split('_')[0]
-	dataset_options = list(set([subject['ID'].split('_')[0] for subject in bava_db.subjects]))
+	# the dataset names are from the dataset column of bava_db.subjects
+	dataset_options = list(set([subject['dataset'] for subject in bava_db.subjects]))
 	selected_datasets = st.sidebar.multiselect('Datasets', dataset_options, default=dataset_options)
  
 	# Create a filter bar for age
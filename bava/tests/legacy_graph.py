@@ -0,0 +1,62 @@
+"""
+Helpers for checking `generateG` against the original graph construction, shared by the tests and benchmarks.
+"""
+import networkx as nx
+import numpy as np
+
+from bava.visualization3d.graph_analysis import matchvestype
+from bava.visualization3d.radius_profile import chain_offsets
+
+
+def legacy_generateG(all_selected_points, all_selected_points_rad, all_selected_points_id, all_selected_points_type):
+    """
+    The original dictionary-based graph construction, kept as the reference for `generateG`.
+    """
+    G = nx.Graph()
+    position_to_id_map = {}
+    node_attributes = {}
+
+    for segment_points, segment_ids, segment_rads, segment_types in zip(all_selected_points, all_selected_points_id, all_selected_points_rad, all_selected_points_type):
+        ves_type = matchvestype(int(segment_types[0]), int(segment_types[-1]))
+        for point, id, rad in zip(segment_points, segment_ids, segment_rads):
+            pos_key = tuple(point)
+            if pos_key not in position_to_id_map:
+                position_to_id_map[pos_key] = id
+                node_attributes[id] = {'pos': point, 'radius': rad, 'ves_type': [ves_type]}
+            else:
+                existing_id = position_to_id_map[pos_key]
+                if ves_type not in node_attributes[existing_id]['ves_type']:
+                    node_attributes[existing_id]['ves_type'].append(ves_type)
+
+    for id, attrs in node_attributes.items():
+        G.add_node(id, **attrs)
+
+    for segment_points, segment_ids, segment_types in zip(all_selected_points, all_selected_points_id, all_selected_points_type):
+        ves_type = matchvestype(int(segment_types[0]), int(segment_types[-1]))
+        for i in range(len(segment_ids) - 1):
+            start_id = position_to_id_map[tuple(segment_points[i])]
+            end_id = position_to_id_map[tuple(segment_points[i + 1])]
+            if len(node_attributes[start_id]['ves_type']) > 1:
+                edge_ves_type = node_attributes[end_id]['ves_type'][0]
+            elif len(node_attributes[end_id]['ves_type']) > 1:
+                edge_ves_type = node_attributes[start_id]['ves_type'][0]
+            else:
+                edge_ves_type = ves_type
+            G.add_edge(start_id, end_id, ves_type=edge_ves_type)
+
+    return G
+
+
+def snake_lists(swc_data, step=1):
+    """
+    Splits SWC rows into the per-snake lists taken by `generateG`, keeping every `step`-th point and the last one.
+    """
+    offsets = chain_offsets(swc_data)
+    # The columns in the argument order of generateG: points, radii, ids, types
+    columns = ([], [], [], [])
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        rows = np.unique(np.append(np.arange(start, end, step), end - 1))
+        snake = swc_data[rows]
+        for column, values in zip(columns, (snake[:, 2:5], snake[:, 5], snake[:, 0], snake[:, 1])):
+            column.append(values)
+    return columns
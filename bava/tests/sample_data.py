@@ -0,0 +1,21 @@
+"""
+Helpers for loading the sample tracings shipped in the repository's sample_data directory.
+"""
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_DATA_DIR = Path(__file__).resolve().parents[2] / 'sample_data'
+
+
+def load_sample_swc(filename='tracing_ves_TH_0_7001_U.swc'):
+    """
+    Loads a sample SWC file as the string stored in the 'unstructured_data' column.
+
+    Args:
+        filename (str): The name of the SWC file in the sample_data directory.
+
+    Returns:
+        str: The SWC rows formatted as a Python list literal.
+    """
+    return str(np.loadtxt(SAMPLE_DATA_DIR / filename).tolist())
@@ -0,0 +1,279 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+
+from bava.api.routers import app, get_session
+from bava.api.ingest import ingest_subject
+from bava.api.database import BavaDB, migrate_subjects_table
+from bava.api.schemas import Subject, SubjectRecord, Gender, Race
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.visualization3d.graph_analysis import getvesid, getvesname
+from bava.visualization3d.figure_cache import content_hash
+from bava.tests.sample_data import load_sample_swc
+
+
+def create_test_engine():
+    """
+    Creates an in-memory database holding the two sample subjects.
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    # Created as at API startup
+    SQLModel.metadata.create_all(engine)
+    migrate_subjects_table(engine)
+    with Session(engine) as session:
+        for i, filename in enumerate(['tracing_ves_TH_0_7001_U.swc', 'tracing_ves_TH_0_7002_U.swc']):
+            ingest_subject(session, Subject(ID=f"CROP_{7001 + i}", Age=60 + i, Smoking=False, SBP=120.0 + i, DBP=80.0,
+                                Hypertension=bool(i), TC=180.0, TG=150.0, HDL=50.0, LDL=100.0, Diabetes=False,
+                                Framingham_Risk=0.1 * (i + 1), Gender=Gender(i), Race=Race.asian,
+                                unstructured_data=load_sample_swc(filename), morphological_features='{}'))
+        session.commit()
+    return engine
+
+
+ALL_SUBJECTS_FILTER = {"datasets": ["CROP"], "age": (0, 200), "sbp": (0, 300), "dbp": (0, 300), "tc": (0, 500),
+                       "tg": (0, 500), "hdl": (0, 500), "ldl": (0, 500), "framingham_risk": (0, 1)}
+
+
+class TestAPI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_test_engine()
+
+        def get_test_session():
+            with Session(cls.engine) as session:
+                yield session
+
+        app.dependency_overrides[get_session] = get_test_session
+        cls.client = TestClient(app)
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides.clear()
+
+    def test_list_subjects(self):
+        body = self.client.get("/subjects/").json()
+        self.assertEqual([subject["ID"] for subject in body["subjects"]], ["CROP_7001", "CROP_7002"])
+        self.assertEqual(set(body["subjects"][0]), set(SubjectRecord.__fields__))
+        self.assertEqual(body["subjects"][1]["Gender"], Gender.male.value)
+        self.assertIsNone(body["next_cursor"])
+        self.assertEqual(body["metadata"]["age"], {"min": 60, "max": 61, "avg": 60.5})
+
+    def test_list_subjects_pages(self):
+        first = self.client.get("/subjects/", params={"limit": 1, "fields": "ID,vessel_mask"}).json()
+        self.assertEqual(first["subjects"], [{"ID": "CROP_7001", "vessel_mask": first["subjects"][0]["vessel_mask"]}])
+        self.assertEqual(first["next_cursor"], "CROP_7001")
+        second = self.client.get("/subjects/", params={"limit": 1, "fields": "ID", "after": "CROP_7001"}).json()
+        self.assertEqual(second["subjects"], [{"ID": "CROP_7002"}])
+        self.assertNotIn("metadata", second)
+        # The cursor of a full page may still lead to an empty last page
+        last = self.client.get("/subjects/", params={"limit": 1, "after": "CROP_7002"}).json()
+        self.assertEqual(last, {"subjects": [], "next_cursor": None})
+        self.assertEqual(self.client.get("/subjects/", params={"fields": "ID,password"}).status_code, 422)
+
+    def test_metadata(self):
+        body = self.client.get("/metadata/").json()
+        self.assertEqual(body["age"], {"min": 60, "max": 61, "avg": 60.5})
+        self.assertEqual(set(body), {"age", "sbp", "dbp", "tc", "tg", "hdl", "ldl", "framingham_risk"})
+
+    def test_bava_db_from_api(self):
+        with mock.patch.object(self.client, "get", wraps=self.client.get) as client_get:
+            bava_db = BavaDB.from_api("http://testserver", fields=["ID"], page_size=1, client=self.client)
+        self.assertEqual(bava_db.subjects, [{"ID": "CROP_7001"}, {"ID": "CROP_7002"}])
+        self.assertEqual(bava_db.metadata.sbp.max, 121.0)
+        self.assertEqual(client_get.call_count, 3)
+
+    def record_statements(self):
+        """
+        Collects the SQL statements run on the test engine until the test ends.
+        """
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", before_cursor_execute)
+        self.addCleanup(event.remove, self.engine, "before_cursor_execute", before_cursor_execute)
+        return statements
+
+    def test_subject_by_id(self):
+        body = self.client.get("/subjects/CROP_7001").json()
+        self.assertEqual(body["unstructured_data"], load_sample_swc())
+        self.assertEqual(body["morphological_features"], "{}")
+        self.assertEqual(self.client.get("/subjects/missing").status_code, 404)
+
+    def test_subject_fields(self):
+        statements = self.record_statements()
+        body = self.client.get("/subjects/CROP_7001", params={"fields": "Age,tracing_hash"}).json()
+        self.assertEqual(body, {"ID": "CROP_7001", "Age": 60, "tracing_hash": content_hash(load_sample_swc())})
+        self.assertFalse([statement for statement in statements if "unstructured_data" in statement])
+        self.assertEqual(self.client.get("/subjects/missing", params={"fields": "Age"}).status_code, 404)
+        self.assertEqual(self.client.get("/subjects/CROP_7001", params={"fields": "unknown"}).status_code, 422)
+
+    def test_heavy_columns_deferred(self):
+        with Session(self.engine) as session:
+            subject = session.get(Subject, "CROP_7001")
+            self.assertNotIn("unstructured_data", subject.__dict__)
+            self.assertEqual(subject.unstructured_data, load_sample_swc())
+
+    def test_filter_reads_record_columns(self):
+        statements = self.record_statements()
+        self.client.post("/filter/", json=ALL_SUBJECTS_FILTER)
+        self.assertTrue(statements)
+        self.assertFalse([statement for statement in statements if "unstructured_data" in statement])
+
+    def test_queries_run_on_database_threads(self):
+        threads = set()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            threads.add(threading.current_thread().name)
+
+        event.listen(self.engine, "before_cursor_execute", before_cursor_execute)
+        self.addCleanup(event.remove, self.engine, "before_cursor_execute", before_cursor_execute)
+        self.client.post("/filter/", json=ALL_SUBJECTS_FILTER)
+        self.client.get("/subjects/CROP_7001")
+        self.assertEqual(len(self.client.get("/subjects/").json()["subjects"]), 2)
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith("bava-db") for name in threads))
+
+    def test_graphical_features(self):
+        response = self.client.get("/subject_graphical_features/CROP_7001")
+        self.assertEqual(response.status_code, 200)
+        expected = SubjectGraph(load_sample_swc()).graphical_features
+        for feature, value in response.json().items():
+            self.assertAlmostEqual(value, expected[feature])
+        self.assertEqual(self.client.get("/subject_graphical_features/missing").status_code, 404)
+        self.assertEqual(self.client.get("/subject_morphological_features/missing").status_code, 404)
+
+    def test_roi_features(self):
+        response = self.client.post("/subject_roi_features/CROP_7001",
+                                    json={"center": [224.269, 239.583, 99.565], "radius": 30.0})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertGreater(body["num_edges"], 0)
+        self.assertIn("total_length", body["morphological_features"])
+        self.assertIsNotNone(body["figure"])
+
+    def test_roi_features_cached_graph(self):
+        region = {"ves_types": ["BA"], "include_figure": False}
+        first = self.client.post("/subject_roi_features/CROP_7002", json=region).json()
+        # The graph of the subject is cached, so the tracing is not read again
+        statements = self.record_statements()
+        self.assertEqual(self.client.post("/subject_roi_features/CROP_7002", json=region).json(), first)
+        self.assertFalse([statement for statement in statements if "unstructured_data" in statement])
+
+    def test_roi_features_by_vessel_type(self):
+        response = self.client.post("/subject_roi_features/CROP_7001",
+                                    json={"ves_types": ["M1_L"], "include_figure": False})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertGreater(body["morphological_features"]["M1_L_length"], 0)
+        self.assertIsNone(body["figure"])
+
+    def test_roi_features_empty_region(self):
+        response = self.client.post("/subject_roi_features/CROP_7001",
+                                    json={"center": [0.0, 0.0, 0.0], "radius": 1.0})
+        self.assertEqual(response.status_code, 422)
+
+    def test_roi_features_missing_subject(self):
+        response = self.client.post("/subject_roi_features/missing", json={"ves_types": ["BA"]})
+        self.assertEqual(response.status_code, 404)
+
+    def test_filter_all_subjects(self):
+        response = self.client.post("/filter/", json=ALL_SUBJECTS_FILTER)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([subject["ID"] for subject in response.json()], ["CROP_7001", "CROP_7002"])
+
+    def test_filter_datasets(self):
+        with Session(self.engine) as session:
+            self.assertEqual(session.get(Subject, "CROP_7001").dataset, "CROP")
+        response = self.client.post("/filter/", json={**ALL_SUBJECTS_FILTER, "datasets": ["CROP", "OTHER"]})
+        self.assertEqual(len(response.json()), 2)
+        response = self.client.post("/filter/", json={**ALL_SUBJECTS_FILTER, "datasets": ["CRO"]})
+        self.assertEqual(response.json(), [])
+
+    def test_filter_max_stenosis(self):
+        with Session(self.engine) as session:
+            max_stenosis = session.get(Subject, "CROP_7002").max_stenosis
+        response = self.client.post("/filter/", json={**ALL_SUBJECTS_FILTER, "max_stenosis": (max_stenosis, 1)})
+        self.assertEqual([subject["ID"] for subject in response.json()], ["CROP_7002"])
+
+    def test_filter_vessel_presence(self):
+        with Session(self.engine) as session:
+            masks = {subject.ID: subject.vessel_mask for subject in session.exec(select(Subject)).all()}
+        self.assertEqual(masks["CROP_7001"], SubjectGraph(load_sample_swc()).vessel_mask)
+        self.assertTrue(masks["CROP_7001"] & (1 << getvesid("BA")))
+
+        response = self.client.post("/filter/", json={**ALL_SUBJECTS_FILTER, "has_vessels": ["BA", "M1_L"]})
+        self.assertEqual(len(response.json()), 2)
+        response = self.client.post("/filter/", json={**ALL_SUBJECTS_FILTER, "lacks_vessels": ["BA"]})
+        self.assertEqual(response.json(), [])
+        # Vessel types missing from the first sample tracing
+        absent = [getvesname(i) for i in range(1, 25) if not masks["CROP_7001"] & (1 << i)]
+        response = self.client.post("/filter/", json={**ALL_SUBJECTS_FILTER, "lacks_vessels": absent})
+        self.assertIn("CROP_7001", [subject["ID"] for subject in response.json()])
+
+    def test_filter_unknown_vessel(self):
+        response = self.client.post("/filter/", json={**ALL_SUBJECTS_FILTER, "has_vessels": ["XYZ"]})
+        self.assertEqual(response.status_code, 422)
+
+    def test_atlas(self):
+        with tempfile.TemporaryDirectory() as cache_dir, mock.patch("bava.api.routers.ATLAS_CACHE_DIR", cache_dir):
+            request = {"filters": ALL_SUBJECTS_FILTER, "voxel_size": 16.0}
+            response = self.client.post("/atlas/", json=request)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertEqual(body["num_subjects"], 2)
+            self.assertEqual(len(body["indices"]), len(body["occupancy"]))
+            self.assertTrue(set(body["occupancy"]) <= {0.5, 1.0})
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            # The second request is served from the cache
+            self.assertEqual(self.client.post("/atlas/", json=request).json(), body)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            # Another filter gets its own atlas
+            one_subject = dict(ALL_SUBJECTS_FILTER, age=(0, 61))
+            response = self.client.post("/atlas/", json={"filters": one_subject, "voxel_size": 16.0})
+            self.assertEqual(response.json()["num_subjects"], 1)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def test_atlas_invalid_voxel_size(self):
+        response = self.client.post("/atlas/", json={"filters": ALL_SUBJECTS_FILTER, "voxel_size": 0.5})
+        self.assertEqual(response.status_code, 422)
+
+    def test_thumbnail(self):
+        with tempfile.TemporaryDirectory() as store_dir, mock.patch("bava.api.routers.THUMBNAIL_DIR", store_dir):
+            response = self.client.get("/thumbnails/CROP_7001")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["content-type"], "image/png")
+            self.assertTrue(response.content.startswith(b'\x89PNG'))
+            # The thumbnail is stored, and a client holding it gets no body
+            self.assertEqual(len(os.listdir(store_dir)), 1)
+            etag = response.headers["etag"]
+            response = self.client.get("/thumbnails/CROP_7001", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(self.client.get("/thumbnails/CROP_9999").status_code, 404)
+            # A client holding the thumbnail is answered from the stored hash, without the tracing
+            statements = self.record_statements()
+            response = self.client.get("/thumbnails/CROP_7001", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertFalse([statement for statement in statements if "unstructured_data" in statement])
+
+    def test_tracing(self):
+        statements = self.record_statements()
+        response = self.client.get("/tracings/CROP_7001")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        # Only the tracing column is read
+        self.assertFalse([statement for statement in statements if "morphological_features" in statement])
+        with Session(self.engine) as session:
+            self.assertEqual(response.text, session.get(Subject, "CROP_7001").unstructured_data)
+        self.assertEqual(self.client.get("/tracings/CROP_9999").status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
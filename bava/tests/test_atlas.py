@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from bava.visualization3d.atlas import VesselAtlas, sample_edges, create_atlas_plot
+from bava.visualization3d.swc2graph import parse_swc
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestVesselAtlas(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.swc_data = [parse_swc(load_sample_swc(filename))
+                        for filename in ['tracing_ves_TH_0_7001_U.swc', 'tracing_ves_TH_0_7002_U.swc']]
+
+    def test_sample_edges_spacing(self):
+        pos = np.array([[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]])
+        samples, sample_radius = sample_edges(pos, np.array([1.0, 3.0]), np.array([[0, 1]]), 4.0)
+        np.testing.assert_allclose(samples[:, 0], [0.0, 10 / 3, 20 / 3])
+        np.testing.assert_allclose(sample_radius, [1.0, 5 / 3, 7 / 3])
+
+    def test_edge_voxels_are_occupied(self):
+        atlas = VesselAtlas(lower=(0, 0, 0), upper=(40, 8, 8), voxel_size=8.0)
+        atlas.add_subject(np.array([[1.0, 4.0, 4.0], [39.0, 4.0, 4.0]]), np.array([2.0, 2.0]), np.array([[0, 1]]))
+        np.testing.assert_array_equal(atlas.occupancy().ravel(), np.ones(5))
+        np.testing.assert_allclose(atlas.mean_radius().ravel(), np.full(5, 2.0))
+
+    def test_cohort_occupancy(self):
+        atlas = VesselAtlas()
+        for swc_data in self.swc_data:
+            atlas.add_swc(swc_data)
+        single = VesselAtlas()
+        single.add_swc(self.swc_data[0])
+        occupancy = atlas.occupancy()
+        self.assertEqual(atlas.num_subjects, 2)
+        self.assertTrue(set(np.unique(occupancy)) <= {0.0, 0.5, 1.0})
+        # Every voxel of the first subject is occupied by at least half of the cohort
+        self.assertTrue(np.all(occupancy[single.occupancy() == 1] >= 0.5))
+        radius = atlas.mean_radius()[occupancy > 0]
+        self.assertTrue(np.all((radius >= 0) & (radius <= max(d[:, 5].max() for d in self.swc_data))))
+
+    def test_save_load_and_plot(self):
+        atlas = VesselAtlas(voxel_size=16.0)
+        atlas.add_swc(self.swc_data[0])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'atlas.npz')
+            atlas.save(path)
+            loaded = VesselAtlas.load(path)
+        self.assertEqual(loaded.to_dict(), atlas.to_dict())
+        fig = create_atlas_plot(loaded.to_dict(), isomin=0.5)
+        self.assertEqual(len(fig.data), 1)
+
+    def test_invalid_grid(self):
+        with self.assertRaises(ValueError):
+            VesselAtlas(voxel_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+import networkx as nx
+from bava.visualization3d.subjects_manager import SubjectsManager
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestCohortGraph(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.manager = SubjectsManager()
+        cls.manager.add_subject('CROP_7001', load_sample_swc('tracing_ves_TH_0_7001_U.swc'))
+        cls.manager.add_subject('CROP_7002', load_sample_swc('tracing_ves_TH_0_7002_U.swc'))
+        # A graph with triangles, so that clustering is not trivially zero
+        graph = cls.manager.get_subject('CROP_7002').graph
+        branching_node = next(node for node, degree in graph.degree() if degree == 3)
+        graph.add_edge(*list(graph.neighbors(branching_node))[:2], ves_type=1)
+        cls.graphs = [cls.manager.get_subject(identifier).graph for identifier in cls.manager.get_all_subjects()]
+        cls.cohort = cls.manager.to_cohort_graph()
+
+    def blocks(self, values):
+        return [values[start:end] for start, end in zip(self.cohort.offsets[:-1], self.cohort.offsets[1:])]
+
+    def test_block_layout(self):
+        self.assertEqual(self.cohort.subject_ids, ['CROP_7001', 'CROP_7002'])
+        self.assertEqual(self.cohort.num_nodes, sum(G.number_of_nodes() for G in self.graphs))
+        for G, block in zip(self.graphs, self.blocks(self.cohort.node_ids)):
+            np.testing.assert_array_equal(block, list(G.nodes))
+        rows, cols = self.cohort.edge_index()
+        np.testing.assert_array_equal(self.cohort.node_subject[rows], self.cohort.node_subject[cols])
+
+    def test_metrics_match_networkx(self):
+        features = self.cohort.graphical_features()
+        for i, (G, clustering, pagerank) in enumerate(zip(self.graphs, self.blocks(self.cohort.clustering()),
+                                                          self.blocks(self.cohort.pagerank()))):
+            self.assertAlmostEqual(features['average_degree'][i], np.mean([d for _, d in G.degree()]))
+            np.testing.assert_allclose(clustering, list(nx.clustering(G).values()))
+            np.testing.assert_allclose(pagerank, list(nx.pagerank(G).values()))
+            self.assertAlmostEqual(features['spectral_radius'][i],
+                                   np.linalg.eigvalsh(nx.to_numpy_array(G)).max(), places=5)
+
+    def test_edge_lengths_aligned(self):
+        rows, cols = self.cohort.edge_index()
+        expected = np.linalg.norm(self.cohort.pos[rows] - self.cohort.pos[cols], axis=1)
+        np.testing.assert_allclose(self.cohort.edge_length, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
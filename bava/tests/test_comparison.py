@@ -0,0 +1,63 @@
+import unittest
+from collections import Counter
+import numpy as np
+from bava.visualization3d.swc2graph import swc2graph
+from bava.visualization3d.graph_analysis import getvesname
+from bava.visualization3d.comparison import create_comparison_plot, landmark_position
+from bava.visualization3d.subjects_manager import SubjectsManager
+from bava.tests.sample_data import load_sample_swc
+
+FILENAMES = ['tracing_ves_TH_0_7001_U.swc', 'tracing_ves_TH_0_7002_U.swc']
+
+
+def line_points(fig):
+    return np.concatenate([np.column_stack([trace.x, trace.y, trace.z]) for trace in fig.data if trace.mode == 'lines'])
+
+
+class TestComparison(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graphs = [swc2graph(load_sample_swc(filename)) for filename in FILENAMES]
+
+    def test_basilar_tip(self):
+        tip = landmark_position(self.graphs[0], 'basilar_tip')
+        node = next(data for _, data in self.graphs[0].nodes(data=True) if np.array_equal(data['pos'], tip))
+        self.assertTrue({16, 17, 18} <= set(node['ves_type']))
+        with self.assertRaises(ValueError):
+            landmark_position(self.graphs[0], 'nowhere')
+
+    def test_one_trace_per_vessel_type(self):
+        fig = create_comparison_plot(self.graphs, subject_ids=['a', 'b'])
+        edge_counts = Counter(getvesname(t) for G in self.graphs for _, _, t in G.edges(data='ves_type'))
+        line_traces = [trace for trace in fig.data if trace.mode == 'lines']
+        self.assertEqual(sorted(trace.name for trace in line_traces), sorted(edge_counts))
+        for trace in line_traces:
+            self.assertEqual(len(trace.x), 3 * edge_counts[trace.name])
+            # The first subject is drawn in the vessel color, the second in a lighter shade
+            self.assertEqual(set(np.asarray(trace.line.color).tolist()) - {0.0, 1.0}, set())
+        self.assertEqual(list(fig.data[-1].text), ['a', 'b'])
+
+    def test_landmark_overlay(self):
+        fig = create_comparison_plot(self.graphs, layout='overlay', landmark='basilar_tip')
+        points = line_points(fig)
+        # Both landmarks are moved to the origin
+        self.assertGreaterEqual(np.sum(np.all(np.abs(points) < 1e-9, axis=1)), 2)
+
+    def test_tile(self):
+        fig = create_comparison_plot(self.graphs, layout='tile', spacing=500)
+        labels = fig.data[-1]
+        self.assertAlmostEqual(labels.x[1] - labels.x[0], 500, delta=100)
+        self.assertTrue(np.all(np.asarray(fig.data[0].line.color) == 0))
+        with self.assertRaises(ValueError):
+            create_comparison_plot(self.graphs, layout='stack')
+
+    def test_subjects_manager(self):
+        manager = SubjectsManager()
+        for filename in FILENAMES:
+            manager.add_subject(filename, load_sample_swc(filename))
+        fig = manager.create_comparison_plot(layout='tile', landmark='basilar_tip', vertex_budget=200)
+        self.assertEqual(list(fig.data[-1].text), FILENAMES)
+
+
+if __name__ == '__main__':
+    unittest.main()
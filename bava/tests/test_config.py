@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from sqlalchemy import exc, text
+from sqlmodel import SQLModel
+
+from bava.api.config import create_sql_engine, get_db_profile, DB_PROFILES, DB_PROFILE_ENV
+from bava.api.schemas import Subject
+
+
+class TestConfig(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_path = os.path.join(directory.name, "subjects.db")
+
+    def create_engine(self, profile):
+        engine = create_sql_engine(profile, db_path=self.db_path)
+        self.addCleanup(engine.dispose)
+        return engine
+
+    def test_profile_from_environment(self):
+        with mock.patch.dict(os.environ, {DB_PROFILE_ENV: "prod"}):
+            self.assertIs(get_db_profile(), DB_PROFILES["prod"])
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertIs(get_db_profile(), DB_PROFILES["dev"])
+        self.assertIs(get_db_profile("readonly"), DB_PROFILES["readonly"])
+        with self.assertRaises(ValueError):
+            get_db_profile("fast")
+
+    def test_prod_pragmas(self):
+        engine = self.create_engine("prod")
+        self.assertFalse(engine.echo)
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual(connection.execute(text("PRAGMA synchronous")).scalar(), 1)
+            self.assertEqual(connection.execute(text("PRAGMA cache_size")).scalar(),
+                             DB_PROFILES["prod"]["pragmas"]["cache_size"])
+            self.assertEqual(connection.execute(text("PRAGMA temp_store")).scalar(), 2)
+
+    def test_read_only(self):
+        engine = self.create_engine("prod")
+        SQLModel.metadata.create_all(engine, tables=[Subject.__table__])
+        engine.dispose()
+        read_only = self.create_engine("readonly")
+        with read_only.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT COUNT(*) FROM subjects")).scalar(), 0)
+            with self.assertRaises(exc.OperationalError):
+                connection.execute(text("DELETE FROM subjects"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from sqlmodel import Session
+from bava.visualization3d.figure_cache import FigureCache, content_hash, figure_html
+from bava.api.prefill_figures import prefill_popular_figures
+from bava.tests.sample_data import load_sample_swc
+from bava.tests.test_api import create_test_engine
+
+
+class TestFigureCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = FigureCache(self.tmpdir.name, max_bytes=250)
+        self.builds = 0
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def build(self, size=100):
+        self.builds += 1
+        return '{"data": [], "layout": {}}'.ljust(size)
+
+    def test_get_or_create(self):
+        options = {'vertex_budget': 300}
+        first = self.cache.get_or_create('CROP_7001', 'swc', options, self.build)
+        second = self.cache.get_or_create('CROP_7001', 'swc', options, self.build)
+        self.assertEqual(first, second)
+        self.assertEqual(self.builds, 1)
+        # Another tracing or other options are separate entries
+        self.cache.get_or_create('CROP_7001', 'edited', options, self.build)
+        self.cache.get_or_create('CROP_7001', 'swc', {'vertex_budget': None}, self.build)
+        self.assertEqual(self.builds, 3)
+
+    def test_lru_eviction(self):
+        for i, subject_id in enumerate(['A', 'B']):
+            self.cache.put(subject_id, 'swc', {}, self.build())
+            path = self.cache.path(subject_id, 'swc', {})
+            os.utime(path, (1000 + i, 1000 + i))
+        # Reading A makes B the least recently used figure
+        self.assertIsNotNone(self.cache.get('A', 'swc', {}))
+        self.cache.put('C', 'swc', {}, self.build())
+        self.assertIsNotNone(self.cache.get('A', 'swc', {}))
+        self.assertIsNone(self.cache.get('B', 'swc', {}))
+        self.assertIsNotNone(self.cache.get('C', 'swc', {}))
+
+    def test_popularity_and_prefill(self):
+        for subject_id in ['CROP_7002', 'CROP_7001', 'CROP_7002']:
+            self.cache.record_view(subject_id)
+        self.assertEqual(self.cache.popular_subjects(1), ['CROP_7002'])
+        cache = FigureCache(self.tmpdir.name, max_bytes=10 ** 7)
+        with Session(create_test_engine()) as session:
+            self.assertEqual(prefill_popular_figures(session, cache, 2), 2)
+            self.assertEqual(prefill_popular_figures(session, cache, 2), 0)
+        digest = content_hash(load_sample_swc('tracing_ves_TH_0_7002_U.swc'))
+        self.assertIsNotNone(cache.get('CROP_7002', digest, {'vertex_budget': 300}))
+
+    def test_concurrent_views_counted(self):
+        def view():
+            FigureCache(self.tmpdir.name).record_view('CROP_7001')
+
+        threads = [threading.Thread(target=view) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.view_counts(), {'CROP_7001': 8})
+
+    def test_figure_html(self):
+        html = figure_html('{"data": [], "layout": {}}')
+        self.assertIn('Plotly.newPlot', html)
+        self.assertIn('{"data": [], "layout": {}}', html)
+
+    def test_figure_html_escapes_script_end(self):
+        figure_json = json.dumps({"data": [{"text": ["</script><script>alert(1)</script>", "<!--"]}], "layout": {}})
+        html = figure_html(figure_json)
+        self.assertEqual(html.count('</script>'), 2)
+        self.assertNotIn('<!--', html)
+        # The escaped JSON still holds the same figure
+        script = html[html.index('var figure = ') + len('var figure = '):html.index(';\n    Plotly')]
+        self.assertEqual(json.loads(script), json.loads(figure_json))
+
+
+if __name__ == '__main__':
+    unittest.main()
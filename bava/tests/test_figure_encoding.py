@@ -0,0 +1,57 @@
+import base64
+import json
+import unittest
+import numpy as np
+from bava.visualization3d.figure_encoding import typed_array, encode_figure
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.tests.sample_data import load_sample_swc
+
+
+def decode(encoded):
+    array = np.frombuffer(base64.b64decode(encoded['bdata']), dtype='<' + encoded['dtype'])
+    if 'shape' in encoded:
+        array = array.reshape([int(n) for n in encoded['shape'].split(',')])
+    return array
+
+
+class TestTypedArray(unittest.TestCase):
+    def test_float_arrays_are_float32(self):
+        array = np.array([[1.5, np.nan, -2.25], [3.0, 4.0, 5.0]])
+        encoded = typed_array(array)
+        self.assertEqual(encoded['dtype'], 'f4')
+        self.assertEqual(encoded['shape'], '2,3')
+        np.testing.assert_array_equal(decode(encoded), array.astype(np.float32))
+
+    def test_integer_arrays_use_smallest_type(self):
+        self.assertEqual(typed_array(np.array([0, 1, 255]))['dtype'], 'u1')
+        self.assertEqual(typed_array(np.array([-1, 1]))['dtype'], 'i1')
+        self.assertEqual(typed_array(np.array([0, 70000]))['dtype'], 'u4')
+        self.assertEqual(typed_array(np.array([True, False]))['dtype'], 'u1')
+        np.testing.assert_array_equal(decode(typed_array(np.array([-300, 7]))), [-300, 7])
+
+
+class TestEncodeFigure(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fig = SubjectGraph(load_sample_swc()).create_interactive_plot()
+        cls.encoded = json.loads(encode_figure(cls.fig))
+
+    def test_positions_and_colors(self):
+        node_trace = self.encoded['data'][-1]
+        self.assertEqual(node_trace['x']['dtype'], 'f4')
+        np.testing.assert_allclose(decode(node_trace['x']), self.fig.data[-1].x, rtol=1e-6)
+        self.assertEqual(node_trace['marker']['color']['dtype'], 'u1')
+        self.assertEqual(decode(node_trace['customdata']).shape, (len(self.fig.data[-1].x), 3))
+        # String arrays stay JSON lists
+        self.assertEqual(node_trace['text'], list(self.fig.data[-1].text))
+
+    def test_payload_is_smaller(self):
+        plain = json.loads(self.fig.to_json())
+        self.assertLess(len(encode_figure(self.fig)), len(self.fig.to_json()))
+        for plain_trace, encoded_trace in zip(plain['data'], self.encoded['data']):
+            if len(plain_trace['x']) > 20:
+                self.assertLess(len(json.dumps(encoded_trace['x'])), len(json.dumps(plain_trace['x'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+import numpy as np
+from bava.visualization3d import swc2graph as swc2graph_module
+from bava.visualization3d.swc2graph import generateG, parse_swc, swc2graph
+from bava.tests.legacy_graph import legacy_generateG, snake_lists
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestGenerateG(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.swc_string = load_sample_swc()
+        cls.swc_data = parse_swc(cls.swc_string)
+
+    def assertGraphsIdentical(self, G, expected):
+        self.assertEqual(list(G.nodes), list(expected.nodes))
+        for node, attrs in expected.nodes(data=True):
+            np.testing.assert_array_equal(G.nodes[node]['pos'], attrs['pos'])
+            self.assertEqual(G.nodes[node]['radius'], attrs['radius'])
+            self.assertEqual(G.nodes[node]['ves_type'], attrs['ves_type'])
+            self.assertEqual([type(t) for t in G.nodes[node]['ves_type']], [type(t) for t in attrs['ves_type']])
+        self.assertEqual(list(G.edges(data='ves_type')), list(expected.edges(data='ves_type')))
+
+    def test_matches_legacy_on_resampled_snakes(self):
+        with mock.patch.object(swc2graph_module, 'generateG', wraps=generateG) as wrapped:
+            G = swc2graph(self.swc_string)
+        self.assertGraphsIdentical(G, legacy_generateG(*wrapped.call_args.args))
+
+    def test_matches_legacy_on_full_resolution(self):
+        for step in (1, 2, 5):
+            arguments = snake_lists(self.swc_data, step)
+            self.assertGraphsIdentical(generateG(*arguments), legacy_generateG(*arguments))
+
+    def test_negative_zero_is_merged(self):
+        points = [np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0]]), np.array([[-0.0, 0.0, 0.0], [0.0, 1.0, 0.0]])]
+        arguments = (points, [np.ones(2), np.ones(2)], [np.array([1.0, 2.0]), np.array([3.0, 4.0])],
+                     [np.array([1.0, 3.0]), np.array([3.0, 7.0])])
+        G = generateG(*arguments)
+        self.assertEqual(G.number_of_nodes(), 3)
+        self.assertGraphsIdentical(G, legacy_generateG(*arguments))
+
+    def test_empty_input(self):
+        self.assertEqual(generateG([], [], [], []).number_of_nodes(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
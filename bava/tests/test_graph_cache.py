@@ -0,0 +1,30 @@
+import unittest
+
+from bava.api.graph_cache import GraphCache
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestGraphCache(unittest.TestCase):
+    def test_build_and_get(self):
+        cache = GraphCache(max_entries=1)
+        self.assertIsNone(cache.get('a'))
+        graph, spatial_index = cache.build('a', load_sample_swc())
+        self.assertGreater(graph.number_of_edges(), 0)
+        self.assertIs(cache.get('a')[0], graph)
+        self.assertIs(cache.get('a')[1], spatial_index)
+
+    def test_least_recently_used_dropped(self):
+        cache = GraphCache(max_entries=2)
+        swc_string = load_sample_swc()
+        cache.build('a', swc_string)
+        cache.build('b', swc_string)
+        cache.get('a')
+        cache.build('c', swc_string)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        cache.clear()
+        self.assertIsNone(cache.get('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from collections import Counter
+import numpy as np
+import networkx as nx
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.visualization3d.graph_analysis import calculate_features, getvesid
+from bava.visualization3d.graph_edit import find_segment, segment_edges
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestGraphEdit(unittest.TestCase):
+    def setUp(self):
+        self.subject_graph = SubjectGraph(load_sample_swc())
+        self.G = self.subject_graph.graph
+
+    def assertFeaturesUpToDate(self):
+        expected = calculate_features(self.G)
+        self.assertEqual(set(self.subject_graph.features), set(expected))
+        for name, values in expected.items():
+            self.assertAlmostEqual(self.subject_graph.features[name]['length'], values['length'], places=6)
+            self.assertEqual(self.subject_graph.features[name]['branch_number'], values['branch_number'])
+        statistics = self.subject_graph.graph_statistics
+        components = [len(c) for c in nx.connected_components(self.G)]
+        self.assertEqual(statistics['num_components'], len(components))
+        self.assertEqual(statistics['largest_component_size'], max(components))
+        self.assertEqual(statistics['degree_histogram'], dict(sorted(Counter(d for _, d in self.G.degree()).items())))
+        self.assertEqual(statistics['branch_count'], sum(d for _, d in self.G.degree() if d != 2) // 2)
+
+    def find_edge(self, leaf=False):
+        """
+        Returns an edge inside a segment of at least 3 edges, at a leaf (degree-1 end) if requested.
+        """
+        for u, v in self.G.edges:
+            nodes = find_segment(self.G, u, v)
+            ends = (self.G.degree[nodes[0]], self.G.degree[nodes[-1]])
+            if len(nodes) > 3 and (not leaf or 1 in ends) and (leaf or min(ends) > 2):
+                return u, v
+        self.fail("No suitable segment in the sample graph")
+
+    def test_find_segment(self):
+        u, v = self.find_edge()
+        nodes = find_segment(self.G, u, v)
+        self.assertNotEqual(self.G.degree[nodes[0]], 2)
+        self.assertNotEqual(self.G.degree[nodes[-1]], 2)
+        self.assertTrue(all(self.G.degree[node] == 2 for node in nodes[1:-1]))
+        self.assertTrue(all(self.G.has_edge(a, b) for a, b in segment_edges(self.G, nodes)))
+
+    def test_find_segment_cycle(self):
+        G = nx.cycle_graph(5)
+        nodes = find_segment(G, 0, 1)
+        self.assertEqual(sorted(nodes), list(range(5)))
+        self.assertEqual(len(segment_edges(G, nodes)), 5)
+
+    def test_relabel_segment(self):
+        u, v = self.find_edge()
+        self.subject_graph.relabel_segment(u, v, 'AComm')
+        self.assertEqual(self.G.edges[u, v]['ves_type'], getvesid('AComm'))
+        self.assertFeaturesUpToDate()
+
+    def test_delete_leaf_segment(self):
+        u, v = self.find_edge(leaf=True)
+        num_nodes = self.G.number_of_nodes()
+        self.subject_graph.delete_segment(u, v)
+        self.assertFalse(self.G.has_edge(u, v))
+        self.assertLess(self.G.number_of_nodes(), num_nodes)
+        self.assertFeaturesUpToDate()
+
+    def test_delete_inner_segment(self):
+        u, v = self.find_edge()
+        self.subject_graph.graph_statistics  # build the tracker before editing
+        self.subject_graph.delete_segment(u, v)
+        self.assertFeaturesUpToDate()
+
+    def test_add_segment(self):
+        nodes = list(self.G.nodes)
+        start, end = nodes[0], nodes[-1]
+        points = np.linspace(self.G.nodes[start]['pos'], self.G.nodes[end]['pos'], 6)[1:-1]
+        new_nodes = self.subject_graph.add_segment(points, 1.5, 'PComm_L', start=start, end=end)
+        self.assertEqual(len(new_nodes), 4)
+        self.assertTrue(nx.has_path(self.G, start, end))
+        self.assertIn(getvesid('PComm_L'), self.G.nodes[start]['ves_type'])
+        self.assertFeaturesUpToDate()
+
+    def test_edit_sequence(self):
+        u, v = self.find_edge(leaf=True)
+        self.subject_graph.delete_segment(u, v)
+        a, b = self.find_edge()
+        self.subject_graph.relabel_segment(a, b, 'BA')
+        self.subject_graph.add_segment([[0.0, 0.0, 0.0], [5.0, 0.0, 0.0]], 1.0, 'BA')
+        self.assertFeaturesUpToDate()
+        # Edits invalidate the spatial index
+        self.assertEqual(self.subject_graph.spatial_index.nearest_node([0.0, 0.0, 0.0])['distances'][0], 0.0)
+
+    def test_invalid_edits(self):
+        with self.assertRaises(ValueError):
+            self.subject_graph.delete_segment(-1.0, -2.0)
+        with self.assertRaises(ValueError):
+            self.subject_graph.add_segment([[0.0, 0.0, 0.0]], 1.0, 'BA', start=-1.0)
+        with self.assertRaises(ValueError):
+            self.subject_graph.add_segment([[0.0, 0.0, 0.0]], 1.0, 'not a vessel')
+
+
+if __name__ == '__main__':
+    unittest.main()
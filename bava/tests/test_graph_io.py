@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.visualization3d.graph_io import read_graph_file, FORMAT_VERSION
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestGraphIO(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.swc_string = load_sample_swc()
+        cls.subject_graph = SubjectGraph(cls.swc_string)
+        cls.subject_graph.add_centrality_measures()
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmpdir.name, 'subject.bavag')
+        cls.subject_graph.save(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        for mmap in (True, False):
+            loaded = SubjectGraph.load(self.path, mmap=mmap)
+            G, expected = loaded.graph, self.subject_graph.graph
+            self.assertEqual(list(G.nodes), list(expected.nodes))
+            self.assertEqual(list(G.edges(data='ves_type')), list(expected.edges(data='ves_type')))
+            for node, attrs in expected.nodes(data=True):
+                np.testing.assert_array_equal(G.nodes[node]['pos'], attrs['pos'])
+                for name in ('radius', 'ves_type', 'degree', 'closeness', 'betweenness', 'pagerank'):
+                    self.assertEqual(G.nodes[node][name], attrs[name])
+            self.assertEqual(loaded.features, self.subject_graph.features)
+            self.assertEqual(loaded.morphological_features, self.subject_graph.morphological_features)
+            self.assertIsNone(loaded.swc_string)
+
+    def test_header_and_alignment(self):
+        header, arrays = read_graph_file(self.path)
+        self.assertEqual(header['format_version'], FORMAT_VERSION)
+        self.assertIsInstance(arrays['pos'], np.memmap)
+        for entry in header['arrays'].values():
+            self.assertEqual(entry['offset'] % 64, 0)
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.tmpdir.name, 'other.bavag')
+        with open(path, 'wb') as f:
+            f.write(b'not a graph file at all')
+        with self.assertRaises(ValueError):
+            SubjectGraph.load(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from sqlmodel import Session, create_engine, select, text
+
+from bava.api.database import migrate_subjects_table
+from bava.api.explain_filters import REPRESENTATIVE_FILTERS, explain_filter
+from bava.api.ingest import backfill_derived_columns, compute_derived_columns
+from bava.api.schemas import Subject
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        # A subjects table as created before the derived columns existed
+        self.engine = create_engine("sqlite://")
+        self.swc_string = load_sample_swc()
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE subjects (ID VARCHAR NOT NULL PRIMARY KEY, Age INTEGER, Smoking BOOLEAN, SBP FLOAT, "
+                "DBP FLOAT, Hypertension BOOLEAN, TC FLOAT, TG FLOAT, HDL FLOAT, LDL FLOAT, Diabetes BOOLEAN, "
+                "Framingham_Risk FLOAT, Gender VARCHAR(6), Race VARCHAR(16), unstructured_data VARCHAR, "
+                "morphological_features VARCHAR)"))
+            connection.execute(text(
+                "INSERT INTO subjects VALUES ('CROP_7001', 60, 0, 120, 80, 0, 180, 150, 50, 100, 0, 0.1, 'male', "
+                "'asian', :swc, '{}')"), {"swc": self.swc_string})
+
+    def test_migrate_adds_columns_and_indexes(self):
+        migrate_subjects_table(self.engine)
+        with self.engine.connect() as connection:
+            columns = {row[1] for row in connection.execute(text("PRAGMA table_info(subjects)"))}
+            indexes = {row[1] for row in connection.execute(text("PRAGMA index_list(subjects)"))}
+        self.assertTrue(set(Subject.__table__.columns.keys()) <= columns)
+        self.assertTrue({index.name for index in Subject.__table__.indexes} <= indexes)
+        # Migrating an up-to-date table is a no-op
+        migrate_subjects_table(self.engine)
+
+    def test_migrate_drops_obsolete_indexes(self):
+        # The legacy table has no vessel_mask column yet, only the index name matters
+        with self.engine.begin() as connection:
+            connection.execute(text("CREATE INDEX ix_subjects_vessel_mask ON subjects (morphological_features)"))
+        migrate_subjects_table(self.engine)
+        with self.engine.connect() as connection:
+            indexes = {row[1] for row in connection.execute(text("PRAGMA index_list(subjects)"))}
+        self.assertNotIn("ix_subjects_vessel_mask", indexes)
+
+    def test_migrate_fills_dataset(self):
+        migrate_subjects_table(self.engine)
+        with Session(self.engine) as session:
+            self.assertEqual(session.exec(select(Subject.dataset)).all(), ["CROP"])
+
+    def test_filters_use_indexes(self):
+        migrate_subjects_table(self.engine)
+        with self.engine.connect() as connection:
+            for filter_options in REPRESENTATIVE_FILTERS.values():
+                self.assertIn("USING INDEX", " ".join(explain_filter(connection, filter_options)))
+
+    def test_backfill_derived_columns(self):
+        migrate_subjects_table(self.engine)
+        with Session(self.engine) as session:
+            self.assertEqual(backfill_derived_columns(session), 1)
+            self.assertEqual(backfill_derived_columns(session), 0)
+            stenosis_count, max_stenosis = session.exec(select(Subject.stenosis_count, Subject.max_stenosis)).one()
+        expected = compute_derived_columns(self.swc_string)
+        self.assertEqual(stenosis_count, expected["stenosis_count"])
+        self.assertAlmostEqual(max_stenosis, expected["max_stenosis"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from collections import Counter
+import numpy as np
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.visualization3d.graph_analysis import getvesname
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestInteractivePlot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = SubjectGraph(load_sample_swc()).graph
+        cls.fig = SubjectGraph.from_graph(cls.graph).create_interactive_plot()
+
+    def test_one_trace_per_vessel_type(self):
+        edge_counts = Counter(getvesname(t) for _, _, t in self.graph.edges(data='ves_type'))
+        line_traces = [trace for trace in self.fig.data if trace.mode == 'lines']
+        self.assertEqual([trace.name for trace in line_traces], list(edge_counts))
+        self.assertEqual(len(self.fig.data), len(edge_counts) + 1)
+        for trace in line_traces:
+            x = np.asarray(trace.x, dtype=float)
+            self.assertEqual(len(x), 3 * edge_counts[trace.name])
+            self.assertTrue(np.all(np.isnan(x[2::3])))
+            self.assertEqual(np.count_nonzero(~np.isnan(x)), 2 * edge_counts[trace.name])
+            self.assertEqual(trace.hovertemplate, f'{trace.name}<extra></extra>')
+
+    def test_segments_match_edges(self):
+        trace = next(trace for trace in self.fig.data if trace.mode == 'lines')
+        segments = np.column_stack([trace.x, trace.y, trace.z]).astype(float).reshape(-1, 3, 3)[:, :2]
+        edges = [(u, v) for u, v, t in self.graph.edges(data='ves_type') if getvesname(t) == trace.name]
+        expected = np.array([[self.graph.nodes[u]['pos'], self.graph.nodes[v]['pos']] for u, v in edges])
+        np.testing.assert_array_equal(segments, expected)
+
+    def test_nodes(self):
+        node_trace = self.fig.data[-1]
+        self.assertEqual(len(node_trace.x), self.graph.number_of_nodes())
+        bifurcations = sum(len(types) > 1 for _, types in self.graph.nodes(data='ves_type'))
+        self.assertEqual(int(np.sum(node_trace.marker.color)), bifurcations)
+        self.assertEqual(node_trace.marker.colorscale[1][1], 'red')
+
+    def test_node_hover_data(self):
+        node_trace = self.fig.data[-1]
+        node, types = next(iter(self.graph.nodes(data='ves_type')))
+        self.assertEqual(node_trace.text[0], ', '.join(getvesname(t) for t in types))
+        self.assertEqual(np.shape(node_trace.customdata), (self.graph.number_of_nodes(), 3))
+        self.assertIn('%{customdata[0]:.2f}', node_trace.hovertemplate)
+
+
+if __name__ == '__main__':
+    unittest.main()
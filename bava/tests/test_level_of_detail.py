@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+import numpy as np
+import networkx as nx
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.visualization3d.swc2graph import swc2graph
+from bava.visualization3d.level_of_detail import decimate_graph, graph_chains
+from bava.tests.sample_data import load_sample_swc
+
+
+def count_points(fig):
+    return sum(np.count_nonzero(~np.isnan(np.asarray(trace.x, dtype=float))) for trace in fig.data if trace.mode == 'lines')
+
+
+class TestLevelOfDetail(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.G = swc2graph(load_sample_swc(), distance_threshold=0)
+        cls.anchors = {node for node in cls.G.nodes if cls.G.degree[node] != 2}
+
+    def test_chains_cover_edges(self):
+        chains = graph_chains(self.G)
+        self.assertEqual(sum(len(chain) - 1 for chain in chains), self.G.number_of_edges())
+        for chain in chains:
+            self.assertIn(chain[0], self.anchors)
+            self.assertIn(chain[-1], self.anchors)
+
+    def test_budget_and_topology(self):
+        for vertex_budget in (200, 500, 1000):
+            coarse = decimate_graph(self.G, vertex_budget)
+            self.assertLessEqual(coarse.number_of_nodes(), vertex_budget)
+            self.assertTrue(self.anchors <= set(coarse.nodes))
+            self.assertEqual(nx.number_connected_components(coarse), nx.number_connected_components(self.G))
+            self.assertEqual(dict(coarse.degree(self.anchors)), dict(self.G.degree(self.anchors)))
+
+    def test_full_detail_within_budget(self):
+        self.assertIs(decimate_graph(self.G, self.G.number_of_nodes()), self.G)
+
+    def test_bifurcations_exceeding_budget(self):
+        coarse = decimate_graph(self.G, 10)
+        self.assertEqual(set(coarse.nodes), self.anchors)
+
+    def test_cycle_is_kept(self):
+        G = nx.cycle_graph(12)
+        nx.set_edge_attributes(G, 1, 'ves_type')
+        coarse = decimate_graph(G, 4)
+        self.assertEqual(len(nx.cycle_basis(coarse)), 1)
+
+    def test_plot_with_budget_and_region(self):
+        subject_graph = SubjectGraph(load_sample_swc())
+        full = subject_graph.create_interactive_plot()
+        coarse = subject_graph.create_interactive_plot(vertex_budget=300)
+        self.assertLess(count_points(coarse), count_points(full))
+        self.assertLessEqual(len(coarse.data[-1].x), 300)
+        # The region is only drawn, so no SubjectGraph with features is built for it
+        with mock.patch.object(SubjectGraph, 'from_graph') as from_graph:
+            region = subject_graph.create_interactive_plot(vertex_budget=300, center=[224.269, 239.583, 99.565],
+                                                           radius=30.0)
+        from_graph.assert_not_called()
+        self.assertLess(count_points(region), count_points(full))
+        with self.assertRaises(ValueError):
+            subject_graph.create_interactive_plot(center=[0.0, 0.0, 0.0], radius=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from sqlalchemy import event, text, update
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+from bava.api.metadata_cache import get_metadata, query_metadata
+from bava.api.schemas import Subject, Gender, Race
+from bava.tests.test_api import create_test_engine
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_test_engine()
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self.count_statement)
+
+    def count_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def test_single_query(self):
+        with Session(self.engine) as session:
+            metadata = query_metadata(session)
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual((metadata.age.min, metadata.age.max, metadata.age.avg), (60, 61, 60.5))
+        self.assertAlmostEqual(metadata.framingham_risk.avg, 0.15)
+
+    def add_subject(self, session, age=90):
+        session.add(Subject(ID="CROP_7003", Age=age, Smoking=False, SBP=120.0, DBP=80.0, Hypertension=False,
+                            TC=180.0, TG=150.0, HDL=50.0, LDL=100.0, Diabetes=False, Framingham_Risk=0.1,
+                            Gender=Gender.male, Race=Race.asian))
+
+    def test_cached_until_commit(self):
+        with Session(self.engine) as session:
+            first = get_metadata(session)
+            self.statements.clear()
+            self.assertIs(get_metadata(session), first)
+            # A cache hit only reads the version of the subjects table
+            self.assertEqual(len(self.statements), 1)
+            self.assertIn("subjects_version", self.statements[0])
+
+            self.add_subject(session)
+            session.commit()
+            self.assertEqual(get_metadata(session).age.max, 90)
+
+    def test_uncommitted_subjects_not_cached(self):
+        with Session(self.engine) as session:
+            first = get_metadata(session)
+            self.add_subject(session)
+            # The session sees its own pending subject, but the result is not cached
+            self.assertEqual(get_metadata(session).age.max, 90)
+            session.flush()
+            self.assertEqual(get_metadata(session).age.max, 90)
+            session.rollback()
+            self.assertIs(get_metadata(session), first)
+        with Session(self.engine) as session:
+            self.assertEqual(get_metadata(session).age.max, 61)
+
+    def test_rollback_and_bulk_update(self):
+        with Session(self.engine) as session:
+            first = get_metadata(session)
+            session.get(Subject, "CROP_7001").Age = 20
+            session.flush()
+            session.rollback()
+            self.assertIs(get_metadata(session), first)
+            session.execute(update(Subject).values(SBP=200.0))
+            session.commit()
+            self.assertEqual(get_metadata(session).sbp.min, 200.0)
+
+    def test_changes_outside_orm(self):
+        # Rows written by another process bypass the session, like raw SQL does
+        with Session(self.engine) as session:
+            get_metadata(session)
+        with self.engine.begin() as connection:
+            connection.execute(text("UPDATE subjects SET Age = 70 WHERE ID = 'CROP_7002'"))
+        with Session(self.engine) as session:
+            self.assertEqual(get_metadata(session).age.max, 70)
+        with self.engine.begin() as connection:
+            connection.execute(text("DELETE FROM subjects WHERE ID = 'CROP_7002'"))
+        with Session(self.engine) as session:
+            self.assertEqual(get_metadata(session).age.max, 60)
+
+    def test_not_cached_without_version(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            self.assertIsNot(get_metadata(session), get_metadata(session))
+
+
+if __name__ == '__main__':
+    unittest.main()
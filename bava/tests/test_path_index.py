@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+import networkx as nx
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.visualization3d.path_index import PathLengthIndex
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestPathLengthIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = SubjectGraph(load_sample_swc()).graph.copy()
+        nodes = list(cls.graph.nodes)
+        # Close a few cycles so that the non-tree edges are exercised
+        for a, b in [(3, 250), (40, 41), (100, 400), (7, 500)]:
+            cls.graph.add_edge(nodes[a], nodes[b], ves_type=11)
+        for u, v in cls.graph.edges:
+            cls.graph.edges[u, v]['length'] = np.linalg.norm(cls.graph.nodes[u]['pos'] - cls.graph.nodes[v]['pos'])
+        cls.index = PathLengthIndex(cls.graph)
+        rng = np.random.default_rng(0)
+        cls.sources = [nodes[i] for i in rng.integers(0, len(nodes), 200)]
+        cls.targets = [nodes[i] for i in rng.integers(0, len(nodes), 200)]
+
+    def reference_length(self, source, target):
+        try:
+            return nx.shortest_path_length(self.graph, source, target, weight='length')
+        except nx.NetworkXNoPath:
+            return np.inf
+
+    def test_path_lengths_match_dijkstra(self):
+        lengths = self.index.path_lengths(self.sources, self.targets)
+        expected = [self.reference_length(s, t) for s, t in zip(self.sources, self.targets)]
+        np.testing.assert_allclose(lengths, expected)
+
+    def test_path_is_shortest(self):
+        for source, target in zip(self.sources[:50], self.targets[:50]):
+            path = self.index.path(source, target)
+            if path is None:
+                self.assertTrue(np.isinf(self.index.path_length(source, target)))
+                continue
+            self.assertEqual((path[0], path[-1]), (source, target))
+            length = sum(self.graph.edges[u, v]['length'] for u, v in zip(path, path[1:]))
+            self.assertAlmostEqual(length, self.index.path_length(source, target))
+
+    def test_subject_graph_path_index(self):
+        subject = SubjectGraph(load_sample_swc())
+        self.assertIs(subject.path_index, subject.path_index)
+        self.assertEqual(subject.path_index.path_length(1.0, 1.0), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
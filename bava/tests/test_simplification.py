@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+import networkx as nx
+from bava.visualization3d.swc2graph import swc2graph, simplify_polyline, point_segment_distances
+from bava.tests.sample_data import load_sample_swc
+
+
+def total_length(G):
+    return sum(np.linalg.norm(np.asarray(G.nodes[u]['pos']) - np.asarray(G.nodes[v]['pos'])) for u, v in G.edges)
+
+
+class TestSimplifyPolyline(unittest.TestCase):
+    def test_straight_line_keeps_endpoints(self):
+        points = np.column_stack([np.linspace(0, 10, 11), np.zeros(11), np.zeros(11)])
+        np.testing.assert_array_equal(simplify_polyline(points, 0.1), [0, 10])
+
+    def test_keep_mask_is_respected(self):
+        points = np.column_stack([np.linspace(0, 10, 11), np.zeros(11), np.zeros(11)])
+        keep = np.zeros(11, dtype=bool)
+        keep[4] = True
+        np.testing.assert_array_equal(simplify_polyline(points, 0.1, keep), [0, 4, 10])
+
+    def test_dropped_points_within_tolerance(self):
+        t = np.linspace(0, 4 * np.pi, 200)
+        points = np.column_stack([t, np.sin(t), 0.5 * np.cos(2 * t)])
+        tolerance = 0.05
+        kept = simplify_polyline(points, tolerance)
+        self.assertLess(len(kept), len(points))
+        for first, last in zip(kept[:-1], kept[1:]):
+            if last - first > 1:
+                distances = point_segment_distances(points[first + 1:last], points[first], points[last])
+                self.assertLessEqual(distances.max(), tolerance)
+
+
+class TestSimplifiedGraph(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.swc_string = load_sample_swc()
+        cls.full = swc2graph(cls.swc_string, distance_threshold=0)
+        cls.full_length = total_length(cls.full)
+
+    def length_error(self, G):
+        return abs(1 - total_length(G) / self.full_length)
+
+    def test_smaller_graph_for_same_length_error(self):
+        resampled = swc2graph(self.swc_string, distance_threshold=5)
+        simplified = swc2graph(self.swc_string, simplify_tolerance=1)
+        self.assertLessEqual(self.length_error(simplified), self.length_error(resampled))
+        self.assertLess(simplified.number_of_nodes(), 0.8 * resampled.number_of_nodes())
+
+    def test_bifurcations_are_kept(self):
+        simplified = swc2graph(self.swc_string, simplify_tolerance=2)
+        self.assertEqual(nx.number_connected_components(simplified), nx.number_connected_components(self.full))
+
+
+if __name__ == '__main__':
+    unittest.main()
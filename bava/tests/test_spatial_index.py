@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.visualization3d.spatial_index import segment_point_distances, segments_intersect_box
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestSpatialIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.subject = SubjectGraph(load_sample_swc())
+        cls.index = cls.subject.spatial_index
+        cls.arrays = cls.index.arrays
+        cls.starts = cls.arrays.pos[cls.arrays.edges[:, 0]]
+        cls.ends = cls.arrays.pos[cls.arrays.edges[:, 1]]
+
+    def test_index_is_cached(self):
+        self.assertIs(self.subject.spatial_index, self.index)
+
+    def test_nearest_node_matches_brute_force(self):
+        point = self.arrays.pos[10] + [1.5, -2.0, 0.5]
+        result = self.index.nearest_node(point, k=3)
+        expected = np.argsort(np.linalg.norm(self.arrays.pos - point, axis=1))[:3]
+        np.testing.assert_array_equal(result['node_index'], expected)
+        self.assertEqual(len(result['node_ves_types']), 3)
+
+    def test_nearest_edge_matches_brute_force(self):
+        point = (self.starts[42] + self.ends[42]) / 2 + [0.3, 0.2, -0.1]
+        result = self.index.nearest_edge(point)
+        distances = segment_point_distances(self.starts, self.ends, point)
+        self.assertAlmostEqual(result['distances'][0], distances.min())
+        self.assertEqual(result['edge_index'][0], np.argmin(distances))
+
+    def test_within_radius_matches_brute_force(self):
+        center, radius = self.arrays.pos[100], 20.0
+        result = self.index.within_radius(center, radius)
+        expected_nodes = np.flatnonzero(np.linalg.norm(self.arrays.pos - center, axis=1) <= radius)
+        expected_edges = np.flatnonzero(segment_point_distances(self.starts, self.ends, center) <= radius)
+        np.testing.assert_array_equal(result['node_index'], expected_nodes)
+        np.testing.assert_array_equal(result['edge_index'], expected_edges)
+
+    def test_within_box_matches_brute_force(self):
+        lower = self.arrays.pos[200] - [10, 25, 5]
+        upper = self.arrays.pos[200] + [15, 5, 30]
+        result = self.index.within_box(lower, upper)
+        expected_nodes = np.flatnonzero(np.all((self.arrays.pos >= lower) & (self.arrays.pos <= upper), axis=1))
+        expected_edges = np.flatnonzero(segments_intersect_box(self.starts, self.ends, lower, upper))
+        np.testing.assert_array_equal(result['node_index'], expected_nodes)
+        np.testing.assert_array_equal(result['edge_index'], expected_edges)
+
+    def test_segments_intersect_box(self):
+        starts = np.array([[-1.0, 0.5, 0.5], [2.0, 2.0, 2.0], [0.5, 0.5, -1.0]])
+        ends = np.array([[2.0, 0.5, 0.5], [3.0, 3.0, 3.0], [0.5, 0.5, -0.5]])
+        mask = segments_intersect_box(starts, ends, np.zeros(3), np.ones(3))
+        np.testing.assert_array_equal(mask, [True, False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from collections import Counter
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+from bava.visualization3d.swc2graph import swc2graph, visualize_3d_graph
+from bava.visualization3d.static_render import BatchRenderer
+from bava.visualization3d.graph_analysis import getvesname
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestStaticRender(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.G = swc2graph(load_sample_swc())
+        cls.renderer = BatchRenderer(figsize=(4, 3), dpi=50)
+
+    def test_formats(self):
+        self.assertTrue(visualize_3d_graph(self.G).startswith(b'\x89PNG'))
+        self.assertIn(b'<svg', self.renderer.render(self.G, image_format='svg'))
+        with self.assertRaises(ValueError):
+            self.renderer.render(self.G, image_format='bmp')
+
+    def test_one_collection_per_vessel_type(self):
+        self.renderer.render(self.G)
+        collections = [c for c in self.renderer.ax.collections if isinstance(c, Line3DCollection)]
+        edge_counts = Counter(getvesname(t) for _, _, t in self.G.edges(data='ves_type'))
+        self.assertEqual(len(collections), len(edge_counts))
+        self.assertEqual(sorted(len(c.get_segments()) for c in collections), sorted(edge_counts.values()))
+        self.assertEqual([text.get_text() for text in self.renderer.ax.get_legend().get_texts()], list(edge_counts))
+
+    def test_reused_figure_and_cameras(self):
+        figure = self.renderer.figure
+        superior = self.renderer.render(self.G, camera='superior')
+        self.assertEqual((self.renderer.ax.elev, self.renderer.ax.azim), (90, -90))
+        images = list(self.renderer.render_many([self.G, self.G], camera='superior'))
+        self.assertIs(self.renderer.figure, figure)
+        self.assertEqual(images, [superior, superior])
+        self.assertNotEqual(self.renderer.render(self.G, camera=(10, 45)), superior)
+        with self.assertRaises(ValueError):
+            self.renderer.render(self.G, camera='sideways')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from sqlmodel import Session, select
+from bava.api.render_thumbnails import render_missing_thumbnails
+from bava.api.schemas import Subject
+from bava.visualization3d.figure_cache import content_hash
+from bava.visualization3d.thumbnails import ThumbnailStore, render_thumbnail
+from bava.tests.sample_data import load_sample_swc
+from bava.tests.test_api import create_test_engine
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class TestThumbnails(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = ThumbnailStore(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_render_thumbnail(self):
+        png = render_thumbnail(load_sample_swc(), size=64)
+        self.assertTrue(png.startswith(PNG_SIGNATURE))
+        # The width and height in the IHDR chunk
+        self.assertEqual((int.from_bytes(png[16:20], 'big'), int.from_bytes(png[20:24], 'big')), (64, 64))
+
+    def test_render_thumbnail_threads(self):
+        swc_strings = [load_sample_swc('tracing_ves_TH_0_7001_U.swc'), load_sample_swc('tracing_ves_TH_0_7002_U.swc')]
+        expected = [render_thumbnail(swc_string, size=48) for swc_string in swc_strings]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            pngs = list(executor.map(lambda i: render_thumbnail(swc_strings[i % 2], size=48), range(12)))
+        self.assertEqual(pngs, [expected[i % 2] for i in range(12)])
+
+    def test_content_addressed(self):
+        self.assertIsNone(self.store.get('swc'))
+        self.store.put('swc', b'image')
+        self.assertEqual(self.store.get('swc'), b'image')
+        self.assertTrue(self.store.contains('swc'))
+        self.assertFalse(self.store.contains('edited swc'))
+        self.assertFalse(self.store.contains('swc', {'camera': 'left', 'size': 160}))
+        key = self.store.key('swc')
+        self.assertEqual(self.store.path('swc'), os.path.join(self.tmpdir.name, key[:2], f"{key}.png"))
+
+    def test_render_missing_thumbnails(self):
+        engine = create_test_engine()
+        options = {'camera': 'superior', 'size': 48}
+        with Session(engine) as session:
+            self.assertEqual(render_missing_thumbnails(session, self.store, workers=2, options=options), 2)
+            self.assertEqual(render_missing_thumbnails(session, self.store, workers=2, options=options), 0)
+            for swc_string, digest in session.exec(select(Subject.unstructured_data, Subject.tracing_hash)):
+                self.assertEqual(digest, content_hash(swc_string))
+                self.assertTrue(self.store.get(digest, options).startswith(PNG_SIGNATURE))
+
+
+if __name__ == '__main__':
+    unittest.main()
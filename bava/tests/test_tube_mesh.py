@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.visualization3d.swc2graph import swc2graph
+from bava.visualization3d.graph_arrays import GraphArrays
+from bava.visualization3d.graph_analysis import getvesname
+from bava.visualization3d.tube_mesh import tube_mesh, create_tube_plot
+from bava.tests.sample_data import load_sample_swc
+
+
+class TestTubeMesh(unittest.TestCase):
+    def test_straight_tube(self):
+        pos = np.array([[0, 0, 0], [0, 0, 5], [0, 0, 10]], dtype=float)
+        radius = np.array([1.0, 2.0, 3.0])
+        vertices, triangles = tube_mesh(pos, radius, [[0, 1], [1, 2]], sides=6)
+        self.assertEqual(vertices.shape, (18, 3))
+        self.assertEqual(triangles.shape, (24, 3))
+        np.testing.assert_allclose(np.linalg.norm(vertices[:, :2], axis=1), np.repeat(radius, 6))
+        # Without twisting, every triangle edge between two rings is as short as the ring spacing allows
+        lengths = np.linalg.norm(vertices[triangles] - vertices[np.roll(triangles, 1, axis=1)], axis=-1)
+        self.assertLess(lengths.max(), np.hypot(5, 3 * 2 * np.sin(np.pi / 6)) + 1e-9)
+
+    def test_joints_share_rings(self):
+        pos = np.array([[0, 0, 0], [0, 0, 5], [5, 0, 10], [-5, 0, 10]], dtype=float)
+        vertices, triangles = tube_mesh(pos, np.ones(4), [[0, 1], [1, 2], [1, 3]], sides=8)
+        self.assertEqual(len(vertices), 4 * 8)
+        self.assertEqual(len(np.unique(triangles)), 4 * 8)
+
+    def test_invalid_sides(self):
+        with self.assertRaises(ValueError):
+            tube_mesh(np.zeros((2, 3)), np.ones(2), [[0, 1]], sides=2)
+
+
+class TestTubePlot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.G = swc2graph(load_sample_swc(), distance_threshold=0)
+
+    def test_one_mesh_per_vessel_type(self):
+        fig = create_tube_plot(self.G, sides=6, triangle_budget=10 ** 7)
+        names = list(dict.fromkeys(getvesname(t) for _, _, t in self.G.edges(data='ves_type')))
+        self.assertEqual([trace.name for trace in fig.data], names)
+        self.assertEqual(sum(len(trace.i) for trace in fig.data), 2 * 6 * self.G.number_of_edges())
+        # The tubes follow the traced radii
+        arrays = GraphArrays(self.G)
+        x = np.concatenate([trace.x for trace in fig.data])
+        self.assertLessEqual(x.max(), (arrays.pos[:, 0] + arrays.radius).max() + 1e-9)
+
+    def test_triangle_budget(self):
+        for triangle_budget in (5000, 20000):
+            fig = create_tube_plot(self.G, sides=8, triangle_budget=triangle_budget)
+            self.assertLessEqual(sum(len(trace.i) for trace in fig.data), triangle_budget)
+
+    def test_subject_graph_region(self):
+        subject = SubjectGraph.from_graph(self.G)
+        center = GraphArrays(self.G).pos[self.G.number_of_nodes() // 2]
+        fig = subject.create_tube_plot(sides=4, center=center, radius=20)
+        self.assertLess(sum(len(trace.i) for trace in fig.data), 2 * 4 * self.G.number_of_edges())
+
+
+if __name__ == '__main__':
+    unittest.main()
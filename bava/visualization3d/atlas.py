@@ -0,0 +1,231 @@
+"""
+This module builds a population vessel-density atlas on a voxel grid.
+
+Each subject's vessels are sampled along their edges and binned into the grid at once with array
+operations. The atlas only keeps grid-sized accumulators (subject count, radius sum and sample count
+per voxel), so subjects can be streamed through it one at a time and memory does not grow with
+the cohort size.
+
+The occupancy of a voxel is the fraction of subjects with a vessel in it, and its mean radius is
+the mean vessel radius over all samples in it.
+
+Example usage:
+    atlas = VesselAtlas(voxel_size=8.0)
+    for swc_string in swc_strings:
+        atlas.add_swc(parse_swc(swc_string))
+    fig = create_atlas_plot(atlas.to_dict(), isomin=0.5)
+"""
+import numpy as np
+import plotly.graph_objects as go
+
+from .radius_profile import chain_offsets
+
+ATLAS_LOWER = (0.0, 0.0, 0.0)
+ATLAS_UPPER = (512.0, 512.0, 256.0)
+ATLAS_VOXEL_SIZE = 8.0
+
+
+def sample_edges(pos, radius, edges, spacing):
+    """
+    Sample points along edges, at most `spacing` apart, with linearly interpolated radii.
+
+    Every edge contributes its start point and evenly spaced points up to (excluding) its end point.
+
+    Parameters:
+    - pos (numpy.ndarray): The node positions, shape (n, 3).
+    - radius (numpy.ndarray): The node radii, shape (n,).
+    - edges (numpy.ndarray): The edges as rows of node indices, shape (m, 2).
+    - spacing (float): The largest distance between consecutive samples.
+
+    Returns:
+    - samples (numpy.ndarray): The sample positions, shape (k, 3).
+    - sample_radius (numpy.ndarray): The sample radii, shape (k,).
+    """
+    start, end = edges[:, 0], edges[:, 1]
+    length = np.linalg.norm(pos[end] - pos[start], axis=1)
+    steps = np.maximum(np.ceil(length / spacing).astype(np.int64), 1)
+    edge = np.repeat(np.arange(len(edges)), steps)
+    first = np.repeat(np.cumsum(steps) - steps, steps)
+    t = ((np.arange(len(edge)) - first) / steps[edge])[:, None]
+    samples = pos[start[edge]] + t * (pos[end[edge]] - pos[start[edge]])
+    sample_radius = radius[start[edge]] + t[:, 0] * (radius[end[edge]] - radius[start[edge]])
+    return samples, sample_radius
+
+
+class VesselAtlas:
+    """
+    A voxel grid accumulating vessel occupancy and radius over a cohort.
+
+    Attributes:
+        lower (numpy.ndarray): The lower corner of the grid.
+        voxel_size (float): The edge length of a voxel.
+        shape (tuple): The number of voxels along each axis.
+        num_subjects (int): The number of subjects added.
+        subject_count (numpy.ndarray): The number of subjects with a vessel in each voxel (flat).
+        radius_sum (numpy.ndarray): The sum of the sampled radii in each voxel (flat).
+        sample_count (numpy.ndarray): The number of samples in each voxel (flat).
+
+    Methods:
+        add_subject(pos, radius, edges): Adds a subject from its node and edge arrays.
+        add_swc(swc_data): Adds a subject from its SWC rows.
+        occupancy(): Returns the occupancy probability grid.
+        mean_radius(): Returns the mean radius grid.
+        to_dict(): Returns the occupied voxels in a compact, JSON-serializable form.
+        save(path) / load(path): Stores the atlas in (or reads it from) an .npz file.
+    """
+
+    def __init__(self, lower=ATLAS_LOWER, upper=ATLAS_UPPER, voxel_size=ATLAS_VOXEL_SIZE):
+        """
+        Creates an empty atlas.
+
+        Parameters:
+        - lower (array-like): The lower corner (x, y, z) of the grid.
+        - upper (array-like): The upper corner (x, y, z) of the grid.
+        - voxel_size (float): The edge length of a voxel.
+        """
+        if voxel_size <= 0:
+            raise ValueError("The voxel size must be positive")
+        self.lower = np.asarray(lower, dtype=float)
+        self.voxel_size = float(voxel_size)
+        extent = np.asarray(upper, dtype=float) - self.lower
+        if np.any(extent <= 0):
+            raise ValueError("The upper corner of the grid must be above its lower corner")
+        self.shape = tuple(int(n) for n in np.ceil(extent / self.voxel_size))
+        size = int(np.prod(self.shape))
+        self.num_subjects = 0
+        self.subject_count = np.zeros(size, dtype=np.int64)
+        self.radius_sum = np.zeros(size)
+        self.sample_count = np.zeros(size, dtype=np.int64)
+
+    def add_subject(self, pos, radius, edges):
+        """
+        Adds the vessels of one subject to the atlas. Samples outside the grid are ignored.
+
+        Parameters:
+        - pos (numpy.ndarray): The node positions, shape (n, 3).
+        - radius (numpy.ndarray): The node radii, shape (n,).
+        - edges (numpy.ndarray): The edges as rows of node indices, shape (m, 2).
+        """
+        pos = np.asarray(pos, dtype=float).reshape(-1, 3)
+        radius = np.asarray(radius, dtype=float)
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        samples, sample_radius = sample_edges(pos, radius, edges, self.voxel_size / 2)
+        # Add the nodes too, so that edge end points and isolated nodes are covered
+        samples = np.concatenate([samples, pos])
+        sample_radius = np.concatenate([sample_radius, radius])
+
+        voxel = np.floor((samples - self.lower) / self.voxel_size).astype(np.int64)
+        inside = np.all((voxel >= 0) & (voxel < self.shape), axis=1)
+        flat = np.ravel_multi_index(voxel[inside].T, self.shape)
+        voxels, inverse = np.unique(flat, return_inverse=True)
+        self.subject_count[voxels] += 1
+        self.radius_sum[voxels] += np.bincount(inverse, weights=sample_radius[inside], minlength=len(voxels))
+        self.sample_count[voxels] += np.bincount(inverse, minlength=len(voxels))
+        self.num_subjects += 1
+
+    def add_swc(self, swc_data):
+        """
+        Adds one subject from its SWC rows, connecting consecutive rows of every snake.
+
+        Parameters:
+        - swc_data (numpy.ndarray): The SWC rows, see `parse_swc`.
+        """
+        offsets = chain_offsets(swc_data)
+        consecutive = np.ones(len(swc_data), dtype=bool)
+        consecutive[offsets[1:] - 1] = False
+        consecutive[:offsets[0]] = False
+        start = np.flatnonzero(consecutive)
+        self.add_subject(swc_data[:, 2:5], swc_data[:, 5], np.column_stack([start, start + 1]))
+
+    def occupancy(self):
+        """
+        Returns the fraction of subjects with a vessel in each voxel, shape `shape`.
+        """
+        return (self.subject_count / max(self.num_subjects, 1)).reshape(self.shape)
+
+    def mean_radius(self):
+        """
+        Returns the mean vessel radius in each voxel (NaN where there are no vessels), shape `shape`.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self.radius_sum / self.sample_count).reshape(self.shape)
+
+    def to_dict(self):
+        """
+        Returns the atlas in a compact, JSON-serializable form listing only the occupied voxels.
+
+        Returns:
+        - dict: 'num_subjects', 'shape', 'lower', 'voxel_size', and the flat 'indices' of the occupied
+          voxels with their 'occupancy' and 'mean_radius'.
+        """
+        indices = np.flatnonzero(self.subject_count)
+        return {
+            'num_subjects': self.num_subjects,
+            'shape': list(self.shape),
+            'lower': self.lower.tolist(),
+            'voxel_size': self.voxel_size,
+            'indices': indices.tolist(),
+            'occupancy': (self.subject_count[indices] / max(self.num_subjects, 1)).tolist(),
+            'mean_radius': (self.radius_sum[indices] / self.sample_count[indices]).tolist(),
+        }
+
+    def save(self, path):
+        """
+        Saves the atlas to an .npz file.
+
+        Parameters:
+        - path (str): The file to write.
+        """
+        np.savez_compressed(path, lower=self.lower, voxel_size=self.voxel_size, shape=np.array(self.shape),
+                            num_subjects=self.num_subjects, subject_count=self.subject_count,
+                            radius_sum=self.radius_sum, sample_count=self.sample_count)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an atlas saved with `save`.
+
+        Parameters:
+        - path (str): The file to read.
+
+        Returns:
+        - VesselAtlas: The loaded atlas.
+        """
+        with np.load(path) as data:
+            atlas = cls.__new__(cls)
+            atlas.lower = data['lower']
+            atlas.voxel_size = float(data['voxel_size'])
+            atlas.shape = tuple(int(n) for n in data['shape'])
+            atlas.num_subjects = int(data['num_subjects'])
+            atlas.subject_count = data['subject_count']
+            atlas.radius_sum = data['radius_sum']
+            atlas.sample_count = data['sample_count']
+        return atlas
+
+
+def create_atlas_plot(atlas_dict, isomin=0.5, surface_count=3):
+    """
+    Creates an isosurface plot of the occupancy of an atlas, colored by occupancy.
+
+    Parameters:
+    - atlas_dict (dict): An atlas in the form returned by `VesselAtlas.to_dict`.
+    - isomin (float): The lowest occupancy drawn as a surface.
+    - surface_count (int): The number of isosurfaces between `isomin` and full occupancy.
+
+    Returns:
+    - plotly.graph_objects.Figure: The isosurface plot.
+    """
+    shape = tuple(atlas_dict['shape'])
+    occupancy = np.zeros(int(np.prod(shape)))
+    occupancy[atlas_dict['indices']] = atlas_dict['occupancy']
+    centers = [atlas_dict['lower'][axis] + (np.arange(shape[axis]) + 0.5) * atlas_dict['voxel_size']
+               for axis in range(3)]
+    x, y, z = np.meshgrid(*centers, indexing='ij')
+    fig = go.Figure(data=go.Isosurface(
+        x=x.ravel(), y=y.ravel(), z=z.ravel(), value=occupancy,
+        isomin=isomin, isomax=1.0, surface_count=surface_count,
+        colorscale='Reds', opacity=0.4, caps=dict(x_show=False, y_show=False, z_show=False),
+        colorbar=dict(title='Occupancy')))
+    fig.update_layout(title=f"Vessel occupancy of {atlas_dict['num_subjects']} subjects",
+                      scene=dict(xaxis=dict(title='X'), yaxis=dict(title='Y'), zaxis=dict(title='Z')))
+    return fig
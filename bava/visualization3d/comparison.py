@@ -0,0 +1,149 @@
+"""
+This module draws several subjects in one interactive 3D figure for comparison.
+
+The subjects are either overlaid in a shared space or tiled side by side along the x axis, optionally
+after centring each of them on a shared anatomical landmark such as the basilar tip. The graphs are
+stacked into flat arrays first and each vessel type becomes one line trace across all subjects, so
+the figure has as many traces as there are vessel types and its size grows with the total number of
+vertices rather than with subjects times edges. In an overlay, the subjects are told apart by shades
+of the vessel colors, from the full color for the first subject to a lighter one for the last.
+
+Example usage:
+    fig = create_comparison_plot([G1, G2], subject_ids=['CROP_7001', 'CROP_7002'], landmark='basilar_tip')
+"""
+import numpy as np
+import plotly.graph_objects as go
+
+from .graph_analysis import getvesid, getvesname
+from .graph_arrays import GraphArrays
+from .level_of_detail import decimate_graph
+from .swc2graph import vessel_color_map, plot_layout
+
+# A landmark is the node shared by a vessel and any of the vessels branching from it
+LANDMARKS = {
+    'basilar_tip': ('BA', ('P1_L', 'P1_R')),
+    'vertebrobasilar_junction': ('BA', ('VA_L', 'VA_R')),
+}
+COMPARISON_LAYOUTS = ('overlay', 'tile')
+
+
+def landmark_position(G, landmark='basilar_tip'):
+    """
+    Find the position of an anatomical landmark in a graph.
+
+    Parameters:
+    - G (networkx.Graph): The graph, with 'pos' and 'ves_type' node attributes.
+    - landmark (str): A name from `LANDMARKS`.
+
+    Returns:
+    - numpy.ndarray: The position (x, y, z) of the landmark node. If several nodes qualify, the one
+      shared by the most of the branching vessels is used.
+
+    Raises:
+    - ValueError: If the landmark name is unknown or the graph does not contain the landmark.
+    """
+    if landmark not in LANDMARKS:
+        raise ValueError(f"Unknown landmark {landmark!r}, expected one of {list(LANDMARKS)}")
+    trunk, branches = LANDMARKS[landmark]
+    trunk, branches = getvesid(trunk), {getvesid(branch) for branch in branches}
+    best, best_count = None, 0
+    for _, data in G.nodes(data=True):
+        if trunk in data['ves_type']:
+            count = len(branches.intersection(data['ves_type']))
+            if count > best_count:
+                best, best_count = data['pos'], count
+    if best is None:
+        raise ValueError(f"The graph does not contain the landmark {landmark!r}")
+    return np.asarray(best, dtype=float)
+
+
+def create_comparison_plot(graphs, subject_ids=None, layout='overlay', landmark=None, spacing=None,
+                           vertex_budget=None):
+    """
+    Creates an interactive 3D plot comparing several subjects.
+
+    Parameters:
+        graphs (list of networkx.Graph): The graphs of the subjects.
+        subject_ids (list): The names of the subjects in the plot. Defaults to their positions in `graphs`.
+        layout (str): 'overlay' to draw the subjects in a shared space, 'tile' to draw them side by side.
+        landmark (str): A name from `LANDMARKS` to centre every subject on. Tiled subjects are centred on
+            their bounding boxes if None; overlaid subjects are drawn in their own coordinates.
+        spacing (float): The distance between tiled subjects along x. Defaults to 1.2 times the widest subject.
+        vertex_budget (int): The largest number of nodes drawn per subject, see `decimate_graph`.
+
+    Returns:
+        plotly.graph_objects.Figure: The plot, with one line trace per vessel type and a trace of subject labels.
+
+    Raises:
+        ValueError: If the layout or the landmark is unknown, or a subject does not contain the landmark.
+    """
+    if layout not in COMPARISON_LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}, expected one of {COMPARISON_LAYOUTS}")
+    subject_ids = list(subject_ids) if subject_ids is not None else list(range(len(graphs)))
+    if vertex_budget is not None:
+        graphs = [decimate_graph(G, vertex_budget) for G in graphs]
+    arrays = [GraphArrays(G) for G in graphs]
+
+    # Move every subject to its place in the figure
+    if landmark is not None:
+        centers = [landmark_position(G, landmark) for G in graphs]
+    elif layout == 'tile':
+        centers = [(a.pos.min(axis=0) + a.pos.max(axis=0)) / 2 if a.num_nodes else np.zeros(3) for a in arrays]
+    else:
+        centers = [np.zeros(3) for _ in arrays]
+    shifts = [-center for center in centers]
+    if layout == 'tile':
+        widths = [np.ptp(a.pos[:, 0]) if a.num_nodes else 0 for a in arrays]
+        spacing = spacing if spacing is not None else 1.2 * max(widths, default=0)
+        shifts = [shift + (i * spacing, 0, 0) for i, shift in enumerate(shifts)]
+
+    # Stack the subjects into flat arrays
+    sizes = np.array([a.num_nodes for a in arrays], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    pos = np.concatenate([a.pos + shift for a, shift in zip(arrays, shifts)] or [np.zeros((0, 3))])
+    edges = np.concatenate([a.edges + offset for a, offset in zip(arrays, offsets)] or [np.zeros((0, 2), dtype=np.int64)])
+    edge_ves_type = np.concatenate([a.edge_ves_type for a in arrays] or [np.zeros(0, dtype=np.int64)])
+    edge_subject = np.repeat(np.arange(len(arrays)), [a.num_edges for a in arrays])
+    color_map = vessel_color_map(edge_ves_type)
+    shade = edge_subject / max(len(arrays) - 1, 1) if layout == 'overlay' else np.zeros(len(edges))
+
+    # One trace per vessel type across all subjects, in order of first appearance
+    edge_traces = []
+    _, first_edges = np.unique(edge_ves_type, return_index=True)
+    for first_edge in np.sort(first_edges):
+        ves_type = getvesname(edge_ves_type[first_edge])
+        selected = edge_ves_type == edge_ves_type[first_edge]
+        type_edges = edges[selected]
+        segments = np.full((len(type_edges), 3, 3), np.nan)
+        segments[:, 0] = pos[type_edges[:, 0]]
+        segments[:, 1] = pos[type_edges[:, 1]]
+        segments = segments.reshape(-1, 3)
+        # Each vertex takes the shade of its subject
+        color = np.repeat(shade[selected], 3)
+        colorscale = [[0, color_map[ves_type]], [1, _lighten(color_map[ves_type])]]
+        edge_traces.append(go.Scatter3d(x=segments[:, 0], y=segments[:, 1], z=segments[:, 2], mode='lines',
+                                        line=dict(color=color, colorscale=colorscale, cmin=0, cmax=1, width=5),
+                                        hovertemplate=f'{ves_type}<extra></extra>', name=ves_type,
+                                        connectgaps=False))
+
+    # Label every subject above its highest point
+    label_pos = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        points = pos[start:end]
+        label_pos.append((*points[:, :2].mean(axis=0), points[:, 2].max()) if len(points) else (0, 0, 0))
+    label_pos = np.array(label_pos, dtype=float).reshape(-1, 3)
+    label_trace = go.Scatter3d(x=label_pos[:, 0], y=label_pos[:, 1], z=label_pos[:, 2], mode='text',
+                               text=[str(subject_id) for subject_id in subject_ids], hoverinfo='skip',
+                               name='Subjects', showlegend=False)
+
+    fig = go.Figure(data=edge_traces + [label_trace], layout=plot_layout())
+    fig.update_layout(title='Subject Comparison')
+    return fig
+
+
+def _lighten(rgb, amount=0.6):
+    """
+    Blends an 'rgb(r, g, b)' color with white.
+    """
+    channels = [int(channel) for channel in rgb[rgb.index('(') + 1:rgb.index(')')].split(',')]
+    return 'rgb({}, {}, {})'.format(*(round(channel + (255 - channel) * amount) for channel in channels))
@@ -0,0 +1,219 @@
+"""
+This module caches serialized Plotly figures of subjects on disk.
+
+A figure is stored as its JSON string under a key made of the subject ID, the hash of the subject's
+tracing (`content_hash`, also kept in the subjects table as tracing_hash) and the plot options, so
+opening a subject that was viewed before only reads a file, without loading the tracing, and an
+edited tracing never returns a stale figure. The cache has a size limit and evicts the least recently
+used figures (by file modification time, which is refreshed on every hit).
+
+The cache also counts how often each subject is viewed, in a small SQLite table so that concurrent
+sessions increment the counts atomically, and the figures of popular subjects can be built ahead of
+time (see bava.api.prefill_figures).
+
+Example usage:
+    cache = FigureCache('./data/figure_cache')
+    figure_json = cache.get_or_create(subject_id, tracing_hash, {'vertex_budget': 300},
+                                      lambda: encode_figure(SubjectGraph(swc_string).create_interactive_plot(vertex_budget=300)))
+    html = figure_html(figure_json)
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+from contextlib import closing
+
+from .figure_encoding import TYPED_ARRAY_PLOTLYJS_VERSION
+
+FIGURE_SUFFIX = '.figure.json'
+VIEWS_FILENAME = 'views.sqlite'
+
+
+def content_hash(swc_string):
+    """
+    Calculate the hash identifying the content of a tracing.
+
+    Parameters:
+    - swc_string (str): The SWC string of the subject.
+
+    Returns:
+    - str: A hexadecimal SHA-256 digest.
+    """
+    return hashlib.sha256(swc_string.encode('utf-8')).hexdigest()
+
+
+def figure_html(figure_json, height=1000):
+    """
+    Create an HTML snippet that draws a serialized figure with plotly.js, without deserializing it in Python.
+
+    The snippet loads a plotly.js release that decodes typed arrays, so the figure may come from either
+    `encode_figure` or `Figure.to_json()`. Every '<' of the JSON is escaped, so text in the figure (e.g. a
+    subject ID containing "</script>") cannot close the script element.
+
+    Parameters:
+    - figure_json (str): The figure JSON.
+    - height (int): The height of the plot in pixels.
+
+    Returns:
+    - str: The HTML snippet.
+    """
+    # '<' only occurs inside JSON strings, where the escape sequence is equivalent
+    figure_json = figure_json.replace('<', '\\u003c')
+    return f"""
+<div id="bava-figure" style="height:{height}px;"></div>
+<script src="https://cdn.plot.ly/plotly-{TYPED_ARRAY_PLOTLYJS_VERSION}.min.js"></script>
+<script>
+    var figure = {figure_json};
+    Plotly.newPlot("bava-figure", figure.data, figure.layout, {{responsive: true}});
+</script>
+"""
+
+
+class FigureCache:
+    """
+    A size-limited, least-recently-used disk cache of serialized figures.
+
+    Attributes:
+        cache_dir (str): The directory holding the cached figures.
+        max_bytes (int): The largest total size of the cached figures.
+
+    Methods:
+        get(subject_id, digest, options): Returns a cached figure, or None.
+        put(subject_id, digest, options, figure_json): Stores a figure and evicts old ones.
+        contains(subject_id, digest, options): Whether a figure is cached.
+        get_or_create(subject_id, digest, options, build): Returns a cached figure, building it if needed.
+        record_view(subject_id) / popular_subjects(count): Track how often subjects are viewed.
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 ** 2):
+        """
+        Opens (or creates) a figure cache.
+
+        Parameters:
+        - cache_dir (str): The directory holding the cached figures.
+        - max_bytes (int): The largest total size of the cached figures.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, subject_id, digest, options):
+        """
+        Returns the file of a figure in the cache.
+
+        Parameters:
+        - subject_id (str): The ID of the subject.
+        - digest (str): The `content_hash` of the subject's tracing.
+        - options (dict): The plot options, e.g. {'vertex_budget': 300}. Must be JSON-serializable.
+
+        Returns:
+        - str: The path of the figure file.
+        """
+        key = json.dumps({'content': digest, 'options': options}, sort_keys=True)
+        key_digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(subject_id))
+        return os.path.join(self.cache_dir, f"{safe_id}-{key_digest}{FIGURE_SUFFIX}")
+
+    def contains(self, subject_id, digest, options):
+        """
+        Returns whether a figure is cached, without marking it as recently used.
+        """
+        return os.path.exists(self.path(subject_id, digest, options))
+
+    def get(self, subject_id, digest, options):
+        """
+        Returns a cached figure and marks it as recently used.
+
+        Returns:
+        - str: The figure JSON, or None if it is not cached.
+        """
+        path = self.path(subject_id, digest, options)
+        try:
+            with open(path, 'r') as f:
+                figure_json = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return figure_json
+
+    def put(self, subject_id, digest, options, figure_json):
+        """
+        Stores a figure and evicts the least recently used figures beyond the size limit.
+        """
+        path = self.path(subject_id, digest, options)
+        # Write to a temporary file first so that readers never see a partial figure
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as f:
+            f.write(figure_json)
+        os.replace(temporary_path, path)
+        self.evict()
+
+    def get_or_create(self, subject_id, digest, options, build):
+        """
+        Returns a cached figure, building and storing it if needed.
+
+        Parameters:
+        - subject_id (str): The ID of the subject.
+        - digest (str): The `content_hash` of the subject's tracing.
+        - options (dict): The plot options.
+        - build (callable): Returns the figure JSON; only called on a cache miss, so it is the only
+          place that needs the tracing.
+
+        Returns:
+        - str: The figure JSON.
+        """
+        figure_json = self.get(subject_id, digest, options)
+        if figure_json is None:
+            figure_json = build()
+            self.put(subject_id, digest, options, figure_json)
+        return figure_json
+
+    def evict(self):
+        """
+        Deletes the least recently used figures until the cache fits its size limit.
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(FIGURE_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _connect_views(self):
+        connection = sqlite3.connect(os.path.join(self.cache_dir, VIEWS_FILENAME), timeout=30)
+        connection.execute("CREATE TABLE IF NOT EXISTS views (subject_id TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+        return connection
+
+    def view_counts(self):
+        """
+        Returns the number of views of every subject.
+        """
+        with closing(self._connect_views()) as connection:
+            return dict(connection.execute("SELECT subject_id, count FROM views"))
+
+    def record_view(self, subject_id):
+        """
+        Counts a view of a subject.
+        """
+        # A single upsert statement, so that views recorded at the same time are all counted
+        with closing(self._connect_views()) as connection, connection:
+            connection.execute("INSERT INTO views VALUES (?, 1) ON CONFLICT (subject_id) DO UPDATE SET count = count + 1",
+                               (str(subject_id),))
+
+    def popular_subjects(self, count):
+        """
+        Returns the IDs of the most viewed subjects, most viewed first.
+        """
+        with closing(self._connect_views()) as connection:
+            rows = connection.execute("SELECT subject_id FROM views ORDER BY count DESC, subject_id LIMIT ?", (count,))
+            return [subject_id for subject_id, in rows]
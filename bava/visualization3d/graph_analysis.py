@@ -478,17 +478,63 @@ def getvesname(id):
     VesselName[24] = "OA_R"
     return VesselName[id]
 
-def matchvestype(starttype, endtype):
+def getvesid(name):
     """
-    Returns the value from the EndCondition matrix based on the given starttype and endtype.
+    Returns the ID of a vessel based on its name, the inverse of `getvesname`.
 
     Parameters:
-    starttype (int): The start type.
-    endtype (int): The end type.
+    name (str): The name of the vessel, e.g. "M1_L".
 
     Returns:
-    int: The value from the EndCondition matrix.
+    int: The ID of the vessel.
+
+    Raises:
+    ValueError: If the name does not correspond to a vessel type.
+    """
+    for id in range(1, VESTYPENUM):
+        if getvesname(id) == name:
+            return id
+    raise ValueError(f"Unknown vessel name: {name}")
+
+def vessel_mask_from_names(names):
+    """
+    Returns the vessel-presence bitmask of a set of vessel names.
+
+    Bit `id` of the mask is set for every vessel ID, so the 24 vessel types fit in a 32-bit integer.
+
+    Parameters:
+    names (list of str): The vessel names, e.g. ["AComm", "PComm_L"].
+
+    Returns:
+    int: The bitmask with the bits of the named vessels set.
+    """
+    mask = 0
+    for name in names:
+        mask |= 1 << getvesid(name)
+    return mask
+
+def vessel_presence_mask(G):
+    """
+    Returns the vessel-presence bitmask of a graph.
+
+    Bit `id` of the mask is set if the graph has at least one edge of vessel type `id`,
+    see `vessel_mask_from_names`.
+
+    Parameters:
+    G (networkx.Graph): The input graph.
+
+    Returns:
+    int: The vessel-presence bitmask.
+    """
+    mask = 0
+    for ves_type in set(nx.get_edge_attributes(G, 'ves_type').values()):
+        if 0 < ves_type < VESTYPENUM:
+            mask |= 1 << int(ves_type)
+    return mask
 
+def _end_condition_table():
+    """
+    Builds the EndCondition matrix mapping the types of the start and end points of a snake to its vessel type.
     """
     EndCondition = np.zeros((100, 100), dtype=np.int8)
     EndCondition[1][3] = 1
@@ -571,4 +617,34 @@ def matchvestype(starttype, endtype):
     EndCondition[30][14] = 6
     EndCondition[30][30] = 6
     EndCondition[30][99] = 6
-    return EndCondition[starttype][endtype]
\ No newline at end of file
+    return EndCondition
+
+END_CONDITION = _end_condition_table()
+
+def matchvestype(starttype, endtype):
+    """
+    Returns the value from the EndCondition matrix based on the given starttype and endtype.
+
+    Parameters:
+    starttype (int): The start type.
+    endtype (int): The end type.
+
+    Returns:
+    int: The value from the EndCondition matrix.
+
+    """
+    return END_CONDITION[starttype][endtype]
+
+def matchvestypes(starttypes, endtypes):
+    """
+    Vectorized version of `matchvestype` for arrays of start and end types.
+
+    Parameters:
+    starttypes (numpy.ndarray): The start types.
+    endtypes (numpy.ndarray): The end types.
+
+    Returns:
+    numpy.ndarray: The values from the EndCondition matrix, with dtype int8.
+
+    """
+    return END_CONDITION[np.asarray(starttypes, dtype=np.int64), np.asarray(endtypes, dtype=np.int64)]
\ No newline at end of file
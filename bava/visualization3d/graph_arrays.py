@@ -0,0 +1,80 @@
+"""
+This module converts networkx vessel graphs into contiguous NumPy arrays.
+
+Most vectorized analyses (spatial queries, path lengths, rendering) need the node positions,
+radii and vessel types as flat arrays rather than per-node attribute dictionaries.
+`GraphArrays` performs that conversion once so that callers do not iterate over the graph again.
+
+Example usage:
+    arrays = GraphArrays(G)
+    arrays.pos[arrays.edges[:, 0]]  # start position of every edge
+"""
+import numpy as np
+
+
+class GraphArrays:
+    """
+    Array view of a vessel graph.
+
+    Attributes:
+        node_ids (numpy.ndarray): The node identifiers in graph order, shape (n,).
+        node_index (dict): Mapping from node identifier to its row in the node arrays.
+        pos (numpy.ndarray): The node positions, shape (n, 3).
+        radius (numpy.ndarray): The node radii, shape (n,).
+        node_ves_type_ptr (numpy.ndarray): Offsets into `node_ves_type` for each node, shape (n + 1,).
+        node_ves_type (numpy.ndarray): The concatenated vessel types of every node.
+        edges (numpy.ndarray): The edge endpoints as rows of the node arrays, shape (m, 2).
+        edge_ves_type (numpy.ndarray): The vessel type of every edge, shape (m,).
+        edge_length (numpy.ndarray): The Euclidean length of every edge, shape (m,).
+    """
+
+    def __init__(self, G):
+        """
+        Initializes the arrays from a graph.
+
+        Parameters:
+        - G (networkx.Graph): A graph with 'pos', 'radius' and 'ves_type' node attributes
+          and a 'ves_type' edge attribute.
+        """
+        node_data = list(G.nodes(data=True))
+        self.node_ids = np.array([node for node, _ in node_data])
+        self.node_index = {node: i for i, (node, _) in enumerate(node_data)}
+        self.pos = np.array([data['pos'] for _, data in node_data], dtype=float).reshape(-1, 3)
+        self.radius = np.array([data.get('radius', 0) for _, data in node_data], dtype=float)
+
+        ves_types = [data.get('ves_type', []) for _, data in node_data]
+        self.node_ves_type_ptr = np.zeros(len(ves_types) + 1, dtype=np.int64)
+        self.node_ves_type_ptr[1:] = np.cumsum([len(types) for types in ves_types])
+        self.node_ves_type = np.array([t for types in ves_types for t in types], dtype=np.int64)
+
+        edge_data = list(G.edges(data='ves_type', default=0))
+        self.edges = np.array([(self.node_index[u], self.node_index[v]) for u, v, _ in edge_data],
+                              dtype=np.int64).reshape(-1, 2)
+        self.edge_ves_type = np.array([t for _, _, t in edge_data], dtype=np.int64)
+        self.edge_length = np.linalg.norm(self.pos[self.edges[:, 1]] - self.pos[self.edges[:, 0]], axis=1)
+
+    @property
+    def num_nodes(self):
+        """
+        Returns the number of nodes.
+        """
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        """
+        Returns the number of edges.
+        """
+        return len(self.edges)
+
+    def node_ves_types(self, index):
+        """
+        Returns the vessel types of the node stored at the given row.
+
+        Parameters:
+        - index (int): The row of the node in the node arrays.
+
+        Returns:
+        - numpy.ndarray: The vessel types of the node.
+        """
+        return self.node_ves_type[self.node_ves_type_ptr[index]:self.node_ves_type_ptr[index + 1]]
@@ -0,0 +1,236 @@
+"""
+This module keeps the features of a vessel graph up to date while the graph is edited.
+
+`FeatureTracker` holds the raw per-vessel sums behind `calculate_features` (length, number of edges
+touching a branching point) together with degree, branch and connected-component statistics. An edit
+only changes the degrees of the nodes it touches, so the tracker subtracts the contributions of the
+edges incident to those nodes before the edit and adds them back afterwards. Only the features of the
+vessel types involved are rewritten, and component labels are only recomputed for the components the
+edit touched.
+
+Segments are the chains of edges between branching points or endpoints (nodes of degree other than 2).
+
+Example usage:
+    tracker = FeatureTracker(G, features)
+    nodes = find_segment(G, u, v)
+    tracker.before_edit(nodes)
+    ...  # edit the edges of the segment
+    tracker.after_edit(nodes)
+"""
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from .graph_analysis import getvesname
+
+
+def find_segment(G, u, v):
+    """
+    Find the segment containing an edge, extending it through nodes of degree 2 in both directions.
+
+    Parameters:
+    - G (networkx.Graph): The graph.
+    - u, v: The endpoints of an edge of the segment.
+
+    Returns:
+    - list: The nodes of the segment in order along it.
+
+    Raises:
+    - ValueError: If (u, v) is not an edge of the graph.
+    """
+    if not G.has_edge(u, v):
+        raise ValueError(f"({u}, {v}) is not an edge of the graph")
+
+    def extend(previous, node, stop):
+        chain = []
+        while G.degree[node] == 2 and node != stop:
+            next_node = next(n for n in G.neighbors(node) if n != previous)
+            previous, node = node, next_node
+            chain.append(node)
+        return chain
+
+    forward = extend(u, v, u)
+    if forward and forward[-1] == u:
+        # The segment is a cycle of degree-2 nodes
+        return [u, v] + forward[:-1]
+    backward = extend(v, u, v)
+    return backward[::-1] + [u, v] + forward
+
+
+def segment_edges(G, nodes):
+    """
+    List the edges of a segment found with `find_segment`.
+
+    Parameters:
+    - G (networkx.Graph): The graph.
+    - nodes (list): The nodes of the segment in order.
+
+    Returns:
+    - list: The edges of the segment as node pairs, including the closing edge of a cycle.
+    """
+    edges = list(zip(nodes[:-1], nodes[1:]))
+    is_cycle = len(nodes) > 2 and all(G.degree[node] == 2 for node in nodes) and G.has_edge(nodes[-1], nodes[0])
+    if is_cycle:
+        edges.append((nodes[-1], nodes[0]))
+    return edges
+
+
+class FeatureTracker:
+    """
+    Incrementally maintained features and statistics of a vessel graph.
+
+    Attributes:
+        features (dict): The per-vessel features in the format of `calculate_features`, updated in place.
+        degree_histogram (Counter): The number of nodes of every degree.
+        branch_count (int): The number of segments between branching points or endpoints.
+        num_components (int): The number of connected components.
+
+    Methods:
+        before_edit(nodes): Removes the contributions of the edges incident to the nodes about to change.
+        after_edit(nodes): Adds the contributions back and updates the touched features and components.
+        largest_component_size(): Returns the number of nodes of the largest connected component.
+        statistics(): Returns the graph statistics as a dictionary.
+    """
+
+    def __init__(self, G, features):
+        """
+        Builds the raw sums of a graph.
+
+        Parameters:
+        - G (networkx.Graph): The graph that will be edited.
+        - features (dict): The features of the graph, e.g. from `calculate_features`. Updated in place.
+        """
+        self.G = G
+        self.features = features
+        self._length = defaultdict(float)
+        self._branch_edges = defaultdict(int)
+        self._edge_count = defaultdict(int)
+        for u, v in G.edges():
+            self._apply_edge(u, v, 1)
+
+        self.degree_histogram = Counter(degree for _, degree in G.degree())
+        self._branch_degree_sum = sum(degree for _, degree in G.degree() if degree != 2)
+
+        self._component = {}
+        self._component_size = {}
+        self._next_label = 0
+        for node in G.nodes():
+            if node not in self._component:
+                self._label_component(node)
+        self._pending_components = set()
+        self._touched_types = set()
+
+    def _apply_edge(self, u, v, sign):
+        name = getvesname(self.G.edges[u, v]['ves_type'])
+        pos = self.G.nodes
+        self._length[name] += sign * np.linalg.norm(np.array(pos[u]['pos']) - np.array(pos[v]['pos']))
+        self._branch_edges[name] += sign * (self.G.degree[u] != 2 or self.G.degree[v] != 2)
+        self._edge_count[name] += sign
+        return name
+
+    def _apply_nodes(self, nodes, sign):
+        nodes = [node for node in nodes if node in self.G]
+        # Edges between two of the nodes are listed once
+        for u, v in self.G.edges(nodes):
+            self._touched_types.add(self._apply_edge(u, v, sign))
+        for node in nodes:
+            degree = self.G.degree[node]
+            self.degree_histogram[degree] += sign
+            if self.degree_histogram[degree] == 0:
+                del self.degree_histogram[degree]
+            if degree != 2:
+                self._branch_degree_sum += sign * degree
+
+    def _label_component(self, node):
+        label = self._next_label
+        self._next_label += 1
+        stack, size = [node], 0
+        self._component[node] = label
+        while stack:
+            current = stack.pop()
+            size += 1
+            for neighbor in self.G.neighbors(current):
+                if self._component.get(neighbor) != label:
+                    self._component[neighbor] = label
+                    stack.append(neighbor)
+        self._component_size[label] = size
+
+    def before_edit(self, nodes):
+        """
+        Removes the contributions of the edges incident to the nodes about to be edited.
+
+        Parameters:
+        - nodes (iterable): The nodes whose incident edges will change, i.e. both endpoints of every edge
+          that is removed, added or relabeled, including nodes to be removed.
+        """
+        nodes = list(nodes)
+        self._touched_types = set()
+        self._apply_nodes(nodes, -1)
+        self._pending_components = {self._component[node] for node in nodes if node in self._component}
+
+    def after_edit(self, nodes):
+        """
+        Adds the contributions of the edges incident to the edited nodes back and updates the
+        features of the vessel types involved and the labels of the touched components.
+
+        Parameters:
+        - nodes (iterable): The same nodes passed to `before_edit`, plus any nodes added by the edit.
+        """
+        nodes = list(nodes)
+        self._apply_nodes(nodes, 1)
+        for name in self._touched_types:
+            if self._edge_count[name] == 0:
+                self.features.pop(name, None)
+                del self._length[name], self._branch_edges[name], self._edge_count[name]
+            else:
+                self.features[name] = {'length': self._length[name],
+                                       'branch_number': math.ceil(self._branch_edges[name] / 2)}
+
+        # Relabel the components the edit touched, starting from the edited nodes that remain
+        for node in nodes:
+            if node not in self.G:
+                self._component.pop(node, None)
+        for label in self._pending_components:
+            del self._component_size[label]
+        for node in nodes:
+            if node in self.G and (node not in self._component or self._component[node] in self._pending_components):
+                self._label_component(node)
+        self._pending_components = set()
+
+    @property
+    def branch_count(self):
+        """
+        Returns the number of segments between branching points or endpoints.
+        """
+        return self._branch_degree_sum // 2
+
+    @property
+    def num_components(self):
+        """
+        Returns the number of connected components.
+        """
+        return len(self._component_size)
+
+    def largest_component_size(self):
+        """
+        Returns the number of nodes of the largest connected component.
+        """
+        return max(self._component_size.values(), default=0)
+
+    def statistics(self):
+        """
+        Returns the graph statistics maintained by the tracker.
+
+        Returns:
+        - dict: 'num_nodes', 'num_edges', 'degree_histogram' (degree -> number of nodes), 'branch_count',
+          'num_components' and 'largest_component_size'.
+        """
+        return {
+            'num_nodes': self.G.number_of_nodes(),
+            'num_edges': self.G.number_of_edges(),
+            'degree_histogram': dict(sorted(self.degree_histogram.items())),
+            'branch_count': self.branch_count,
+            'num_components': self.num_components,
+            'largest_component_size': self.largest_component_size(),
+        }
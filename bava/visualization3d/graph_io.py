@@ -0,0 +1,211 @@
+"""
+This module saves built vessel graphs and their features to a compact binary file and loads them back.
+
+The file starts with a fixed prefix (magic bytes, format version and header length) followed by a JSON
+header and the raw arrays. The header lists the dtype, shape and offset of every array together with
+the feature dictionary. Arrays are aligned to 64 bytes, so they can be memory-mapped in place.
+
+Stored arrays:
+    node_ids, pos, radius          one row per node, in graph order
+    node_ves_type_ptr/node_ves_type  the vessel types of every node (CSR layout)
+    edge_ptr/edge_target           the edges in graph order (CSR layout over the source node)
+    edge_ves_type                  the vessel type of every edge
+    node_attr/<name>, edge_attr/<name>  other numeric attributes, e.g. centralities
+
+Example usage:
+    save_subject_graph('subject.bavag', G, features)
+    G, features = load_subject_graph('subject.bavag')
+"""
+import json
+import numbers
+import struct
+
+import networkx as nx
+import numpy as np
+
+from .graph_arrays import GraphArrays
+
+MAGIC = b'BAVAGRPH'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+PREFIX = struct.Struct('<8sIQ')
+CORE_NODE_ATTRIBUTES = ('pos', 'radius', 'ves_type')
+CORE_EDGE_ATTRIBUTES = ('ves_type',)
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _to_builtin(value):
+    """
+    Converts NumPy scalars and arrays in a feature dictionary into JSON-serializable values.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Feature value of type {type(value).__name__} cannot be saved")
+
+
+def _numeric_attributes(items, exclude):
+    """
+    Finds the attributes that are set to a numeric scalar on every node (or edge).
+
+    Parameters:
+    - items (list of dict): The attribute dictionaries of the nodes (or edges).
+    - exclude (tuple): The attribute names stored separately.
+
+    Returns:
+    - list: The names of the numeric attributes.
+    """
+    if not items:
+        return []
+    names = [name for name in items[0] if name not in exclude]
+    return [name for name in names
+            if all(isinstance(data.get(name), numbers.Number) for data in items)]
+
+
+def save_subject_graph(path, G, features=None):
+    """
+    Save a vessel graph and its features to a binary file.
+
+    Parameters:
+    - path (str): The file to write.
+    - G (networkx.Graph): A graph with numeric node identifiers and 'pos', 'radius' and 'ves_type'
+      node attributes and a 'ves_type' edge attribute.
+    - features (dict): The features of the graph, e.g. from `calculate_features`.
+
+    Raises:
+    - ValueError: If the node identifiers are not numeric.
+    """
+    arrays = GraphArrays(G)
+    if arrays.num_nodes and not np.issubdtype(arrays.node_ids.dtype, np.number):
+        raise ValueError("Only graphs with numeric node identifiers can be saved")
+
+    # G.edges() lists the edges grouped by their first node in graph order, so a stable sort is a no-op
+    order = np.argsort(arrays.edges[:, 0], kind='stable')
+    edge_ptr = np.zeros(arrays.num_nodes + 1, dtype=np.int64)
+    edge_ptr[1:] = np.cumsum(np.bincount(arrays.edges[:, 0], minlength=arrays.num_nodes))
+    data = {
+        'node_ids': arrays.node_ids if arrays.num_nodes else np.zeros(0),
+        'pos': arrays.pos,
+        'radius': arrays.radius,
+        'node_ves_type_ptr': arrays.node_ves_type_ptr,
+        'node_ves_type': arrays.node_ves_type.astype(np.int8),
+        'edge_ptr': edge_ptr,
+        'edge_target': arrays.edges[order, 1],
+        'edge_ves_type': arrays.edge_ves_type[order].astype(np.int8),
+    }
+
+    node_data = [attrs for _, attrs in G.nodes(data=True)]
+    for name in _numeric_attributes(node_data, CORE_NODE_ATTRIBUTES):
+        data[f'node_attr/{name}'] = np.array([attrs[name] for attrs in node_data], dtype=float)
+    edge_data = [attrs for _, _, attrs in G.edges(data=True)]
+    for name in _numeric_attributes(edge_data, CORE_EDGE_ATTRIBUTES):
+        data[f'edge_attr/{name}'] = np.array([attrs[name] for attrs in edge_data], dtype=float)[order]
+
+    table = {}
+    offset = 0
+    for name, array in data.items():
+        array = np.ascontiguousarray(array)
+        data[name] = array
+        table[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'arrays': table,
+        # Stored as pairs since vessel names may be None
+        'features': list((features or {}).items()),
+    }, default=_to_builtin).encode('utf-8')
+
+    data_start = _aligned(PREFIX.size + len(header))
+    with open(path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in data.items():
+            f.seek(data_start + table[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+
+
+def read_graph_file(path, mmap=True):
+    """
+    Read the header and arrays of a saved graph without building the networkx graph.
+
+    Parameters:
+    - path (str): The file to read.
+    - mmap (bool): Whether to memory-map the arrays (read-only) instead of reading them into memory.
+
+    Returns:
+    - header (dict): The file header, with the 'format_version', the array table and the 'features'.
+    - arrays (dict): The stored arrays by name.
+
+    Raises:
+    - ValueError: If the file is not a saved graph or was written by a newer format version.
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(PREFIX.size)
+        if len(prefix) < PREFIX.size:
+            raise ValueError(f"{path} is not a BAVA graph file")
+        magic, version, header_length = PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a BAVA graph file")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}, newer than the supported version {FORMAT_VERSION}")
+        header = json.loads(f.read(header_length).decode('utf-8'))
+        data_start = _aligned(PREFIX.size + header_length)
+        if mmap:
+            buffer = np.memmap(f, dtype=np.uint8, mode='r')
+        else:
+            f.seek(0)
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape']))
+        start = data_start + entry['offset']
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(entry['shape'])
+    return header, arrays
+
+
+def load_subject_graph(path, mmap=True):
+    """
+    Load a vessel graph and its features saved with `save_subject_graph`.
+
+    Node positions are rows of a copy of the stored array; the other attributes are plain Python values.
+
+    Parameters:
+    - path (str): The file to read.
+    - mmap (bool): Whether to memory-map the file instead of reading it into memory.
+
+    Returns:
+    - G (networkx.Graph): The graph, with the node and edge order of the saved graph.
+    - features (dict): The saved features.
+    """
+    header, arrays = read_graph_file(path, mmap=mmap)
+    node_ids = arrays['node_ids'].tolist()
+    pos = np.array(arrays['pos'])
+    radius = arrays['radius'].tolist()
+    ptr = arrays['node_ves_type_ptr']
+    types = arrays['node_ves_type'].tolist()
+    node_ves_types = [types[start:end] for start, end in zip(ptr[:-1].tolist(), ptr[1:].tolist())]
+    node_attrs = {name.split('/', 1)[1]: array.tolist() for name, array in arrays.items() if name.startswith('node_attr/')}
+
+    G = nx.Graph()
+    G.add_nodes_from(
+        (node_id, {'pos': pos[i], 'radius': radius[i], 'ves_type': node_ves_types[i],
+                   **{name: values[i] for name, values in node_attrs.items()}})
+        for i, node_id in enumerate(node_ids))
+
+    sources = np.repeat(np.arange(len(node_ids)), np.diff(arrays['edge_ptr'])).tolist()
+    targets = arrays['edge_target'].tolist()
+    edge_ves_type = arrays['edge_ves_type'].tolist()
+    edge_attrs = {name.split('/', 1)[1]: array.tolist() for name, array in arrays.items() if name.startswith('edge_attr/')}
+    G.add_edges_from(
+        (node_ids[u], node_ids[v], {'ves_type': edge_ves_type[j], **{name: values[j] for name, values in edge_attrs.items()}})
+        for j, (u, v) in enumerate(zip(sources, targets)))
+
+    features = {name: value for name, value in header['features']}
+    return G, features
@@ -0,0 +1,91 @@
+"""
+This module builds coarse levels of detail of vessel graphs for progressive 3D viewing.
+
+A coarse level keeps every bifurcation and endpoint (every node whose degree is not 2) and decimates
+the chains of degree-2 nodes between them, so the topology of the vessel tree is always preserved
+and only the centrelines lose detail. The decimation stride is chosen so that the level fits a
+vertex budget, and a graph that already fits is returned at full detail.
+
+Example usage:
+    coarse = decimate_graph(G, vertex_budget=500)
+    fig = create_interactive_plot(coarse)
+"""
+import math
+
+import networkx as nx
+
+
+def graph_chains(G):
+    """
+    Split a graph into chains of edges between nodes whose degree is not 2.
+
+    Cycles made only of degree-2 nodes are returned as chains starting and ending at the same node.
+
+    Parameters:
+    - G (networkx.Graph): The graph.
+
+    Returns:
+    - list of list: The nodes of every chain in order, including both end nodes.
+    """
+    visited = set()
+    chains = []
+
+    def walk(start, neighbor):
+        chain = [start, neighbor]
+        visited.add(frozenset((start, neighbor)))
+        previous, node = start, neighbor
+        while G.degree[node] == 2 and node != start:
+            node, previous = next(n for n in G.neighbors(node) if n != previous), node
+            visited.add(frozenset((previous, node)))
+            chain.append(node)
+        return chain
+
+    anchors = [node for node in G.nodes if G.degree[node] != 2]
+    for start in anchors:
+        for neighbor in G.neighbors(start):
+            if frozenset((start, neighbor)) not in visited:
+                chains.append(walk(start, neighbor))
+    # Whatever is left are cycles of degree-2 nodes
+    for u, v in G.edges:
+        if frozenset((u, v)) not in visited:
+            chains.append(walk(u, v))
+    return chains
+
+
+def decimate_graph(G, vertex_budget):
+    """
+    Build a coarse level of a graph with at most `vertex_budget` nodes where possible.
+
+    Bifurcations and endpoints are always kept, even if they alone exceed the budget. The inner nodes of
+    every chain are kept at a common stride, and each new edge takes the vessel type of the first
+    original edge it replaces.
+
+    Parameters:
+    - G (networkx.Graph): The graph, with 'ves_type' edge attributes.
+    - vertex_budget (int): The largest number of nodes of the coarse level.
+
+    Returns:
+    - networkx.Graph: The coarse level, sharing node attribute values with `G`, or `G` itself if it fits.
+    """
+    if G.number_of_nodes() <= vertex_budget:
+        return G
+    chains = graph_chains(G)
+    num_anchors = sum(1 for node in G.nodes if G.degree[node] != 2)
+    num_inner = G.number_of_nodes() - num_anchors
+    available = vertex_budget - num_anchors
+    stride = math.ceil(num_inner / available) if available > 0 else None
+
+    coarse = nx.Graph()
+    for chain in chains:
+        inner = range(1, len(chain) - 1)
+        kept = [0] + ([i for i in inner if i % stride == 0] if stride else []) + [len(chain) - 1]
+        # A chain that is a cycle keeps at least two inner nodes so that it stays a cycle
+        if chain[0] == chain[-1] and len(kept) < 4 and len(chain) > 3:
+            kept = [0, len(chain) // 3, 2 * len(chain) // 3, len(chain) - 1]
+        for a, b in zip(kept[:-1], kept[1:]):
+            u, v = chain[a], chain[b]
+            coarse.add_node(u, **G.nodes[u])
+            coarse.add_node(v, **G.nodes[v])
+            coarse.add_edge(u, v, ves_type=G.edges[chain[a], chain[a + 1]]['ves_type'])
+    coarse.add_nodes_from((node, G.nodes[node]) for node in G.nodes if G.degree[node] == 0)
+    return coarse
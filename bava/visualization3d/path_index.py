@@ -0,0 +1,197 @@
+"""
+This module provides an index for fast path-length queries along the vessels of a graph.
+
+Vessel graphs are almost trees. The index takes a BFS spanning tree of every connected component,
+stores the distance of every node to its component root, and builds a binary-lifting table for
+lowest-common-ancestor (LCA) queries. The tree distance between two nodes is then
+`dist(u) + dist(v) - 2 * dist(lca(u, v))`, found in O(log n) array operations.
+
+Edges that are not in the spanning tree close cycles (e.g. the circle of Willis). A shortest path
+that uses such an edge passes through one of its endpoints, so the index also stores exact
+single-source distances from every cycle-edge endpoint. The answer is the minimum of the tree distance
+and the best detour through one of those endpoints. All queries are vectorized across many pairs.
+
+Example usage:
+    index = PathLengthIndex(G)
+    index.path_length(1.0, 62.0)
+    index.path_lengths([1.0, 5.0], [62.0, 69.0])
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order, connected_components, dijkstra
+
+from .graph_arrays import GraphArrays
+
+# Zero-length edges (duplicate points) would be dropped as missing entries by scipy's sparse graphs
+MIN_EDGE_LENGTH = 1e-12
+
+
+class PathLengthIndex:
+    """
+    A spanning-tree LCA index with exact handling of cycle edges for path-length queries.
+
+    Attributes:
+        arrays (GraphArrays): The array view of the indexed graph.
+        component (numpy.ndarray): The connected component of every node.
+        depth (numpy.ndarray): The number of tree edges from every node to its component root.
+        root_distance (numpy.ndarray): The length of the tree path from every node to its component root.
+        ancestors (list of numpy.ndarray): The binary-lifting table; ancestors[k][i] is the 2^k-th tree ancestor of i.
+        cycle_nodes (numpy.ndarray): The endpoints of the edges that are not in the spanning tree.
+        cycle_distances (numpy.ndarray): The exact graph distances from each cycle node to every node.
+        cycle_predecessors (numpy.ndarray): The shortest-path predecessors from each cycle node.
+
+    Methods:
+        path_lengths(sources, targets): Returns the path lengths between many node pairs.
+        path_length(source, target): Returns the path length between two nodes.
+        path(source, target): Returns the nodes on a shortest path between two nodes.
+    """
+
+    def __init__(self, G):
+        """
+        Builds the index for a graph.
+
+        Parameters:
+        - G (networkx.Graph): The vessel graph to index.
+        """
+        self.arrays = GraphArrays(G)
+        n = self.arrays.num_nodes
+        edges = self.arrays.edges
+        not_loop = edges[:, 0] != edges[:, 1]
+        edges, lengths = edges[not_loop], self.arrays.edge_length[not_loop]
+
+        rows = np.concatenate([edges[:, 0], edges[:, 1]])
+        cols = np.concatenate([edges[:, 1], edges[:, 0]])
+        weights = np.maximum(np.concatenate([lengths, lengths]), MIN_EDGE_LENGTH)
+        self._adjacency = csr_matrix((weights, (rows, cols)), shape=(n, n))
+
+        # BFS spanning tree of every component
+        _, self.component = connected_components(self._adjacency, directed=False)
+        parent = np.arange(n)
+        for root in np.unique(self.component, return_index=True)[1]:
+            order, predecessors = breadth_first_order(self._adjacency, root, directed=False)
+            parent[order[1:]] = predecessors[order[1:]]
+        self._parent = parent
+
+        # Pointer jumping gives the depth, the root distance and the binary-lifting table at once
+        parent_length = np.zeros(n)
+        children = np.flatnonzero(parent != np.arange(n))
+        parent_length[children] = np.asarray(self._adjacency[children, parent[children]]).ravel()
+        parent_length[parent_length <= MIN_EDGE_LENGTH] = 0
+        self.depth = (parent != np.arange(n)).astype(np.int64)
+        self.root_distance = parent_length
+        self.ancestors = [parent]
+        while True:
+            up = self.ancestors[-1]
+            self.depth = self.depth + self.depth[up]
+            self.root_distance = self.root_distance + self.root_distance[up]
+            if np.array_equal(up[up], up):
+                break
+            self.ancestors.append(up[up])
+
+        # Exact distances from the endpoints of the non-tree edges
+        tree_edge = (parent[edges[:, 0]] == edges[:, 1]) | (parent[edges[:, 1]] == edges[:, 0])
+        self.cycle_nodes = np.unique(edges[~tree_edge])
+        if len(self.cycle_nodes):
+            self.cycle_distances, self.cycle_predecessors = dijkstra(
+                self._adjacency, directed=False, indices=self.cycle_nodes, return_predecessors=True)
+        else:
+            self.cycle_distances = np.zeros((0, n))
+            self.cycle_predecessors = np.zeros((0, n), dtype=np.int64)
+
+    def _rows(self, nodes):
+        return np.array([self.arrays.node_index[node] for node in np.atleast_1d(nodes).tolist()], dtype=np.int64)
+
+    def _lca(self, u, v):
+        """
+        Returns the lowest common ancestors of node rows u and v (same component).
+        """
+        swap = self.depth[u] < self.depth[v]
+        u, v = np.where(swap, v, u), np.where(swap, u, v)
+        diff = self.depth[u] - self.depth[v]
+        for k, up in enumerate(self.ancestors):
+            u = np.where((diff >> k) & 1, up[u], u)
+        for up in reversed(self.ancestors):
+            differ = up[u] != up[v]
+            u = np.where(differ, up[u], u)
+            v = np.where(differ, up[v], v)
+        return np.where(u == v, u, self.ancestors[0][u])
+
+    def _lengths(self, u, v):
+        """
+        Returns the tree lengths, best cycle detours and their cycle nodes for node rows u and v.
+        """
+        same = self.component[u] == self.component[v]
+        lca = self._lca(u, v)
+        tree = np.where(same, self.root_distance[u] + self.root_distance[v] - 2 * self.root_distance[lca], np.inf)
+        if len(self.cycle_nodes):
+            detours = self.cycle_distances[:, u] + self.cycle_distances[:, v]
+            best = np.argmin(detours, axis=0)
+            detour = detours[best, np.arange(len(u))]
+        else:
+            best = np.zeros(len(u), dtype=np.int64)
+            detour = np.full(len(u), np.inf)
+        return tree, detour, best, lca
+
+    def path_lengths(self, sources, targets):
+        """
+        Calculates the lengths of the shortest vessel paths between many node pairs.
+
+        Parameters:
+        - sources (array-like): The source node identifiers.
+        - targets (array-like): The target node identifiers, paired with `sources`.
+
+        Returns:
+        - numpy.ndarray: The path lengths; infinite for nodes in different components.
+        """
+        tree, detour, _, _ = self._lengths(self._rows(sources), self._rows(targets))
+        return np.minimum(tree, detour)
+
+    def path_length(self, source, target):
+        """
+        Calculates the length of the shortest vessel path between two nodes.
+
+        Parameters:
+        - source: The source node identifier.
+        - target: The target node identifier.
+
+        Returns:
+        - float: The path length; infinite for nodes in different components.
+        """
+        return float(self.path_lengths([source], [target])[0])
+
+    def _tree_path(self, u, v, lca):
+        up_path, down_path = [u], [v]
+        while up_path[-1] != lca:
+            up_path.append(self._parent[up_path[-1]])
+        while down_path[-1] != lca:
+            down_path.append(self._parent[down_path[-1]])
+        return up_path + down_path[-2::-1]
+
+    def _cycle_path(self, s, u, v):
+        def from_source(node):
+            path = [node]
+            while path[-1] != self.cycle_nodes[s]:
+                path.append(self.cycle_predecessors[s, path[-1]])
+            return path
+        return from_source(u) + from_source(v)[-2::-1]
+
+    def path(self, source, target):
+        """
+        Finds the nodes on a shortest vessel path between two nodes.
+
+        Parameters:
+        - source: The source node identifier.
+        - target: The target node identifier.
+
+        Returns:
+        - list: The node identifiers from source to target, or None for nodes in different components.
+        """
+        u, v = self._rows([source, target])
+        tree, detour, best, lca = self._lengths(np.array([u]), np.array([v]))
+        if np.isinf(tree[0]) and np.isinf(detour[0]):
+            return None
+        if tree[0] <= detour[0]:
+            rows = self._tree_path(u, v, lca[0])
+        else:
+            rows = self._cycle_path(best[0], u, v)
+        return self.arrays.node_ids[rows].tolist()
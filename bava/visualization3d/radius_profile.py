@@ -0,0 +1,126 @@
+"""
+This module analyzes the radius profile along every vessel of an SWC tracing and screens it for stenosis.
+
+Each snake of an SWC tracing (the rows between two root rows) is a vessel centreline stored as
+contiguous rows, so all snakes are processed at once as one flat array with chain offsets.
+Sliding-window means are computed from cumulative sums with the windows clipped at chain boundaries.
+
+A point is flagged as a focal narrowing when its smoothed radius falls below `threshold` times the
+local reference radius, i.e. the mean smoothed radius over a wider window around it.
+
+Example usage:
+    screening = screen_stenosis(parse_swc(swc_string))
+    summarize_stenosis(screening)
+    # {'stenosis_count': 2, 'max_stenosis': 0.61, 'stenosis_vessels': ['M2_L']}
+"""
+import numpy as np
+
+from .graph_analysis import matchvestype, getvesname
+
+
+def chain_offsets(swc_data):
+    """
+    Find the row offsets of the snakes of an SWC tracing.
+
+    Parameters:
+    - swc_data (numpy.ndarray): The SWC rows, see `parse_swc`.
+
+    Returns:
+    - numpy.ndarray: The first row of every snake followed by the number of rows, shape (n_snakes + 1,).
+    """
+    starts = np.flatnonzero(swc_data[:, -1] == -1)
+    return np.append(starts, len(swc_data))
+
+
+def chain_moving_average(values, offsets, half_window):
+    """
+    Calculate a centred moving average along chains stored back to back in one array.
+
+    The window of every element is clipped at the boundaries of its chain.
+
+    Parameters:
+    - values (numpy.ndarray): The values of all chains, shape (n,).
+    - offsets (numpy.ndarray): The first element of every chain followed by n.
+    - half_window (int): The number of neighbours on each side included in the window.
+
+    Returns:
+    - numpy.ndarray: The moving average, shape (n,).
+    """
+    chain = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    index = np.arange(len(values))
+    low = np.maximum(index - half_window, offsets[chain])
+    high = np.minimum(index + half_window, offsets[chain + 1] - 1)
+    cumulative = np.concatenate([[0], np.cumsum(values, dtype=float)])
+    return (cumulative[high + 1] - cumulative[low]) / (high - low + 1)
+
+
+def screen_stenosis(swc_data, smoothing_window=3, reference_window=11, threshold=0.5, end_margin=2):
+    """
+    Calculate the smoothed radius profile of every snake and flag focal narrowing.
+
+    Parameters:
+    - swc_data (numpy.ndarray): The SWC rows, see `parse_swc`.
+    - smoothing_window (int): The number of points averaged to smooth the radius.
+    - reference_window (int): The number of points averaged to obtain the local reference radius.
+    - threshold (float): The radius ratio below which a point is flagged.
+    - end_margin (int): The number of points at either end of a snake that are never flagged,
+      since vessels taper naturally towards their ends.
+
+    Returns:
+    - dict: The screening with the keys 'offsets', 'ves_type' (per snake), and 'radius',
+      'smoothed_radius', 'reference_radius', 'ratio', 'valid' and 'flagged' (per point).
+    """
+    offsets = chain_offsets(swc_data)
+    swc_data = swc_data[offsets[0]:]
+    offsets = offsets - offsets[0]
+    radius = swc_data[:, 5].astype(float)
+
+    smoothed = chain_moving_average(radius, offsets, smoothing_window // 2)
+    reference = chain_moving_average(smoothed, offsets, reference_window // 2)
+    ratio = np.divide(smoothed, reference, out=np.ones_like(smoothed), where=reference > 0)
+
+    chain = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    position = np.arange(len(radius)) - offsets[chain]
+    valid = (position >= end_margin) & (position < np.diff(offsets)[chain] - end_margin)
+
+    ves_type = np.array([matchvestype(int(swc_data[start, 1]), int(swc_data[end - 1, 1]))
+                         for start, end in zip(offsets[:-1], offsets[1:])], dtype=np.int64)
+    return {
+        'offsets': offsets,
+        'ves_type': ves_type,
+        'radius': radius,
+        'smoothed_radius': smoothed,
+        'reference_radius': reference,
+        'ratio': ratio,
+        'valid': valid,
+        'flagged': valid & (ratio < threshold),
+    }
+
+
+def summarize_stenosis(screening):
+    """
+    Summarize a stenosis screening into a compact per-subject record.
+
+    Parameters:
+    - screening (dict): The output of `screen_stenosis`.
+
+    Returns:
+    - dict: 'stenosis_count' (the number of contiguous flagged runs), 'max_stenosis' (the largest
+      narrowing, 1 - ratio, over all screened points) and 'stenosis_vessels' (the names of the
+      vessels with at least one flagged run).
+    """
+    flagged = screening['flagged']
+    offsets = screening['offsets']
+    # A run starts at a flagged point whose predecessor in the same snake is not flagged
+    previous = np.concatenate([[False], flagged[:-1]])
+    previous[offsets[:-1]] = False
+    run_starts = np.flatnonzero(flagged & ~previous)
+
+    narrowing = 1 - screening['ratio'][screening['valid']]
+    chains = np.searchsorted(offsets, run_starts, side='right') - 1
+    vessels = {getvesname(int(t)) for t in screening['ves_type'][chains]}
+    return {
+        'stenosis_count': int(len(run_starts)),
+        'max_stenosis': float(max(narrowing.max(), 0)) if len(narrowing) else 0.0,
+        'stenosis_vessels': sorted(vessel for vessel in vessels if vessel is not None),
+    }
@@ -0,0 +1,82 @@
+"""
+This module crops vessel graphs to a region of interest (ROI).
+
+A region is a sphere, an axis-aligned box, a set of vessel types, or an intersection of these.
+The spatial criteria are answered by a `SpatialIndex`, so the cost of a crop grows with the number
+of edges in the region rather than with the size of the whole tracing.
+
+Example usage:
+    index = SpatialIndex(G)
+    G_roi = crop_graph(G, index, center=[230.0, 240.0, 105.0], radius=15.0, ves_types=['ICA_R'])
+"""
+import networkx as nx
+import numpy as np
+
+from .graph_analysis import getvesid
+
+
+def select_roi_edges(index, center=None, radius=None, lower=None, upper=None, ves_types=None):
+    """
+    Select the rows of the edges that lie in a region of interest.
+
+    Parameters:
+    - index (SpatialIndex): The spatial index of the graph.
+    - center (array-like): The center (x, y, z) of a spherical region.
+    - radius (float): The radius of a spherical region.
+    - lower (array-like): The lower corner (x, y, z) of a box region.
+    - upper (array-like): The upper corner (x, y, z) of a box region.
+    - ves_types (list of str or int): The vessel names or IDs to keep.
+
+    Returns:
+    - numpy.ndarray: The sorted rows of the selected edges in `index.arrays`.
+
+    Raises:
+    - ValueError: If no criterion is given, or a sphere or box is only partially specified.
+    """
+    if (center is None) != (radius is None):
+        raise ValueError("A spherical region needs both a center and a radius")
+    if (lower is None) != (upper is None):
+        raise ValueError("A box region needs both a lower and an upper corner")
+    if center is None and lower is None and ves_types is None:
+        raise ValueError("No region of interest specified")
+
+    edge_index = None
+    if center is not None:
+        edge_index = index.within_radius(center, radius)['edge_index']
+    if lower is not None:
+        box_edges = index.within_box(lower, upper)['edge_index']
+        edge_index = box_edges if edge_index is None else np.intersect1d(edge_index, box_edges)
+    if ves_types is not None:
+        ves_ids = [getvesid(t) if isinstance(t, str) else int(t) for t in ves_types]
+        if edge_index is None:
+            edge_index = np.flatnonzero(np.isin(index.arrays.edge_ves_type, ves_ids))
+        else:
+            edge_index = edge_index[np.isin(index.arrays.edge_ves_type[edge_index], ves_ids)]
+    return np.sort(edge_index)
+
+
+def crop_graph(G, index, center=None, radius=None, lower=None, upper=None, ves_types=None):
+    """
+    Crop a graph to the edges that lie in a region of interest.
+
+    An edge belongs to a spherical or box region if any part of its segment lies inside it.
+    The cropped graph holds copies of the node and edge attributes of the selected edges.
+
+    Parameters:
+    - G (networkx.Graph): The graph to crop.
+    - index (SpatialIndex): The spatial index of `G`.
+    - center, radius, lower, upper, ves_types: The region, see `select_roi_edges`.
+
+    Returns:
+    - networkx.Graph: The cropped graph.
+    """
+    edge_index = select_roi_edges(index, center=center, radius=radius, lower=lower, upper=upper,
+                                  ves_types=ves_types)
+    edge_rows = index.arrays.edges[edge_index]
+    node_rows = np.unique(edge_rows)
+    node_ids = index.arrays.node_ids
+
+    G_roi = nx.Graph()
+    G_roi.add_nodes_from((node, dict(G.nodes[node])) for node in node_ids[node_rows].tolist())
+    G_roi.add_edges_from((u, v, dict(G.edges[u, v])) for u, v in node_ids[edge_rows].tolist())
+    return G_roi
@@ -0,0 +1,207 @@
+"""
+This module provides a KD-tree spatial index over the nodes and edges of a vessel graph.
+
+The index answers "which vessel is at this coordinate" and "what lies within r mm of this point"
+without scanning every node of the graph. Nodes are indexed by position and edges by their midpoints;
+edge queries widen the search by half of the longest edge and then test the candidate segments exactly.
+
+Example usage:
+    index = SpatialIndex(G)
+    index.nearest_edge([230.0, 240.0, 105.0])['ves_types']
+    index.within_radius([230.0, 240.0, 105.0], 15.0)['nodes']
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .graph_arrays import GraphArrays
+from .graph_analysis import getvesname
+
+
+def segment_point_distances(starts, ends, point):
+    """
+    Calculate the distance from a point to each of a set of line segments.
+
+    Parameters:
+    - starts (numpy.ndarray): The segment start points, shape (m, 3).
+    - ends (numpy.ndarray): The segment end points, shape (m, 3).
+    - point (numpy.ndarray): The query point, shape (3,).
+
+    Returns:
+    - numpy.ndarray: The distance from the point to every segment, shape (m,).
+    """
+    direction = ends - starts
+    squared_length = np.einsum('ij,ij->i', direction, direction)
+    projection = np.einsum('ij,ij->i', point - starts, direction)
+    t = np.divide(projection, squared_length, out=np.zeros_like(projection), where=squared_length > 0)
+    closest = starts + np.clip(t, 0, 1)[:, None] * direction
+    return np.linalg.norm(closest - point, axis=1)
+
+
+def segments_intersect_box(starts, ends, lower, upper):
+    """
+    Test which line segments intersect an axis-aligned box (slab method).
+
+    Parameters:
+    - starts (numpy.ndarray): The segment start points, shape (m, 3).
+    - ends (numpy.ndarray): The segment end points, shape (m, 3).
+    - lower (numpy.ndarray): The lower corner of the box, shape (3,).
+    - upper (numpy.ndarray): The upper corner of the box, shape (3,).
+
+    Returns:
+    - numpy.ndarray: A boolean mask of the segments that intersect the box, shape (m,).
+    """
+    direction = ends - starts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (lower - starts) / direction
+        t2 = (upper - starts) / direction
+    t_near = np.minimum(t1, t2)
+    t_far = np.maximum(t1, t2)
+    # Axes the segment does not move along only constrain the start point
+    parallel = direction == 0
+    inside = (starts >= lower) & (starts <= upper)
+    t_near = np.where(parallel, np.where(inside, -np.inf, np.inf), t_near)
+    t_far = np.where(parallel, np.where(inside, np.inf, -np.inf), t_far)
+    t_enter = np.maximum(t_near.max(axis=1), 0)
+    t_exit = np.minimum(t_far.min(axis=1), 1)
+    return t_enter <= t_exit
+
+
+class SpatialIndex:
+    """
+    A KD-tree index over the node positions and edge segments of a vessel graph.
+
+    Query results are dictionaries holding the matching node identifiers ('nodes'), their rows in
+    `arrays` ('node_index') and vessel names ('node_ves_types'), and the matching edges as node
+    identifier pairs ('edges'), edge rows ('edge_index') and vessel names ('edge_ves_types').
+
+    Attributes:
+        arrays (GraphArrays): The array view of the indexed graph.
+        node_tree (cKDTree): A KD-tree over the node positions.
+        edge_tree (cKDTree): A KD-tree over the edge midpoints.
+        max_half_length (float): Half of the longest edge, used to widen edge searches.
+
+    Methods:
+        nearest_node(point, k): Returns the k nodes closest to a point.
+        nearest_edge(point): Returns the edge closest to a point.
+        within_radius(center, radius): Returns the nodes and edges within a sphere.
+        within_box(lower, upper): Returns the nodes and edges within an axis-aligned box.
+    """
+
+    def __init__(self, G):
+        """
+        Builds the index for a graph.
+
+        Parameters:
+        - G (networkx.Graph): The vessel graph to index.
+        """
+        self.arrays = GraphArrays(G)
+        self.node_tree = cKDTree(self.arrays.pos)
+        starts, ends = self._edge_endpoints()
+        self.edge_tree = cKDTree((starts + ends) / 2)
+        self.max_half_length = self.arrays.edge_length.max() / 2 if self.arrays.num_edges else 0.0
+
+    def _edge_endpoints(self, edge_index=slice(None)):
+        edges = self.arrays.edges[edge_index]
+        return self.arrays.pos[edges[:, 0]], self.arrays.pos[edges[:, 1]]
+
+    def _result(self, node_index, edge_index, **extra):
+        node_index = np.asarray(node_index, dtype=np.int64)
+        edge_index = np.asarray(edge_index, dtype=np.int64)
+        edges = self.arrays.edges[edge_index]
+        return {
+            'nodes': self.arrays.node_ids[node_index],
+            'node_index': node_index,
+            'node_ves_types': [[getvesname(int(t)) for t in self.arrays.node_ves_types(i)] for i in node_index],
+            'edges': self.arrays.node_ids[edges].reshape(-1, 2),
+            'edge_index': edge_index,
+            'edge_ves_types': [getvesname(int(t)) for t in self.arrays.edge_ves_type[edge_index]],
+            **extra
+        }
+
+    def nearest_node(self, point, k=1):
+        """
+        Finds the nodes closest to a point.
+
+        Parameters:
+        - point (array-like): The query coordinate (x, y, z).
+        - k (int): The number of nodes to return.
+
+        Returns:
+        - dict: The query result with an additional 'distances' entry, ordered by distance.
+        """
+        k = min(k, self.arrays.num_nodes)
+        distances, node_index = self.node_tree.query(np.asarray(point, dtype=float), k=[i + 1 for i in range(k)])
+        return self._result(node_index, [], distances=distances)
+
+    def nearest_edge(self, point):
+        """
+        Finds the edge closest to a point, i.e. the vessel at that coordinate.
+
+        Parameters:
+        - point (array-like): The query coordinate (x, y, z).
+
+        Returns:
+        - dict: The query result with an additional 'distances' entry.
+        """
+        if self.arrays.num_edges == 0:
+            return self._result([], [], distances=np.array([]))
+        point = np.asarray(point, dtype=float)
+        # The closest segment can be no farther than the closest midpoint
+        midpoint_distance, _ = self.edge_tree.query(point)
+        candidates = np.array(self.edge_tree.query_ball_point(point, midpoint_distance + self.max_half_length),
+                              dtype=np.int64)
+        distances = segment_point_distances(*self._edge_endpoints(candidates), point)
+        best = np.argmin(distances)
+        return self._result([], candidates[[best]], distances=distances[[best]])
+
+    def within_radius(self, center, radius):
+        """
+        Finds the nodes and edges within a sphere.
+
+        An edge is included if any part of its segment lies within the sphere.
+
+        Parameters:
+        - center (array-like): The sphere center (x, y, z).
+        - radius (float): The sphere radius.
+
+        Returns:
+        - dict: The query result.
+        """
+        center = np.asarray(center, dtype=float)
+        node_index = np.sort(np.array(self.node_tree.query_ball_point(center, radius), dtype=np.int64))
+        candidates = np.sort(np.array(self.edge_tree.query_ball_point(center, radius + self.max_half_length),
+                                      dtype=np.int64))
+        if len(candidates):
+            candidates = candidates[segment_point_distances(*self._edge_endpoints(candidates), center) <= radius]
+        return self._result(node_index, candidates)
+
+    def within_box(self, lower, upper):
+        """
+        Finds the nodes and edges within an axis-aligned box.
+
+        An edge is included if any part of its segment lies within the box.
+
+        Parameters:
+        - lower (array-like): The lower corner of the box (x, y, z).
+        - upper (array-like): The upper corner of the box (x, y, z).
+
+        Returns:
+        - dict: The query result.
+        """
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+        center = (lower + upper) / 2
+        half_extent = np.max(upper - lower) / 2
+
+        # Search the enclosing cube (Chebyshev ball) and keep the candidates inside the box
+        node_index = np.sort(np.array(self.node_tree.query_ball_point(center, half_extent, p=np.inf),
+                                      dtype=np.int64))
+        if len(node_index):
+            pos = self.arrays.pos[node_index]
+            node_index = node_index[np.all((pos >= lower) & (pos <= upper), axis=1)]
+
+        candidates = np.sort(np.array(self.edge_tree.query_ball_point(center, half_extent + self.max_half_length,
+                                                                      p=np.inf), dtype=np.int64))
+        if len(candidates):
+            candidates = candidates[segments_intersect_box(*self._edge_endpoints(candidates), lower, upper)]
+        return self._result(node_index, candidates)
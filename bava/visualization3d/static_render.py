@@ -0,0 +1,152 @@
+"""
+This module renders static 3D images of vessel graphs without a display.
+
+The edges of each vessel type are drawn as a single `Line3DCollection` and the figure is rendered
+with the Agg canvas directly (not through pyplot), so rendering works in batch jobs and servers.
+`BatchRenderer` keeps one figure and canvas and only clears its axes between graphs, so rendering
+many subjects does not pay the figure setup cost for each of them.
+
+The camera presets look along the coordinate axes of the tracings, with z pointing up.
+
+Example usage:
+    renderer = BatchRenderer()
+    for subject_id, G in graphs:
+        png = renderer.render(G, camera='superior')
+"""
+import io
+
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+from .graph_analysis import getvesname
+from .graph_arrays import GraphArrays
+
+# Camera presets as (elevation, azimuth) in degrees
+CAMERA_PRESETS = {
+    'oblique': (30, -60),
+    'anterior': (0, -90),
+    'posterior': (0, 90),
+    'left': (0, 180),
+    'right': (0, 0),
+    'superior': (90, -90),
+    'inferior': (-90, -90),
+}
+IMAGE_FORMATS = ('png', 'svg')
+
+
+class BatchRenderer:
+    """
+    Renders vessel graphs to image bytes, reusing one figure and canvas.
+
+    Attributes:
+        figure (matplotlib.figure.Figure): The figure drawn into.
+        ax (mpl_toolkits.mplot3d.Axes3D): The 3D axes, cleared before every graph.
+
+    Methods:
+        render(G, camera, image_format, show_nodes, legend, show_axes): Renders a graph to PNG or SVG bytes.
+        render_many(graphs, camera, image_format): Renders several graphs one after the other.
+    """
+
+    def __init__(self, figsize=(10, 8), dpi=100):
+        """
+        Creates the figure and canvas.
+
+        Parameters:
+        - figsize (tuple): The size of the images in inches.
+        - dpi (int): The resolution of PNG images.
+        """
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111, projection='3d')
+        self._position = self.ax.get_position()
+
+    def render(self, G, camera='oblique', image_format='png', show_nodes=True, legend=True, show_axes=True):
+        """
+        Renders a graph to image bytes.
+
+        Parameters:
+        - G (networkx.Graph): The graph, with 'pos' node attributes and 'ves_type' edge attributes.
+        - camera (str or tuple): A name from `CAMERA_PRESETS` or an (elevation, azimuth) pair in degrees.
+        - image_format (str): 'png' or 'svg'.
+        - show_nodes (bool): Whether to draw the nodes as gray points.
+        - legend (bool): Whether to draw a legend of the vessel types.
+        - show_axes (bool): Whether to draw the axes and the title, e.g. False for thumbnails.
+
+        Returns:
+        - bytes: The image.
+
+        Raises:
+        - ValueError: If the camera preset or the image format is unknown.
+        """
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format {image_format!r}, expected one of {IMAGE_FORMATS}")
+        elevation, azimuth = self._camera(camera)
+        arrays = GraphArrays(G)
+        ax = self.ax
+        ax.cla()
+
+        if show_nodes:
+            ax.scatter(arrays.pos[:, 0], arrays.pos[:, 1], arrays.pos[:, 2], color='gray', s=20)
+
+        # One line collection per vessel type, in order of first appearance
+        ves_types = arrays.edge_ves_type[np.sort(np.unique(arrays.edge_ves_type, return_index=True)[1])]
+        colors = matplotlib.colormaps['rainbow'](np.linspace(0, 1, len(ves_types)))
+        handles = []
+        for ves_type, color in zip(ves_types, colors):
+            edges = arrays.edges[arrays.edge_ves_type == ves_type]
+            segments = np.stack([arrays.pos[edges[:, 0]], arrays.pos[edges[:, 1]]], axis=1)
+            ax.add_collection3d(Line3DCollection(segments, colors=[color]))
+            handles.append(Line2D([0], [0], color=color, lw=2, label=getvesname(ves_type)))
+
+        if arrays.num_nodes:
+            lower, upper = arrays.pos.min(axis=0), arrays.pos.max(axis=0)
+            ax.set_xlim(lower[0], upper[0])
+            ax.set_ylim(lower[1], upper[1])
+            ax.set_zlim(lower[2], upper[2])
+            # Without axes the tracing can fill the frame
+            ax.set_box_aspect(np.maximum(upper - lower, 1e-6), zoom=1 if show_axes else 1.4)
+        if show_axes:
+            ax.set_axis_on()
+            ax.set_xlabel('X Axis')
+            ax.set_ylabel('Y Axis')
+            ax.set_zlabel('Z Axis')
+            ax.set_title("3D Graph Visualization")
+            ax.set_position(self._position)
+        else:
+            ax.set_axis_off()
+            ax.set_position([0, 0, 1, 1])
+        ax.view_init(elev=elevation, azim=azimuth)
+        if legend and handles:
+            ax.legend(handles=handles, title="Vessel Types")
+
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format=image_format)
+        return buffer.getvalue()
+
+    def render_many(self, graphs, camera='oblique', image_format='png'):
+        """
+        Renders several graphs one after the other.
+
+        Parameters:
+        - graphs (iterable): The graphs.
+        - camera (str or tuple): The camera of every image, see `render`.
+        - image_format (str): 'png' or 'svg'.
+
+        Yields:
+        - bytes: The image of every graph, in order.
+        """
+        for G in graphs:
+            yield self.render(G, camera=camera, image_format=image_format)
+
+    @staticmethod
+    def _camera(camera):
+        if isinstance(camera, str):
+            if camera not in CAMERA_PRESETS:
+                raise ValueError(f"Unknown camera preset {camera!r}, expected one of {list(CAMERA_PRESETS)}")
+            return CAMERA_PRESETS[camera]
+        elevation, azimuth = camera
+        return elevation, azimuth
@@ -1,5 +1,16 @@
-from .swc2graph import swc2graph, create_interactive_plot
+import numpy as np
+
+from .swc2graph import swc2graph, parse_swc, create_interactive_plot
 from .graph_analysis import add_centrality_measures, calculate_features, calc_morphological_features, calc_graphical_features
+from .graph_analysis import vessel_presence_mask, getvesid
+from .spatial_index import SpatialIndex
+from .graph_io import save_subject_graph, load_subject_graph
+from .path_index import PathLengthIndex
+from .roi import crop_graph
+from .graph_edit import FeatureTracker, find_segment, segment_edges
+from .level_of_detail import decimate_graph
+from .tube_mesh import create_tube_plot
+from .radius_profile import screen_stenosis, summarize_stenosis
 
 class SubjectGraph:
     """
@@ -9,12 +20,24 @@ class SubjectGraph:
         swc_string (str): The SWC string used to construct the graph.
         graph (Graph): The graph representation of the SWC file.
         features (dict): A dictionary containing calculated features of the graph.
+        spatial_index (SpatialIndex): A KD-tree index over the graph, built on first access.
+        path_index (PathLengthIndex): A path-length index over the graph, built on first access.
 
     Methods:
-        __init__(self, swc_string): Initializes a new instance of the SubjectGraph class.
+        __init__(self, swc_string, simplify_tolerance): Initializes a new instance of the SubjectGraph class.
+        from_graph(cls, graph, features, swc_string): Creates a SubjectGraph from an existing graph.
+        crop(self, center, radius, lower, upper, ves_types): Crops the graph to a region of interest.
+        save(self, path): Saves the graph and its features to a binary file.
+        relabel_segment(self, u, v, ves_type): Changes the vessel type of a segment.
+        delete_segment(self, u, v): Deletes a segment, e.g. a falsely traced branch.
+        add_segment(self, points, radius, ves_type, start, end): Adds a traced segment.
+        load(cls, path, mmap): Loads a SubjectGraph saved with `save`.
         add_centrality_measures(self): Adds centrality measures to the graph.
         summarize_local_features(self): Summarizes the local features of the graph.
-        create_interactive_plot(self): Creates an interactive plot of the graph.
+        create_interactive_plot(self, vertex_budget, center, radius, lower, upper): Creates an interactive plot
+            of the graph or a region of it, optionally at a coarse level of detail.
+        create_tube_plot(self, sides, triangle_budget, center, radius, lower, upper): Creates an interactive plot
+            of the vessels as tubes with their radii, within a triangle budget.
 
     Usage:
         subject_graph = SubjectGraph(swc_string)
@@ -22,17 +45,265 @@ class SubjectGraph:
         local_features = subject_graph.summarize_local_features()
         plot = subject_graph.create_interactive_plot()
     """
-    def __init__(self, swc_string):
+    def __init__(self, swc_string, simplify_tolerance=None):
+        """
+        Builds the graph of a tracing and calculates its features.
+
+        Args:
+            swc_string (str): The SWC string of the tracing.
+            simplify_tolerance (float): If given, the vessels are simplified to within this distance (in mm)
+                instead of being resampled at a fixed distance, see `swc2graph`.
+        """
         self.swc_string = swc_string
-        self.graph = swc2graph(self.swc_string)
+        self.graph = swc2graph(self.swc_string, simplify_tolerance=simplify_tolerance)
         self.features = calculate_features(self.graph)
+        self._feature_tracker = None
+        self._clear_indices()
+
+    @classmethod
+    def from_graph(cls, graph, features=None, swc_string=None):
+        """
+        Creates a SubjectGraph from an already built graph.
+
+        Args:
+            graph (Graph): The graph representation of the subject.
+            features (dict): The features of the graph. Calculated from the graph if not given.
+            swc_string (str): The SWC string the graph was built from, if known.
+
+        Returns:
+            SubjectGraph: A new SubjectGraph wrapping the graph.
+        """
+        subject_graph = cls.__new__(cls)
+        subject_graph.swc_string = swc_string
+        subject_graph.graph = graph
+        subject_graph.features = calculate_features(graph) if features is None else features
+        subject_graph._feature_tracker = None
+        subject_graph._clear_indices()
+        return subject_graph
+
+    def save(self, path):
+        """
+        Saves the graph, including any centrality measures, and its features to a binary file.
+
+        The SWC string is not saved.
+
+        Args:
+            path (str): The file to write.
+        """
+        save_subject_graph(path, self.graph, self.features)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a SubjectGraph saved with `save` without rebuilding it from the SWC string.
+
+        Args:
+            path (str): The file to read.
+            mmap (bool): Whether to memory-map the file instead of reading it into memory.
+
+        Returns:
+            SubjectGraph: The loaded SubjectGraph. Its 'swc_string' is None.
+
+        Raises:
+            ValueError: If the file is not a saved graph or has an unsupported format version.
+        """
+        graph, features = load_subject_graph(path, mmap=mmap)
+        return cls.from_graph(graph, features=features)
+
+    def _clear_indices(self):
+        """
+        Drops the cached indices so that they are rebuilt from the current graph on next access.
+        """
+        self._spatial_index = None
+        self._path_index = None
 
     def add_centrality_measures(self):
         """
         Adds centrality measures to the graph.
+
+        Edits do not update the centrality measures; call this again to recompute them for the whole graph.
         """
         add_centrality_measures(self.graph)
 
+    @property
+    def spatial_index(self):
+        """
+        Returns the spatial index of the graph, building it on first access.
+
+        Returns:
+            SpatialIndex: A KD-tree index for nearest-node, nearest-edge, radius and box queries.
+        """
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self.graph)
+        return self._spatial_index
+
+    @property
+    def path_index(self):
+        """
+        Returns the path-length index of the graph, building it on first access.
+
+        Returns:
+            PathLengthIndex: An index for (batched) path-length and path queries along the vessels.
+        """
+        if self._path_index is None:
+            self._path_index = PathLengthIndex(self.graph)
+        return self._path_index
+
+    def crop(self, center=None, radius=None, lower=None, upper=None, ves_types=None):
+        """
+        Crops the graph to a region of interest.
+
+        The region is a sphere (center, radius), a box (lower, upper), a set of vessel types,
+        or the intersection of several of these.
+
+        Args:
+            center (array-like): The center (x, y, z) of a spherical region.
+            radius (float): The radius of a spherical region.
+            lower (array-like): The lower corner (x, y, z) of a box region.
+            upper (array-like): The upper corner (x, y, z) of a box region.
+            ves_types (list): The vessel names (e.g. "M1_L") or IDs to keep.
+
+        Returns:
+            SubjectGraph: A SubjectGraph of the cropped region with its own features.
+
+        Raises:
+            ValueError: If the region is not specified correctly or contains no vessels.
+        """
+        return SubjectGraph.from_graph(self._cropped_graph(center, radius, lower, upper, ves_types))
+
+    def _cropped_graph(self, center, radius, lower, upper, ves_types=None):
+        graph = crop_graph(self.graph, self.spatial_index, center=center, radius=radius,
+                           lower=lower, upper=upper, ves_types=ves_types)
+        if graph.number_of_edges() == 0:
+            raise ValueError("The region of interest does not contain any vessels")
+        return graph
+
+    @property
+    def feature_tracker(self):
+        """
+        Returns the tracker keeping the features up to date during edits, building it on first access.
+
+        Returns:
+            FeatureTracker: The incrementally maintained features and graph statistics.
+        """
+        if self._feature_tracker is None:
+            self._feature_tracker = FeatureTracker(self.graph, self.features)
+        return self._feature_tracker
+
+    @property
+    def graph_statistics(self):
+        """
+        Returns the degree, branch and connected-component statistics of the graph.
+
+        Returns:
+            dict: The statistics maintained by the feature tracker, see `FeatureTracker.statistics`.
+        """
+        return self.feature_tracker.statistics()
+
+    def _edit(self, nodes, apply):
+        """
+        Applies an edit that changes the edges incident to `nodes` and updates the features.
+
+        Centrality attributes are not updated; call `add_centrality_measures` to recompute them.
+        """
+        tracker = self.feature_tracker
+        tracker.before_edit(nodes)
+        added_nodes = apply() or []
+        tracker.after_edit(list(nodes) + list(added_nodes))
+        self._clear_indices()
+        return added_nodes
+
+    def relabel_segment(self, u, v, ves_type):
+        """
+        Changes the vessel type of the segment containing the edge (u, v).
+
+        Args:
+            u, v: The endpoints of an edge of the segment.
+            ves_type (str or int): The new vessel name (e.g. "M1_L") or ID.
+
+        Raises:
+            ValueError: If (u, v) is not an edge or the vessel name is unknown.
+        """
+        ves_id = getvesid(ves_type) if isinstance(ves_type, str) else int(ves_type)
+        nodes = find_segment(self.graph, u, v)
+        edges = segment_edges(self.graph, nodes)
+
+        def apply():
+            old_types = {self.graph.edges[edge]['ves_type'] for edge in edges}
+            for edge in edges:
+                self.graph.edges[edge]['ves_type'] = ves_id
+            for node in nodes:
+                if self.graph.degree[node] == 2:
+                    self.graph.nodes[node]['ves_type'] = [ves_id]
+                    continue
+                # Branching points keep the types of their other vessels
+                remaining = {t for _, _, t in self.graph.edges(node, data='ves_type')}
+                node_types = [t for t in self.graph.nodes[node]['ves_type'] if t not in old_types or t in remaining]
+                self.graph.nodes[node]['ves_type'] = node_types + ([ves_id] if ves_id not in node_types else [])
+
+        self._edit(nodes, apply)
+
+    def delete_segment(self, u, v):
+        """
+        Deletes the segment containing the edge (u, v) together with its inner nodes.
+        Endpoints left without any edge are deleted as well.
+
+        Args:
+            u, v: The endpoints of an edge of the segment.
+
+        Raises:
+            ValueError: If (u, v) is not an edge.
+        """
+        nodes = find_segment(self.graph, u, v)
+        edges = segment_edges(self.graph, nodes)
+
+        def apply():
+            self.graph.remove_edges_from(edges)
+            self.graph.remove_nodes_from([node for node in nodes if self.graph.degree[node] == 0])
+
+        self._edit(nodes, apply)
+
+    def add_segment(self, points, radius, ves_type, start=None, end=None):
+        """
+        Adds a traced segment as a chain of new nodes, optionally connected to existing nodes.
+
+        Args:
+            points (array-like): The positions of the new nodes in order, shape (k, 3).
+            radius (float or array-like): The radius of the new nodes.
+            ves_type (str or int): The vessel name (e.g. "M1_L") or ID of the segment.
+            start: An existing node connected to the first new node.
+            end: An existing node connected to the last new node.
+
+        Returns:
+            list: The identifiers of the new nodes.
+
+        Raises:
+            ValueError: If no points are given, `start` or `end` is not a node, or the vessel name is unknown.
+        """
+        ves_id = getvesid(ves_type) if isinstance(ves_type, str) else int(ves_type)
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(points) == 0:
+            raise ValueError("A segment needs at least one point")
+        existing = [node for node in (start, end) if node is not None]
+        for node in existing:
+            if node not in self.graph:
+                raise ValueError(f"{node} is not a node of the graph")
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), (len(points),))
+        first_id = max(self.graph.nodes, default=0) + 1
+        new_nodes = [float(first_id + i) for i in range(len(points))]
+
+        def apply():
+            self.graph.add_nodes_from((node, {'pos': pos, 'radius': float(rad), 'ves_type': [ves_id]})
+                                      for node, pos, rad in zip(new_nodes, points, radius))
+            chain = ([start] if start is not None else []) + new_nodes + ([end] if end is not None else [])
+            self.graph.add_edges_from(zip(chain[:-1], chain[1:]), ves_type=ves_id)
+            for node in existing:
+                if ves_id not in self.graph.nodes[node]['ves_type']:
+                    self.graph.nodes[node]['ves_type'].append(ves_id)
+            return new_nodes
+
+        return self._edit(existing, apply)
+
     @property
     def morphological_features(self):
         """
@@ -59,11 +330,80 @@ class SubjectGraph:
         """
         return calc_graphical_features(self.graph)
 
-    def create_interactive_plot(self):
+    @property
+    def vessel_mask(self):
+        """
+        Returns the vessel-presence bitmask of the graph.
+
+        Returns:
+            int: A bitmask with bit `id` set for every vessel type `id` present in the graph.
+        """
+        return vessel_presence_mask(self.graph)
+
+    @property
+    def stenosis_summary(self):
         """
-        Creates an interactive plot of the graph.
+        Screens the radius profile of every vessel for focal narrowing.
+
+        Returns:
+            dict: The number of narrowed runs, the largest narrowing and the affected vessel names.
+
+        Raises:
+            ValueError: If the SWC string of the subject is not available.
+        """
+        if self.swc_string is None:
+            raise ValueError("The stenosis screening needs the SWC string of the subject")
+        return summarize_stenosis(screen_stenosis(parse_swc(self.swc_string)))
+
+    def create_interactive_plot(self, vertex_budget=None, center=None, radius=None, lower=None, upper=None):
+        """
+        Creates an interactive plot of the graph, or of a region of it.
+
+        With a vertex budget the plot shows a coarse level of detail that keeps every bifurcation and
+        endpoint and decimates the vessels between them. A region (sphere or box) is cropped first,
+        so zooming in spends the whole budget on the region.
+
+        Args:
+            vertex_budget (int): The largest number of nodes to draw. All nodes are drawn if None.
+            center (array-like): The center (x, y, z) of a spherical region.
+            radius (float): The radius of a spherical region.
+            lower (array-like): The lower corner (x, y, z) of a box region.
+            upper (array-like): The upper corner (x, y, z) of a box region.
 
         Returns:
             Plot: An interactive plot of the graph.
+
+        Raises:
+            ValueError: If the region is not specified correctly or contains no vessels.
         """
-        return create_interactive_plot(self.graph)
\ No newline at end of file
+        graph = self._region_graph(center, radius, lower, upper)
+        if vertex_budget is not None:
+            graph = decimate_graph(graph, vertex_budget)
+        return create_interactive_plot(graph)
+
+    def create_tube_plot(self, sides=8, triangle_budget=200000, center=None, radius=None, lower=None, upper=None):
+        """
+        Creates an interactive plot of the vessels as tubes with their traced radii, or of a region of them.
+
+        The vessels are decimated (and drawn with fewer sides if needed) to fit the triangle budget,
+        keeping every bifurcation and endpoint.
+
+        Args:
+            sides (int): The number of sides of the tubes, at least 3.
+            triangle_budget (int): The largest number of triangles to draw.
+            center, radius, lower, upper: The region to draw, as in `create_interactive_plot`.
+
+        Returns:
+            Plot: An interactive plot with one mesh per vessel type.
+
+        Raises:
+            ValueError: If the region is not specified correctly or contains no vessels, or sides is less than 3.
+        """
+        return create_tube_plot(self._region_graph(center, radius, lower, upper), sides=sides,
+                                triangle_budget=triangle_budget)
+
+    def _region_graph(self, center, radius, lower, upper):
+        if center is not None or radius is not None or lower is not None or upper is not None:
+            # Only drawn, so the features of the region are not calculated
+            return self._cropped_graph(center, radius, lower, upper)
+        return self.graph
\ No newline at end of file
@@ -1,4 +1,6 @@
 from .subject_graph import SubjectGraph
+from .cohort_graph import CohortGraph
+from .comparison import create_comparison_plot
 
 class SubjectsManager:
     """
@@ -13,6 +15,8 @@ class SubjectsManager:
         add_subject(identifier, swc_file): Adds a new subject to the manager with the given identifier and SWC file.
         get_subject(identifier): Retrieves the subject with the given identifier from the manager.
         get_all_subjects(): Returns a list of all subject identifiers in the manager.
+        to_cohort_graph(identifiers): Stacks the graphs of the subjects into one block-diagonal sparse graph.
+        create_comparison_plot(identifiers, layout, landmark, vertex_budget): Overlays or tiles subjects in one plot.
     """
 
     def __init__(self):
@@ -52,3 +56,39 @@ class SubjectsManager:
             list: A list of all subject identifiers.
         """
         return list(self.subjects.keys())
+
+    def to_cohort_graph(self, identifiers=None):
+        """
+        Stacks the graphs of the given subjects into one block-diagonal sparse adjacency matrix.
+
+        Args:
+            identifiers (list): The identifiers of the subjects to include. Defaults to all subjects.
+
+        Returns:
+            CohortGraph: The block-diagonal cohort graph, with blocks in the order of `identifiers`.
+        """
+        if identifiers is None:
+            identifiers = self.get_all_subjects()
+        return CohortGraph([self.subjects[identifier].graph for identifier in identifiers], subject_ids=identifiers)
+
+    def create_comparison_plot(self, identifiers=None, layout='overlay', landmark=None, vertex_budget=None):
+        """
+        Draws several subjects in one interactive plot, overlaid or side by side.
+
+        Args:
+            identifiers (list): The identifiers of the subjects to compare. Defaults to all subjects.
+            layout (str): 'overlay' or 'tile'.
+            landmark (str): A landmark to centre every subject on, e.g. 'basilar_tip'.
+            vertex_budget (int): The largest number of nodes drawn per subject.
+
+        Returns:
+            Plot: The comparison plot, with one trace per vessel type across all subjects.
+
+        Raises:
+            ValueError: If the layout or landmark is unknown, or a subject does not contain the landmark.
+        """
+        if identifiers is None:
+            identifiers = self.get_all_subjects()
+        return create_comparison_plot([self.subjects[identifier].graph for identifier in identifiers],
+                                      subject_ids=identifiers, layout=layout, landmark=landmark,
+                                      vertex_budget=vertex_budget)
@@ -3,80 +3,35 @@ import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
-from .graph_analysis import matchvestype, getvesname
+from .graph_analysis import matchvestypes, getvesname
+from .graph_arrays import GraphArrays
+from .static_render import BatchRenderer
 import ast
+import json
 
-def create_interactive_plot(G):
+def vessel_color_map(ves_types):
     """
-    Creates an interactive 3D network graph plot.
+    Assigns a color to every vessel type of a graph.
 
     Parameters:
-        G (networkx.Graph): The graph object representing the network.
+        ves_types (iterable): The vessel types of the edges.
 
     Returns:
-        plotly.graph_objects.Figure: The interactive 3D network graph plot.
+        dict: Mapping from vessel name to an 'rgb(r, g, b)' color.
     """
-    # Extract node positions
-    pos = nx.get_node_attributes(G, 'pos')
-
-    # Create color map for vessel types
-    vessel_types = set()
-    for _, _, edge_data in G.edges(data=True):
-        vessel_types.add(edge_data['ves_type'])
+    vessel_types = set(np.asarray(ves_types).tolist())
     colors = plt.cm.rainbow(np.linspace(0, 1, len(vessel_types)))
-    color_map = {getvesname(ves_type): f'rgb({int(255*color[0])}, {int(255*color[1])}, {int(255*color[2])})' 
-                 for ves_type, color in zip(vessel_types, colors)}
+    return {getvesname(ves_type): f'rgb({int(255*color[0])}, {int(255*color[1])}, {int(255*color[2])})'
+            for ves_type, color in zip(vessel_types, colors)}
 
-    # Edge data - creating a trace for each edge
-    edge_traces = []
-    legend_traces = []
-    legend_added = set()
-    edge_width = 5
-    for edge in G.edges(data=True):
-        x0, y0, z0 = pos[edge[0]]
-        x1, y1, z1 = pos[edge[1]]
-        ves_type = getvesname(edge[2]['ves_type'])
-        color = color_map[ves_type]
-        edge_trace = go.Scatter3d(x=[x0, x1], y=[y0, y1], z=[z0, z1], mode='lines',
-                                  line=dict(color=color, width=edge_width), hoverinfo='text', 
-                                  hovertext=ves_type, showlegend=False)
-        edge_traces.append(edge_trace)
-        if ves_type not in legend_added:
-            legend_trace = go.Scatter3d(x=[None], y=[None], z=[None], mode='lines',
-                                        line=dict(color=color, width=4), name=ves_type)
-            legend_traces.append(legend_trace)
-            legend_added.add(ves_type)
-
-    # Node data
-    node_opacity = 0.5
-    node_x, node_y, node_z, node_color, node_hover_text = [], [], [], [], []
-    centrality_eigen = 'eigenvector'
-    centrality_betweenness = 'betweenness'
-    centrality_closeness = 'closeness'
-    for node, data in G.nodes(data=True):
-        node_x.append(pos[node][0])
-        node_y.append(pos[node][1])
-        node_z.append(pos[node][2])
-        node_color.append('red' if len(data['ves_type']) > 1 else 'blue')
-        hover_text = ', '.join([getvesname(vt) for vt in data['ves_type']])
-        
-        centrality_betweenness_value = data.get(centrality_betweenness, 0)  # Default to 0 if not found
-        hover_text += f"<br>{centrality_betweenness.capitalize()}: {centrality_betweenness_value*10000:.2f}"
-        
-        centrality_closeness_value = data.get(centrality_closeness, 0)  # Default to 0 if not found
-        hover_text += f"<br>{centrality_closeness.capitalize()}: {centrality_closeness_value*10000:.2f}"
-        
-        centrality_eigen_value = data.get(centrality_eigen, 0)  # Default to 0 if not found
-        hover_text += f"<br>{'Eigen Centrality'}: {centrality_eigen_value*10000:.2f}"
-        
-        node_hover_text.append(hover_text)
-
-    node_trace = go.Scatter3d(x=node_x, y=node_y, z=node_z, mode='markers',
-                              marker=dict(size=3.5, color=node_color), hoverinfo='text', 
-                              hovertext=node_hover_text, opacity=node_opacity, showlegend=False)
-
-    # Define layout
-    layout = go.Layout(
+def plot_layout():
+    """
+    Creates the layout shared by the interactive 3D plots.
+
+    Returns:
+        plotly.graph_objects.Layout: The layout, without axes and with a legend of vessel types.
+    """
+    return go.Layout(
         title='Advanced 3D Network Graph',
         scene=dict(
             xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, showbackground=False),
@@ -88,64 +43,86 @@ def create_interactive_plot(G):
         height=1000  # Adjust the height value as needed
     )
 
-    # Create and return the figure
-    fig = go.Figure(data=edge_traces + legend_traces + [node_trace], layout=layout)
-    return fig
-
-def visualize_3d_graph(G):
+def create_interactive_plot(G):
     """
-    Visualizes a 3D graph.
+    Creates an interactive 3D network graph plot.
+
+    The edges of each vessel type are drawn as a single line trace, with the segments separated by
+    NaN coordinates, so the number of traces does not grow with the number of edges.
 
     Parameters:
-        G (networkx.Graph): The graph to visualize.
+        G (networkx.Graph): The graph object representing the network.
 
     Returns:
-        None
+        plotly.graph_objects.Figure: The interactive 3D network graph plot.
     """
-    fig = plt.figure(figsize=(10, 8))
-    ax = fig.add_subplot(111, projection='3d')
-
-    pos = nx.get_node_attributes(G, 'pos')  # Position should be a tuple (x, y, z)
-
-    # Extract the x, y, z coordinates of each node
-    xs, ys, zs = zip(*[pos[v] for v in G.nodes()])
-    
-    # Draw the nodes
-    ax.scatter(xs, ys, zs, color='gray', s=20)  # Nodes in gray, adjust size as needed
+    arrays = GraphArrays(G)
 
-    # Create a color map for vessel types
-    vessel_types = []
-    for _, _, edge_data in G.edges(data=True):
-        vessel_types.append(getvesname(edge_data.get('ves_type', [])))
-    # remove the duplicate vessel types
-    vessel_types = list(set(vessel_types))
+    # Create color map for vessel types
+    color_map = vessel_color_map(arrays.edge_ves_type)
 
-    colors = plt.cm.rainbow(np.linspace(0, 1, len(vessel_types)))
-    color_map = {ves_type: color for ves_type, color in zip(vessel_types, colors)}
+    # Edge data - creating a trace for each vessel type, in order of first appearance
+    edge_traces = []
+    edge_width = 5
+    edge_names = np.array([getvesname(ves_type) for ves_type in arrays.edge_ves_type.tolist()], dtype=object)
+    _, first_edges = np.unique(arrays.edge_ves_type, return_index=True)
+    for first_edge in np.sort(first_edges):
+        ves_type = edge_names[first_edge]
+        edges = arrays.edges[arrays.edge_ves_type == arrays.edge_ves_type[first_edge]]
+        # Each edge contributes its start, its end and a NaN separator
+        segments = np.full((len(edges), 3, 3), np.nan)
+        segments[:, 0] = arrays.pos[edges[:, 0]]
+        segments[:, 1] = arrays.pos[edges[:, 1]]
+        segments = segments.reshape(-1, 3)
+        edge_traces.append(go.Scatter3d(x=segments[:, 0], y=segments[:, 1], z=segments[:, 2], mode='lines',
+                                        line=dict(color=color_map[ves_type], width=edge_width),
+                                        hovertemplate=f'{ves_type}<extra></extra>', name=ves_type, connectgaps=False))
+
+    # Node data - the centralities are sent as numbers and formatted by the hover template in the browser
+    node_opacity = 0.5
+    node_color = (np.diff(arrays.node_ves_type_ptr) > 1).astype(np.uint8)
+    node_labels = [', '.join(getvesname(vt) for vt in types) for _, types in G.nodes(data='ves_type')]
+    centralities = ['betweenness', 'closeness', 'eigenvector']
+    node_centrality = np.array([[data.get(measure, 0) for measure in centralities]  # Default to 0 if not found
+                                for _, data in G.nodes(data=True)], dtype=float).reshape(-1, 3) * 10000
+    node_hover_template = ('%{text}<br>Betweenness: %{customdata[0]:.2f}<br>Closeness: %{customdata[1]:.2f}'
+                           '<br>Eigen Centrality: %{customdata[2]:.2f}<extra></extra>')
+
+    node_trace = go.Scatter3d(x=arrays.pos[:, 0], y=arrays.pos[:, 1], z=arrays.pos[:, 2], mode='markers',
+                              marker=dict(size=3.5, color=node_color, colorscale=[[0, 'blue'], [1, 'red']],
+                                          cmin=0, cmax=1),
+                              text=node_labels, customdata=node_centrality, hovertemplate=node_hover_template,
+                              opacity=node_opacity, showlegend=False)
 
-    # Draw the edges in different colors based on vessel type
-    for edge in G.edges(data=True):
-        x, y, z = zip(*[pos[v] for v in edge[:2]])
-        ves_type = getvesname(edge[2].get('ves_type', [None]))  # Get the first vessel type of the edge
-        color = color_map.get(ves_type, 'black')  # Default to black if no type
-        ax.plot(x, y, z, color=color)
+    # Create and return the figure
+    fig = go.Figure(data=edge_traces + [node_trace], layout=plot_layout())
+    return fig
 
-    ax.set_xlabel('X Axis')
-    ax.set_ylabel('Y Axis')
-    ax.set_zlabel('Z Axis')
-    plt.title("3D Graph Visualization")
+def visualize_3d_graph(G, camera='oblique', image_format='png', renderer=None):
+    """
+    Renders a 3D graph to an image without a display.
 
-    # Create a legend for vessel types
-    legend_elements = [plt.Line2D([0], [0], color=color_map[vt], lw=2, label=vt) for vt in vessel_types]
-    ax.legend(handles=legend_elements, title="Vessel Types")
+    Parameters:
+        G (networkx.Graph): The graph to visualize.
+        camera (str or tuple): A camera preset name (see `CAMERA_PRESETS`) or an (elevation, azimuth) pair.
+        image_format (str): 'png' or 'svg'.
+        renderer (BatchRenderer): A renderer to reuse across graphs. A new one is created if None.
 
-    plt.show()
+    Returns:
+        bytes: The image.
+    """
+    renderer = renderer if renderer is not None else BatchRenderer()
+    return renderer.render(G, camera=camera, image_format=image_format)
 
 
 def generateG(all_selected_points, all_selected_points_rad, all_selected_points_id, all_selected_points_type):
     """
     Generate a graph representation of a 3D structure based on selected points.
 
+    Points shared by several snakes (bifurcations) are merged into one node, identified by the ID of
+    the first point with those coordinates. All points are stacked and deduplicated at once on the
+    bit patterns of their coordinates, so merging is exact, and the graph is bulk-loaded.
+
     Parameters:
     - all_selected_points (list of lists): A list of lists containing the coordinates of selected points.
     - all_selected_points_rad (list of lists): A list of lists containing the radii of the selected points.
@@ -157,72 +134,195 @@ def generateG(all_selected_points, all_selected_points_rad, all_selected_points_
     """
 
     G = nx.Graph()
-
-    # Mapping from position to node ID
-    position_to_id_map = {}
-    node_attributes = {}
-
-    for segment_points, segment_ids, segment_rads, segment_types in zip(all_selected_points, all_selected_points_id, all_selected_points_rad, all_selected_points_type):
-        # Determine vessel type for the segment
-        ves_type = matchvestype(int(segment_types[0]), int(segment_types[-1]))
-
-        for point, id, rad in zip(segment_points, segment_ids, segment_rads):
-            pos_key = tuple(point)
-            if pos_key not in position_to_id_map:
-                position_to_id_map[pos_key] = id
-                node_attributes[id] = {'pos': point, 'radius': rad, 'ves_type': [ves_type]}
-            else:
-                # For bifurcation points, append vessel type to list
-                existing_id = position_to_id_map[pos_key]
-                if ves_type not in node_attributes[existing_id]['ves_type']:
-                    node_attributes[existing_id]['ves_type'].append(ves_type)
-
-    # Add nodes to the graph
-    for id, attrs in node_attributes.items():
-        G.add_node(id, **attrs)
-
-    # Add edges to the graph, assigning vessel type
-    for segment_points, segment_ids, segment_types in zip(all_selected_points, all_selected_points_id, all_selected_points_type):
-        # Determine vessel type for the segment
-        ves_type = matchvestype(int(segment_types[0]), int(segment_types[-1]))
-
-        for i in range(len(segment_ids) - 1):
-            start_pos = tuple(segment_points[i])
-            end_pos = tuple(segment_points[i + 1])
-            start_id = position_to_id_map[start_pos]
-            end_id = position_to_id_map[end_pos]
-
-            # Determine edge vessel type
-            # If a node is a bifurcation point, use the vessel type from the other node
-            if len(node_attributes[start_id]['ves_type']) > 1:  # start_id is a bifurcation point
-                edge_ves_type = node_attributes[end_id]['ves_type'][0]
-            elif len(node_attributes[end_id]['ves_type']) > 1:  # end_id is a bifurcation point
-                edge_ves_type = node_attributes[start_id]['ves_type'][0]
-            else:
-                edge_ves_type = ves_type
-
-            G.add_edge(start_id, end_id, ves_type=edge_ves_type)
+    if len(all_selected_points) == 0:
+        return G
+
+    lengths = np.array([len(segment_points) for segment_points in all_selected_points])
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    points = np.concatenate([np.asarray(p, dtype=float).reshape(-1, 3) for p in all_selected_points])
+    ids = np.concatenate(all_selected_points_id)
+    rads = np.concatenate(all_selected_points_rad)
+    types = np.concatenate(all_selected_points_type)
+
+    # Vessel type of every segment, repeated for each of its points
+    segment_ves_type = matchvestypes(types[offsets[:-1]], types[offsets[1:] - 1])
+    point_ves_type = np.repeat(segment_ves_type, lengths)
+
+    # Deduplicate positions on their exact bit patterns (adding 0.0 turns -0.0 into 0.0),
+    # numbering the nodes in order of first occurrence
+    keys = (points + 0.0).view(np.int64)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    point_node = rank[inverse.ravel()]
+    node_first = first[order]
+
+    # Vessel types of every node, in order of first occurrence
+    pairs = point_node * 256 + point_ves_type.astype(np.int64)
+    unique_pairs, pair_first = np.unique(pairs, return_index=True)
+    pair_order = np.lexsort((pair_first, unique_pairs // 256))
+    node_types = (unique_pairs[pair_order] % 256).astype(segment_ves_type.dtype)
+    type_count = np.bincount(unique_pairs // 256, minlength=len(node_first))
+    type_ptr = np.concatenate([[0], np.cumsum(type_count)])
+    node_first_type = node_types[type_ptr[:-1]]
+
+    node_ids = ids[node_first]
+    node_ves_types = [[ves_type] for ves_type in node_first_type]
+    for k in np.flatnonzero(type_count > 1):
+        node_ves_types[k] = list(node_types[type_ptr[k]:type_ptr[k + 1]])
+    G.add_nodes_from(
+        (node_id, {'pos': pos, 'radius': rad, 'ves_type': ves_types})
+        for node_id, pos, rad, ves_types in zip(node_ids, points[node_first], rads[node_first], node_ves_types))
+
+    # Edges between consecutive points of each segment.
+    # If a node is a bifurcation point, the edge takes the vessel type of the other node
+    consecutive = np.ones(len(points) - 1, dtype=bool)
+    consecutive[offsets[1:-1] - 1] = False
+    start_node = point_node[:-1][consecutive]
+    end_node = point_node[1:][consecutive]
+    edge_ves_type = np.where(type_count[start_node] > 1, node_first_type[end_node],
+                             np.where(type_count[end_node] > 1, node_first_type[start_node],
+                                      point_ves_type[:-1][consecutive]))
+    G.add_edges_from(
+        (u, v, {'ves_type': t}) for u, v, t in zip(node_ids[start_node], node_ids[end_node], edge_ves_type))
 
     return G
 
-def swc2graph(swc_string, distance_threshold=10):
+def parse_swc(swc_string):
+    """
+    Parse an SWC string into an array.
+
+    Parameters:
+    - swc_string (str): The SWC string containing the SWC data as a list of rows.
+
+    Returns:
+    - swc_data (numpy.ndarray): The SWC rows (id, type, x, y, z, radius, parent id), shape (n, 7).
+    """
+    # A list of numbers is valid JSON, and json is faster than ast.literal_eval, which also fails
+    # when called from several threads at once on CPython 3.11 before 3.11.8
+    # (SystemError: AST constructor recursion depth mismatch)
+    try:
+        return np.array(json.loads(swc_string))
+    except ValueError:
+        return np.array(ast.literal_eval(swc_string))
+
+def point_segment_distances(points, start, end):
+    """
+    Calculate the distances between points and a single line segment.
+
+    Parameters:
+    - points (numpy.ndarray): The points, shape (n, 3).
+    - start (numpy.ndarray): The start of the segment, shape (3,).
+    - end (numpy.ndarray): The end of the segment, shape (3,).
+
+    Returns:
+    - numpy.ndarray: The distance of every point to the segment, shape (n,).
+    """
+    direction = end - start
+    length_sq = np.dot(direction, direction)
+    if length_sq == 0:
+        return np.linalg.norm(points - start, axis=1)
+    t = np.clip((points - start) @ direction / length_sq, 0, 1)
+    return np.linalg.norm(points - (start + t[:, None] * direction), axis=1)
+
+
+def simplify_polyline(points, tolerance, keep=None):
+    """
+    Simplify a polyline with the Douglas-Peucker algorithm.
+
+    A point is dropped only if the simplified polyline stays within `tolerance` of it, so straight
+    segments collapse to their ends while tortuous ones keep as many points as their shape needs.
+
+    Parameters:
+    - points (numpy.ndarray): The polyline points, shape (n, 3).
+    - tolerance (float): The largest allowed distance between a dropped point and the simplified polyline.
+    - keep (numpy.ndarray): Optional boolean mask of points that are always kept, shape (n,).
+
+    Returns:
+    - numpy.ndarray: The sorted indices of the kept points. The first and last points are always kept.
+    """
+    n = len(points)
+    kept = np.zeros(n, dtype=bool)
+    kept[[0, n - 1]] = True
+    if keep is not None:
+        kept |= keep
+    anchors = np.flatnonzero(kept)
+    stack = list(zip(anchors[:-1], anchors[1:]))
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = point_segment_distances(points[first + 1:last], points[first], points[last])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            kept[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(kept)
+
+
+def junction_mask(swc_data):
+    """
+    Find the SWC rows that lie on a snake endpoint, i.e. the endpoints and bifurcations of the tracing.
+
+    Snakes are connected by sharing point coordinates, so a point inside one snake that coincides with
+    the start or end of another snake is a bifurcation.
+
+    Parameters:
+    - swc_data (numpy.ndarray): The SWC rows, see `parse_swc`.
+
+    Returns:
+    - numpy.ndarray: A boolean mask over the rows, shape (n,).
+    """
+    starts = np.flatnonzero(swc_data[:, -1] == -1)
+    ends = np.append(starts[1:] - 1, len(swc_data) - 1)
+    _, point_index = np.unique(swc_data[:, 2:5], axis=0, return_inverse=True)
+    point_index = point_index.ravel()
+    return np.isin(point_index, point_index[np.concatenate([starts, ends])])
+
+
+def swc2graph(swc_string, distance_threshold=10, simplify_tolerance=None):
     """
     Convert an SWC string to a graph representation.
 
     Parameters:
     - swc_string (str): The SWC string containing the SWC data.
     - distance_threshold (float): The distance threshold for selecting points along the snakes.
+    - simplify_tolerance (float): The largest allowed deviation (in mm) of the simplified centrelines
+      from the traced ones. Overrides `distance_threshold` when given.
+
+    Returns:
+    - graph (Graph): The graph representation of the SWC data.
+    """
+    return swc_data2graph(parse_swc(swc_string), distance_threshold, simplify_tolerance)
+
+
+def swc_data2graph(swc_data, distance_threshold=10, simplify_tolerance=None):
+    """
+    Convert parsed SWC rows to a graph representation, for callers that also use the rows otherwise.
+
+    By default points are selected every `distance_threshold` along each snake. If `simplify_tolerance`
+    is given, each snake is instead simplified with the Douglas-Peucker algorithm, keeping its
+    endpoints and bifurcations, which keeps fewer points on straight vessels and more on tortuous ones.
+
+    Parameters:
+    - swc_data (numpy.ndarray): The SWC rows, see `parse_swc`. Not modified.
+    - distance_threshold (float): The distance threshold for selecting points along the snakes.
+    - simplify_tolerance (float): The largest allowed deviation (in mm) of the simplified centrelines
+      from the traced ones. Overrides `distance_threshold` when given.
 
     Returns:
     - graph (Graph): The graph representation of the SWC data.
     """
 
-    swc_list = ast.literal_eval(swc_string)
-    swc_data = np.array(swc_list)
     swc_data_transform = copy.deepcopy(swc_data)
 
     # Find the indices where the last column is -1
     root_indices = np.where(swc_data_transform[:, -1] == -1)[0]
+    if simplify_tolerance is not None:
+        is_junction = junction_mask(swc_data_transform)
     # Create a list to hold the individual "snakes"
     snakes = []
     all_selected_points = []
@@ -241,6 +341,17 @@ def swc2graph(swc_string, distance_threshold=10):
         swc_snake_id = swc_snake[:, 0]
         swc_snake_type = swc_snake[:, 1]
         swc_snake_pid = swc_snake[:, -1]
+
+        if simplify_tolerance is not None:
+            keep = simplify_polyline(swc_snake_pos, simplify_tolerance,
+                                     is_junction[root_indices[i] : root_indices[i + 1]])
+            all_selected_points.append(swc_snake_pos[keep])
+            all_selected_points_rad.append(swc_snake_rad[keep])
+            all_selected_points_id.append(swc_snake_id[keep])
+            all_selected_points_type.append(swc_snake_type[keep])
+            all_selected_points_pid.append(swc_snake_pid[keep])
+            continue
+
         # calculate the distance between two adjacent points
         distances = np.sqrt(np.sum(np.diff(swc_snake_pos, axis=0) ** 2, axis=1))
 
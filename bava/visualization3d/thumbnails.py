@@ -0,0 +1,134 @@
+"""
+This module renders small static thumbnails of subjects and stores them by content.
+
+A thumbnail is stored under a hash of the subject's tracing and the thumbnail options, so identical
+tracings share one file, an edited tracing gets a new thumbnail, and a stored thumbnail never needs to
+be invalidated. The store takes the hash of the tracing (`content_hash`, also kept in the subjects
+table), so a stored thumbnail can be found without reading the tracing. Files are spread over subdirectories named after the first two hex digits of the hash.
+
+`render_thumbnail` keeps one `BatchRenderer` per thread, so it can be mapped over many tracings in a
+process pool without creating a figure for each of them, and called from several threads at once
+without two renders sharing a figure.
+
+Example usage:
+    store = ThumbnailStore('./data/thumbnails')
+    digest = content_hash(swc_string)
+    if not store.contains(digest):
+        store.put(digest, render_thumbnail(swc_string))
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from .figure_cache import content_hash
+from .static_render import BatchRenderer
+from .swc2graph import swc2graph
+
+THUMBNAIL_OPTIONS = {'camera': 'superior', 'size': 160}
+THUMBNAIL_DPI = 100
+
+_local = threading.local()
+
+
+def render_thumbnail(swc_string, camera='superior', size=160):
+    """
+    Render the thumbnail of a tracing as a square PNG image without axes, legend or nodes.
+
+    Parameters:
+    - swc_string (str): The SWC string of the subject.
+    - camera (str or tuple): A camera preset name or an (elevation, azimuth) pair, see `BatchRenderer.render`.
+    - size (int): The width and height of the image in pixels.
+
+    Returns:
+    - bytes: The PNG image.
+    """
+    renderers = _local.__dict__.setdefault('renderers', {})
+    if size not in renderers:
+        renderers[size] = BatchRenderer(figsize=(size / THUMBNAIL_DPI, size / THUMBNAIL_DPI), dpi=THUMBNAIL_DPI)
+    return renderers[size].render(swc2graph(swc_string), camera=camera, show_nodes=False, legend=False,
+                                   show_axes=False)
+
+
+class ThumbnailStore:
+    """
+    A content-addressed disk store of PNG thumbnails.
+
+    Attributes:
+        store_dir (str): The directory holding the thumbnails.
+
+    Methods:
+        key(digest, options): Returns the content address of a thumbnail.
+        path(digest, options): Returns the file of a thumbnail.
+        contains(digest, options): Returns whether a thumbnail is stored.
+        get(digest, options): Returns a stored thumbnail, or None.
+        put(digest, png, options): Stores a thumbnail.
+    """
+
+    def __init__(self, store_dir):
+        """
+        Opens (or creates) a thumbnail store.
+
+        Parameters:
+        - store_dir (str): The directory holding the thumbnails.
+        """
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    def key(self, digest, options=THUMBNAIL_OPTIONS):
+        """
+        Returns the content address of a thumbnail.
+
+        Parameters:
+        - digest (str): The `content_hash` of the subject's tracing.
+        - options (dict): The keyword arguments of `render_thumbnail`.
+
+        Returns:
+        - str: A hexadecimal SHA-256 digest.
+        """
+        key = json.dumps({'content': digest, 'options': options}, sort_keys=True)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def path(self, digest, options=THUMBNAIL_OPTIONS):
+        """
+        Returns the file of a thumbnail in the store.
+        """
+        key = self.key(digest, options)
+        return os.path.join(self.store_dir, key[:2], f"{key}.png")
+
+    def contains(self, digest, options=THUMBNAIL_OPTIONS):
+        """
+        Returns whether the thumbnail of a tracing is stored.
+        """
+        return os.path.exists(self.path(digest, options))
+
+    def get(self, digest, options=THUMBNAIL_OPTIONS):
+        """
+        Returns a stored thumbnail.
+
+        Returns:
+        - bytes: The PNG image, or None if it is not stored.
+        """
+        try:
+            with open(self.path(digest, options), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest, png, options=THUMBNAIL_OPTIONS):
+        """
+        Stores a thumbnail.
+
+        Parameters:
+        - digest (str): The `content_hash` of the subject's tracing.
+        - png (bytes): The PNG image.
+        - options (dict): The options the thumbnail was rendered with.
+        """
+        path = self.path(digest, options)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so that readers never see a partial image
+        descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(png)
+        os.replace(temporary_path, path)
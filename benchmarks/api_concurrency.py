@@ -0,0 +1,111 @@
+"""
+Benchmarks the throughput of the API under many simultaneous clients.
+
+Each client sends its requests one after the other, to the app in process over ASGI. The API runs its
+queries on the database threads; the baseline is a copy of the /filter/ and /subjects/{id} routes
+running the same queries on the event loop, as the routes did before, so that one query at a time
+is served whatever the number of clients. The database is a file of copies of the sample subjects.
+
+Reading a local file that the OS has cached is mostly Python work under the GIL (building rows and
+serializing them), so threads can only overlap the time spent waiting on storage. The second run adds
+a simulated storage latency to every statement, a sleep that releases the GIL as a disk or network
+read does, where throughput should scale with the number of clients up to DB_THREADS.
+
+run with 'python -m benchmarks.api_concurrency' in repository root
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import List
+from unittest import mock
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event
+from sqlalchemy.orm import undefer_group
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, create_engine
+
+from bava.api import routers
+from bava.api.config import DB_POOL_SIZE, DB_POOL_OVERFLOW
+from bava.api.database import apply_filters, select_subject_fields
+from bava.api.schemas import FilterDB, Subject, SubjectRecord
+from benchmarks.api_queries import ALL_SUBJECTS_FILTER, create_database
+
+FILTER_BODY = json.loads(ALL_SUBJECTS_FILTER.json())
+
+
+def blocking_app(engine):
+    """
+    The baseline routes, which query on the event loop.
+    """
+    baseline = FastAPI()
+
+    async def session_dependency():
+        with Session(engine) as session:
+            yield session
+
+    @baseline.post("/filter/", response_model=List[SubjectRecord])
+    async def get_filtered_data(*, session: Session = Depends(session_dependency), filter_options: FilterDB):
+        statement = apply_filters(select_subject_fields(), filter_options)
+        return [dict(row._mapping) for row in session.execute(statement)]
+
+    @baseline.get("/subjects/{subject_id}", response_model=Subject)
+    async def get_by_subject_id(*, session: Session = Depends(session_dependency), subject_id: str):
+        return session.get(Subject, subject_id, options=[undefer_group("heavy")])
+
+    return baseline
+
+
+def add_storage_latency(engine, seconds):
+    def wait_for_storage(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(seconds)
+
+    event.listen(engine, "before_cursor_execute", wait_for_storage)
+
+
+async def client(http, requests_per_client, num_subjects):
+    for i in range(requests_per_client):
+        if i % 2:
+            response = await http.get(f"/subjects/CROP_{7001 + i % num_subjects}")
+        else:
+            response = await http.post("/filter/", json=FILTER_BODY)
+        response.raise_for_status()
+
+
+async def requests_per_second(asgi_app, num_clients, requests_per_client, num_subjects):
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bava") as http:
+        start = time.perf_counter()
+        await asyncio.gather(*[client(http, requests_per_client, num_subjects) for _ in range(num_clients)])
+        return num_clients * requests_per_client / (time.perf_counter() - start)
+
+
+def main(num_subjects=200, requests_per_client=4, storage_latency=0.02):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "subjects.db")
+        create_database(path, num_subjects).dispose()
+        print(f"{'storage':>8} {'clients':>8} {'queries on':>11} {'requests/s':>11}")
+        for latency in (0, storage_latency):
+            engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                                   poolclass=QueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_OVERFLOW)
+            # Before, file databases got SQLAlchemy's default NullPool, one new connection per session
+            baseline_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+            for benchmark_engine in (engine, baseline_engine):
+                add_storage_latency(benchmark_engine, latency)
+            versions = (('event loop', blocking_app(baseline_engine)), ('db threads', routers.app))
+            with mock.patch.object(routers, "engine", engine):
+                for num_clients in (1, 4, 16, 64):
+                    for version, asgi_app in versions:
+                        throughput = asyncio.run(requests_per_second(asgi_app, num_clients, requests_per_client,
+                                                                     num_subjects))
+                        storage = f"{latency * 1000:.0f} ms" if latency else "local"
+                        print(f"{storage:>8} {num_clients:>8} {version:>11} {throughput:>11.1f}")
+            engine.dispose()
+            baseline_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
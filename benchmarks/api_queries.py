@@ -0,0 +1,92 @@
+"""
+Benchmarks the database reads of the API endpoints, before and after projecting them onto the
+columns they return.
+
+Before, every endpoint loaded whole Subject rows, tracings included, even to return one JSON column
+or the SubjectRecord fields. Each endpoint's query is run both ways on an on-disk database of copies
+of the sample subjects; "bytes read" is the size of the column values fetched.
+
+run with 'python -m benchmarks.api_queries' in repository root
+"""
+import os
+import tempfile
+import timeit
+
+from sqlalchemy.orm import undefer_group
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from bava.api.database import apply_filters, get_subject_fields, migrate_subjects_table, select_subject_fields
+from bava.api.schemas import FilterDB, Subject, Gender, Race
+from bava.tests.sample_data import load_sample_swc
+
+ALL_SUBJECTS_FILTER = FilterDB(datasets=["CROP"], age=(0, 200), sbp=(0, 300), dbp=(0, 300), tc=(0, 500), tg=(0, 500),
+                               hdl=(0, 500), ldl=(0, 500), framingham_risk=(0, 1))
+
+
+def create_database(path, num_subjects):
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    migrate_subjects_table(engine)
+    swc_strings = [load_sample_swc('tracing_ves_TH_0_7001_U.swc'), load_sample_swc('tracing_ves_TH_0_7002_U.swc')]
+    with Session(engine) as session:
+        for i in range(num_subjects):
+            session.add(Subject(ID=f"CROP_{7001 + i}", Age=60, Smoking=False, SBP=120.0, DBP=80.0, Hypertension=False,
+                                TC=180.0, TG=150.0, HDL=50.0, LDL=100.0, Diabetes=False, Framingham_Risk=0.1,
+                                Gender=Gender.female, Race=Race.asian, unstructured_data=swc_strings[i % 2],
+                                morphological_features='{}'))
+        session.commit()
+    return engine
+
+
+def value_bytes(value):
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 0 if value is None else 8
+
+
+def whole_rows(session, statement):
+    """
+    The column values of the Subject objects of a statement, with the deferred columns loaded.
+    """
+    subjects = session.exec(statement.options(undefer_group("heavy"))).all()
+    return [[getattr(subject, column.name) for column in Subject.__table__.columns] for subject in subjects]
+
+
+def endpoint_queries(subject_id):
+    """
+    The reads of each endpoint, as (endpoint, before, after) with functions of a session returning rows.
+    """
+    by_id = select(Subject).where(Subject.ID == subject_id)
+    return [
+        ("/filter/",
+         lambda session: whole_rows(session, apply_filters(select(Subject), ALL_SUBJECTS_FILTER)),
+         lambda session: session.execute(apply_filters(select_subject_fields(), ALL_SUBJECTS_FILTER)).all()),
+        ("/subject_morphological_features/",
+         lambda session: whole_rows(session, by_id),
+         lambda session: [get_subject_fields(session, subject_id, ["morphological_features"])]),
+        ("/subject_graphical_features/",
+         lambda session: whole_rows(session, by_id),
+         lambda session: [get_subject_fields(session, subject_id, ["ID"])]),
+        ("/subject_roi_features/",
+         lambda session: whole_rows(session, by_id),
+         lambda session: [get_subject_fields(session, subject_id, ["unstructured_data"])]),
+    ]
+
+
+def main(num_subjects=500):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database(os.path.join(directory, "subjects.db"), num_subjects)
+        print(f"{'endpoint':>32} {'version':>8} {'bytes read (kB)':>16} {'latency (ms)':>13}")
+        for endpoint, *versions in endpoint_queries("CROP_7001"):
+            for version, query in zip(('before', 'after'), versions):
+                def run():
+                    with Session(engine) as session:
+                        return query(session)
+                bytes_read = sum(value_bytes(value) for row in run() for value in row)
+                seconds = min(timeit.repeat(run, number=1, repeat=5))
+                print(f"{endpoint:>32} {version:>8} {bytes_read / 1000:>16.1f} {seconds * 1000:>13.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
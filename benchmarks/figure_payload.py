@@ -0,0 +1,32 @@
+"""
+Benchmarks the size and serialization time of the interactive 3D plot payload.
+
+`Figure.to_json()` writes every coordinate and every per-node hover string as JSON text, while
+`encode_figure` writes the numeric arrays as base64 typed arrays (float32 positions, uint8 colors).
+Centralities are computed first so that the node hover data is as on the Data Visualization page.
+
+run with 'python -m benchmarks.figure_payload' in repository root
+"""
+import timeit
+
+from bava.visualization3d.figure_encoding import encode_figure
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.visualization3d.swc2graph import swc2graph
+from bava.tests.sample_data import load_sample_swc
+
+
+def main():
+    swc_string = load_sample_swc()
+    print(f"{'nodes':>6} {'encoding':>14} {'serialize (ms)':>15} {'payload (kB)':>13}")
+    for distance_threshold in (10, 5, 0):
+        subject = SubjectGraph.from_graph(swc2graph(swc_string, distance_threshold=distance_threshold))
+        subject.add_centrality_measures()
+        fig = subject.create_interactive_plot()
+        for encoding, serialize in (('to_json', fig.to_json), ('typed arrays', lambda: encode_figure(fig))):
+            seconds = min(timeit.repeat(serialize, number=1, repeat=3))
+            print(f"{subject.graph.number_of_nodes():>6} {encoding:>14} {seconds * 1000:>15.1f} "
+                  f"{len(serialize()) / 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmarks graph construction time versus point count for `generateG`.
+
+The snakes of the sample tracing are replicated with translated copies to reach larger point counts,
+and the vectorized `generateG` is timed against the original dictionary-based construction.
+
+run with 'python -m benchmarks.generate_graph' in repository root
+"""
+import timeit
+
+import numpy as np
+
+from bava.visualization3d.swc2graph import generateG, parse_swc
+from bava.tests.legacy_graph import legacy_generateG, snake_lists
+from bava.tests.sample_data import load_sample_swc
+
+
+def replicate(arguments, copies):
+    """
+    Replicates per-snake lists with every copy translated, so that no points are shared between copies.
+    """
+    points, radii, ids, types = arguments
+    max_id = max(segment_ids.max() for segment_ids in ids) + 1
+    shift = np.ptp(np.concatenate(points), axis=0) + 1
+    replicated = ([], [], [], [])
+    for copy in range(copies):
+        replicated[0].extend(p + copy * shift for p in points)
+        replicated[1].extend(radii)
+        replicated[2].extend(i + copy * max_id for i in ids)
+        replicated[3].extend(types)
+    return replicated
+
+
+def main():
+    arguments = snake_lists(parse_swc(load_sample_swc()))
+    print(f"{'points':>8} {'legacy (ms)':>12} {'vectorized (ms)':>16} {'speedup':>8}")
+    for copies in (1, 4, 16, 64):
+        replicated = replicate(arguments, copies)
+        num_points = sum(len(p) for p in replicated[0])
+        repeat = max(1, 16 // copies)
+        legacy = min(timeit.repeat(lambda: legacy_generateG(*replicated), number=1, repeat=repeat))
+        vectorized = min(timeit.repeat(lambda: generateG(*replicated), number=1, repeat=repeat))
+        print(f"{num_points:>8} {legacy * 1000:>12.1f} {vectorized * 1000:>16.1f} {legacy / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Benchmarks loading a saved subject graph against rebuilding it from the tracing.
+
+`SubjectGraph(swc_string)` parses the tracing, builds the graph and calculates its features, while
+`SubjectGraph.load` maps the arrays of a file written by `SubjectGraph.save`.
+
+run with 'python -m benchmarks.graph_io' in repository root
+"""
+import os
+import tempfile
+import timeit
+
+from bava.visualization3d.subject_graph import SubjectGraph
+from bava.tests.sample_data import load_sample_swc
+
+
+def main():
+    swc_string = load_sample_swc()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'subject.bavag')
+        SubjectGraph(swc_string).save(path)
+        print(f"{'version':>9} {'ms per subject':>15}")
+        for version, create in (('rebuild', lambda: SubjectGraph(swc_string)),
+                                ('load', lambda: SubjectGraph.load(path)),
+                                ('load copy', lambda: SubjectGraph.load(path, mmap=False))):
+            seconds = min(timeit.repeat(create, number=1, repeat=5))
+            print(f"{version:>9} {seconds * 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
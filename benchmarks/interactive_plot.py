@@ -0,0 +1,130 @@
+"""
+Benchmarks the build time and payload size of the interactive 3D plot.
+
+The per-vessel-type traces of `create_interactive_plot` are compared with the original implementation,
+which created one trace per edge. Graphs are resampled at several distances to vary the edge count.
+
+run with 'python -m benchmarks.interactive_plot' in repository root
+"""
+import timeit
+
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+import plotly.graph_objects as go
+
+from bava.visualization3d.graph_analysis import getvesname
+from bava.visualization3d.swc2graph import create_interactive_plot, swc2graph
+from bava.tests.sample_data import load_sample_swc
+
+
+def legacy_create_interactive_plot(G):
+    """
+    The original implementation, with one trace per edge, kept as the baseline.
+
+    Parameters:
+        G (networkx.Graph): The graph object representing the network.
+
+    Returns:
+        plotly.graph_objects.Figure: The interactive 3D network graph plot.
+    """
+    # Extract node positions
+    pos = nx.get_node_attributes(G, 'pos')
+
+    # Create color map for vessel types
+    vessel_types = set()
+    for _, _, edge_data in G.edges(data=True):
+        vessel_types.add(edge_data['ves_type'])
+    colors = plt.cm.rainbow(np.linspace(0, 1, len(vessel_types)))
+    color_map = {getvesname(ves_type): f'rgb({int(255*color[0])}, {int(255*color[1])}, {int(255*color[2])})' 
+                 for ves_type, color in zip(vessel_types, colors)}
+
+    # Edge data - creating a trace for each edge
+    edge_traces = []
+    legend_traces = []
+    legend_added = set()
+    edge_width = 5
+    for edge in G.edges(data=True):
+        x0, y0, z0 = pos[edge[0]]
+        x1, y1, z1 = pos[edge[1]]
+        ves_type = getvesname(edge[2]['ves_type'])
+        color = color_map[ves_type]
+        edge_trace = go.Scatter3d(x=[x0, x1], y=[y0, y1], z=[z0, z1], mode='lines',
+                                  line=dict(color=color, width=edge_width), hoverinfo='text', 
+                                  hovertext=ves_type, showlegend=False)
+        edge_traces.append(edge_trace)
+        if ves_type not in legend_added:
+            legend_trace = go.Scatter3d(x=[None], y=[None], z=[None], mode='lines',
+                                        line=dict(color=color, width=4), name=ves_type)
+            legend_traces.append(legend_trace)
+            legend_added.add(ves_type)
+
+    # Node data
+    node_opacity = 0.5
+    node_x, node_y, node_z, node_color, node_hover_text = [], [], [], [], []
+    centrality_eigen = 'eigenvector'
+    centrality_betweenness = 'betweenness'
+    centrality_closeness = 'closeness'
+    for node, data in G.nodes(data=True):
+        node_x.append(pos[node][0])
+        node_y.append(pos[node][1])
+        node_z.append(pos[node][2])
+        node_color.append('red' if len(data['ves_type']) > 1 else 'blue')
+        hover_text = ', '.join([getvesname(vt) for vt in data['ves_type']])
+        
+        centrality_betweenness_value = data.get(centrality_betweenness, 0)  # Default to 0 if not found
+        hover_text += f"<br>{centrality_betweenness.capitalize()}: {centrality_betweenness_value*10000:.2f}"
+        
+        centrality_closeness_value = data.get(centrality_closeness, 0)  # Default to 0 if not found
+        hover_text += f"<br>{centrality_closeness.capitalize()}: {centrality_closeness_value*10000:.2f}"
+        
+        centrality_eigen_value = data.get(centrality_eigen, 0)  # Default to 0 if not found
+        hover_text += f"<br>{'Eigen Centrality'}: {centrality_eigen_value*10000:.2f}"
+        
+        node_hover_text.append(hover_text)
+
+    node_trace = go.Scatter3d(x=node_x, y=node_y, z=node_z, mode='markers',
+                              marker=dict(size=3.5, color=node_color), hoverinfo='text', 
+                              hovertext=node_hover_text, opacity=node_opacity, showlegend=False)
+
+    # Define layout
+    layout = go.Layout(
+        title='Advanced 3D Network Graph',
+        scene=dict(
+            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, showbackground=False),
+            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, showbackground=False),
+            zaxis=dict(showgrid=False, zeroline=False, showticklabels=False, showbackground=False),
+        ),
+        legend=dict(title='Vessel Types'),
+        width=1000,
+        height=1000  # Adjust the height value as needed
+    )
+
+    # Create and return the figure
+    fig = go.Figure(data=edge_traces + legend_traces + [node_trace], layout=layout)
+    return fig
+
+
+def measure(plot, G, repeat=3):
+    """
+    Returns the number of traces, the build time, the serialization time and the JSON payload size.
+    """
+    build = min(timeit.repeat(lambda: plot(G), number=1, repeat=repeat))
+    fig = plot(G)
+    serialize = min(timeit.repeat(fig.to_json, number=1, repeat=repeat))
+    return len(fig.data), build, serialize, len(fig.to_json())
+
+
+def main():
+    swc_string = load_sample_swc()
+    print(f"{'edges':>6} {'version':>10} {'traces':>7} {'build (ms)':>11} {'to_json (ms)':>13} {'payload (kB)':>13}")
+    for distance_threshold in (10, 5, 0):
+        G = swc2graph(swc_string, distance_threshold=distance_threshold)
+        for version, plot in (('before', legacy_create_interactive_plot), ('after', create_interactive_plot)):
+            traces, build, serialize, payload = measure(plot, G)
+            print(f"{G.number_of_edges():>6} {version:>10} {traces:>7} {build * 1000:>11.1f} "
+                  f"{serialize * 1000:>13.1f} {payload / 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmarks batch rendering of static 3D images.
+
+The original `visualize_3d_graph` created a pyplot figure per graph and called `ax.plot` once per
+edge; it is compared with `BatchRenderer`, which reuses one figure and draws one `Line3DCollection`
+per vessel type. Both render PNG images with the Agg backend.
+
+run with 'python -m benchmarks.static_render' in repository root
+"""
+import io
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+import networkx as nx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from bava.visualization3d.graph_analysis import getvesname  # noqa: E402
+from bava.visualization3d.static_render import BatchRenderer  # noqa: E402
+from bava.visualization3d.swc2graph import swc2graph  # noqa: E402
+from bava.tests.sample_data import load_sample_swc  # noqa: E402
+
+
+def legacy_visualize_3d_graph(G):
+    """
+    The original implementation, saving to PNG bytes instead of calling plt.show(), kept as the baseline.
+    """
+    fig = plt.figure(figsize=(10, 8))
+    ax = fig.add_subplot(111, projection='3d')
+    pos = nx.get_node_attributes(G, 'pos')
+    xs, ys, zs = zip(*[pos[v] for v in G.nodes()])
+    ax.scatter(xs, ys, zs, color='gray', s=20)
+    vessel_types = list({getvesname(t) for _, _, t in G.edges(data='ves_type')})
+    colors = plt.cm.rainbow(np.linspace(0, 1, len(vessel_types)))
+    color_map = {ves_type: color for ves_type, color in zip(vessel_types, colors)}
+    for edge in G.edges(data=True):
+        x, y, z = zip(*[pos[v] for v in edge[:2]])
+        ax.plot(x, y, z, color=color_map.get(getvesname(edge[2]['ves_type']), 'black'))
+    legend_elements = [plt.Line2D([0], [0], color=color_map[vt], lw=2, label=vt) for vt in vessel_types]
+    ax.legend(handles=legend_elements, title="Vessel Types")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def main(num_subjects=10):
+    swc_string = load_sample_swc()
+    print(f"{'edges':>6} {'version':>10} {'ms per image':>13}")
+    for distance_threshold in (10, 0):
+        G = swc2graph(swc_string, distance_threshold=distance_threshold)
+        renderer = BatchRenderer()
+        for version, render in (('before', legacy_visualize_3d_graph), ('after', renderer.render)):
+            start = time.perf_counter()
+            for _ in range(num_subjects):
+                render(G)
+            seconds = (time.perf_counter() - start) / num_subjects
+            print(f"{G.number_of_edges():>6} {version:>10} {seconds * 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()